@@ -0,0 +1,40 @@
+from dataclasses import dataclass
+from typing import List, Optional
+from value_store import NamespacedValueStore, ValueStore
+import os
+
+DEFAULT_ACCOUNT_ID = "default"
+
+
+@dataclass(frozen=True)
+class Account:
+    id: str
+    initial_token: Optional[str]
+
+    def namespace(self) -> Optional[str]:
+        if self.id == DEFAULT_ACCOUNT_ID:
+            return None
+        return self.id
+
+    def value_store(self, value_store: ValueStore) -> ValueStore:
+        store = NamespacedValueStore(value_store, self.namespace())
+        if not store.has_value('token'):
+            if self.initial_token is None:
+                raise ValueError(f"No token known for account {self.id}")
+            store.update_value('token', self.initial_token)
+        return store
+
+
+def load_accounts() -> List[Account]:
+    account_ids = os.environ.get('ACCOUNTS')
+    if not account_ids:
+        return [Account(DEFAULT_ACCOUNT_ID, os.environ.get('INITIAL_TOKEN'))]
+    accounts: List[Account] = []
+    for account_id in account_ids.split(','):
+        account_id = account_id.strip()
+        if account_id:
+            accounts.append(Account(
+                account_id,
+                os.environ.get(f"INITIAL_TOKEN_{account_id.upper()}")
+            ))
+    return accounts
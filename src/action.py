@@ -1,7 +1,8 @@
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
-from typing import List, Dict
-from api import API
+from typing import Any, List, Dict, Optional
+from api import API, AsyncAPI
+from models import Mutation
 
 
 class Action(ABC):
@@ -10,6 +11,27 @@ class Action(ABC):
     def execute(self, api: API) -> None:
         pass
 
+    @abstractmethod
+    async def execute_async(self, api: AsyncAPI) -> Any:
+        pass
+
+    @abstractmethod
+    def to_mutation(self) -> Mutation:
+        pass
+
+    def depends_on(self, action: "Action") -> bool:
+        return False
+
+
+@dataclass
+class ActionResult:
+    action: Action
+    data: Any = None
+    error: Optional[str] = None
+
+    def succeeded(self) -> bool:
+        return self.error is None
+
 
 @dataclass
 class TrainUnitAction(Action):
@@ -19,6 +41,20 @@ class TrainUnitAction(Action):
     def execute(self, api: API) -> None:
         api.train_unit(self.unit_id, self.quantity)
 
+    async def execute_async(self, api: AsyncAPI) -> Any:
+        return await api.train_unit(self.unit_id, self.quantity)
+
+    def to_mutation(self) -> Mutation:
+        return Mutation(
+            "actionTrainBuildingUnit",
+            "ActionTrainUnitInput",
+            {"id": self.unit_id, "quantity": self.quantity},
+            "id"
+        )
+
+    def depends_on(self, action: Action) -> bool:
+        return isinstance(action, BuyItemsAction)
+
 
 @dataclass
 class UntrainUnitAction(Action):
@@ -28,6 +64,17 @@ class UntrainUnitAction(Action):
     def execute(self, api: API) -> None:
         api.untrain_unit(self.unit_id, self.quantity)
 
+    async def execute_async(self, api: AsyncAPI) -> Any:
+        return await api.untrain_unit(self.unit_id, self.quantity)
+
+    def to_mutation(self) -> Mutation:
+        return Mutation(
+            "actionUntrainBuildingUnit",
+            "ActionUntrainUnitInput",
+            {"id": self.unit_id, "quantity": self.quantity},
+            "id"
+        )
+
 
 @dataclass
 class DepositGoldInTreasuryAction(Action):
@@ -36,6 +83,17 @@ class DepositGoldInTreasuryAction(Action):
     def execute(self, api: API) -> None:
         api.deposit_to_treasury(self.amount)
 
+    async def execute_async(self, api: AsyncAPI) -> Any:
+        return await api.deposit_to_treasury(self.amount)
+
+    def to_mutation(self) -> Mutation:
+        return Mutation(
+            "actionTreasuryDeposit",
+            "ActionTreasuryTransferInput",
+            {"amount": self.amount},
+            "id"
+        )
+
 
 @dataclass
 class BuyItemsAction(Action):
@@ -44,6 +102,17 @@ class BuyItemsAction(Action):
     def execute(self, api: API) -> None:
         api.buy_items(self.items)
 
+    async def execute_async(self, api: AsyncAPI) -> Any:
+        return await api.buy_items(self.items)
+
+    def to_mutation(self) -> Mutation:
+        return Mutation(
+            "actionBuyItems",
+            "ActionBuyItemsInput",
+            {"items": self.items},
+            "owned_items { item { id name } quantity }"
+        )
+
 
 @dataclass
 class AttackPlayerAction(Action):
@@ -51,3 +120,14 @@ class AttackPlayerAction(Action):
 
     def execute(self, api: API) -> None:
         api.attack_player(self.id)
+
+    async def execute_async(self, api: AsyncAPI) -> Any:
+        return await api.attack_player(self.id)
+
+    def to_mutation(self) -> Mutation:
+        return Mutation(
+            "actionBattle",
+            "ActionBattleInput",
+            {"id": self.id},
+            "result gold_stolen"
+        )
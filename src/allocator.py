@@ -0,0 +1,191 @@
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+from models import Unit
+import numpy as np
+
+IDLE = -1
+TOLERANCE = 1e-9
+
+
+@dataclass(frozen=True)
+class UnitWeights:
+    attack: float = 1.0
+    defense: float = 1.0
+    gold_proceeds: float = 1.0
+
+    def values(self, units: Sequence[Unit]) -> np.ndarray:
+        return np.array([
+            self.attack * unit.attack_strength
+            + self.defense * unit.defense_strength
+            + self.gold_proceeds * unit.gold_proceeds
+            for unit in units
+        ], dtype=np.float64)
+
+
+@dataclass(frozen=True)
+class Allocation:
+    units: Tuple[Tuple[Unit, int], ...]
+    gold_spent: int
+    deposit: int
+    value: float
+
+
+def efficient_units(costs: np.ndarray, values: np.ndarray) -> np.ndarray:
+    order = np.lexsort((-values, costs))
+    sorted_values = values[order]
+    best_before = np.concatenate(([0.0], np.maximum.accumulate(sorted_values)[:-1]))
+    return order[(sorted_values > best_before) & (sorted_values > 0)]
+
+
+def upper_hull(costs: np.ndarray, values: np.ndarray) -> np.ndarray:
+
+    def point(index: int) -> Tuple[float, float]:
+        if index == IDLE:
+            return 0.0, 0.0
+        return float(costs[index]), float(values[index])
+
+    hull: List[int] = [IDLE]
+    for index in efficient_units(costs, values):
+        cost, value = point(index)
+        if hull == [IDLE] and cost == 0:
+            hull.pop()
+        while len(hull) >= 2:
+            first_cost, first_value = point(hull[-2])
+            middle_cost, middle_value = point(hull[-1])
+            if (middle_value - first_value) * (cost - first_cost) <= (value - first_value) * (middle_cost - first_cost):
+                hull.pop()
+            else:
+                break
+        hull.append(int(index))
+    return np.array(hull, dtype=np.int64)
+
+
+class RelaxedBound:
+
+    def __init__(self, costs: Sequence[int], values: Sequence[float], gold_value: float, treasury_space: int) -> None:
+        hull = upper_hull(np.array(costs, dtype=np.int64), np.array(values, dtype=np.float64))
+        self.__costs = [0 if index == IDLE else costs[index] for index in hull]
+        self.__values = [0.0 if index == IDLE else values[index] for index in hull]
+        self.__gold_value = gold_value
+        self.__treasury_space = treasury_space
+
+    def __unit_value(self, budget: float) -> float:
+        costs = self.__costs
+        position = bisect_right(costs, budget) - 1
+        if position < 0:
+            return 0.0
+        if position == len(costs) - 1:
+            return self.__values[position]
+        share = (budget - costs[position]) / (costs[position + 1] - costs[position])
+        return self.__values[position] + share * (self.__values[position + 1] - self.__values[position])
+
+    def value(self, citizens: int, gold: int) -> float:
+        # With fractional units the value is concave and piecewise linear in
+        # the gold spent, so its maximum lies on one of the breakpoints.
+        if citizens == 0:
+            return self.__gold_value * min(gold, self.__treasury_space)
+        budgets = [gold, max(0, gold - self.__treasury_space)]
+        budgets.extend(citizens * cost for cost in self.__costs if citizens * cost < gold)
+        return max(
+            citizens * self.__unit_value(budget / citizens)
+            + self.__gold_value * min(gold - budget, self.__treasury_space)
+            for budget in budgets
+        )
+
+
+def allocate(
+    units: Sequence[Unit],
+    citizens: int,
+    gold: int,
+    treasury_space: int,
+    weights: UnitWeights = UnitWeights(),
+    gold_value: float = 0.0
+) -> Allocation:
+    citizens = max(0, citizens)
+    gold = max(0, gold)
+    treasury_space = max(0, treasury_space)
+    costs = np.array([unit.total_item_price for unit in units], dtype=np.int64)
+    values = weights.values(units)
+    if len(units) == 0 or citizens == 0 or not np.any(values > 0):
+        return Allocation((), 0, min(gold, treasury_space), gold_value * min(gold, treasury_space))
+
+    # A unit that costs at least as much as another without being stronger
+    # is never needed, which leaves the units on the cost and value frontier.
+    # Branch and bound over them, bounding every branch by the relaxed value
+    # of the units that remain. Units the relaxation prices closest to their
+    # value come first so the early branches already find a good incumbent.
+    frontier = efficient_units(costs, values)
+    relaxed = RelaxedBound(
+        [int(costs[index]) for index in frontier], [float(values[index]) for index in frontier],
+        gold_value, treasury_space
+    )
+    relaxed_value = relaxed.value(citizens, gold)
+    citizen_price = relaxed.value(citizens + 1, gold) - relaxed_value
+    gold_price = relaxed.value(citizens, gold + 1) - relaxed_value
+    candidates = sorted(frontier, key=lambda index: citizen_price + gold_price * costs[index] - values[index])
+    candidate_costs = [int(costs[index]) for index in candidates]
+    candidate_values = [float(values[index]) for index in candidates]
+    bounds = [
+        RelaxedBound(candidate_costs[position:], candidate_values[position:], gold_value, treasury_space)
+        for position in range(len(candidates))
+    ]
+    quantities = [0] * len(candidates)
+    best_quantities = list(quantities)
+    best_value = gold_value * min(gold, treasury_space)
+
+    def search(position: int, citizens_left: int, gold_left: int, value: float) -> None:
+        nonlocal best_quantities, best_value
+        total = value + gold_value * min(gold_left, treasury_space)
+        if total > best_value + TOLERANCE:
+            best_value = total
+            best_quantities = list(quantities)
+        if position == len(candidates) or citizens_left == 0:
+            return
+        cost = candidate_costs[position]
+        unit_value = candidate_values[position]
+        rest = bounds[position + 1] if position + 1 < len(bounds) else None
+
+        def bound(quantity: int) -> float:
+            rest_gold = gold_left - quantity * cost
+            if rest is None:
+                return value + quantity * unit_value + gold_value * min(rest_gold, treasury_space)
+            return value + quantity * unit_value + rest.value(citizens_left - quantity, rest_gold)
+
+        # The bound is concave in the quantity, so search from its peak in
+        # both directions until it drops to the incumbent.
+        max_quantity = citizens_left if cost == 0 else min(citizens_left, gold_left // cost)
+        low, high = 0, max_quantity
+        while low < high:
+            middle = (low + high) // 2
+            if bound(middle) < bound(middle + 1):
+                low = middle + 1
+            else:
+                high = middle
+        for quantity_range in (range(low, max_quantity + 1), range(low - 1, -1, -1)):
+            for quantity in quantity_range:
+                if bound(quantity) <= best_value + TOLERANCE:
+                    break
+                quantities[position] = quantity
+                search(
+                    position + 1,
+                    citizens_left - quantity,
+                    gold_left - quantity * cost,
+                    value + quantity * unit_value
+                )
+        quantities[position] = 0
+
+    search(0, citizens, gold, 0.0)
+
+    gold_spent = sum(quantity * cost for quantity, cost in zip(best_quantities, candidate_costs))
+    deposit = min(gold - gold_spent, treasury_space)
+    return Allocation(
+        tuple(
+            (units[index], quantity)
+            for index, quantity in zip(candidates, best_quantities)
+            if quantity > 0
+        ),
+        gold_spent,
+        deposit,
+        sum(quantity * value for quantity, value in zip(best_quantities, candidate_values)) + gold_value * deposit
+    )
@@ -1,20 +1,383 @@
-from typing import List, Dict
+from typing import Any, AsyncIterator, Iterator, List, Dict, Optional, Tuple
 from models import (
     BattleResult,
     Entities,
     Item,
+    Mutation,
     Player,
+    PlayerTable,
+    RankedPlayers,
     Resources,
     Unit,
     UnitItem
 )
-from gql import Client, gql
+from gql import Client
 from gql.transport.aiohttp import AIOHTTPTransport
+from gql.transport.exceptions import (
+    TransportProtocolError,
+    TransportQueryError,
+    TransportServerError
+)
+from aiohttp import ClientResponseError
+from documents import CompiledDocument, documents
+from catalog import EntityCatalogCache
+from decoding import JSONDecoder, json_decoder
+from metrics import MetricsRegistry, http_trace_config, metrics
+from ratelimit import RequestGovernor
 from abc import ABC, abstractmethod
 from value_store import ValueStore
+import asyncio
 import os
 
 
+REFRESH_TOKEN_DOCUMENT = """
+    mutation {
+        refreshToken
+    }
+"""
+
+CITIZEN_PRICE_DOCUMENT = """
+    query {
+        recruitCitizenPrice
+    }
+"""
+
+PROFILE_RESOURCES_DOCUMENT = """
+    query {
+        viewerProfile {
+            housing {
+                citizens
+            }
+            resources {
+                gold
+                treasury
+            }
+            upgrades {
+                treasury {
+                    current {
+                        limit
+                    }
+                }
+            }
+        }
+    }
+"""
+
+RECRUIT_CITIZENS_DOCUMENT = """
+    mutation ($input: ActionRecruitCitizens!) {
+        actionRecruitCitizens(input: $input) {
+            citizens
+            max_citizens
+        }
+    }
+"""
+
+TRAIN_UNIT_DOCUMENT = """
+    mutation ($input: ActionTrainUnitInput!) {
+        actionTrainBuildingUnit(input: $input) {
+            id
+        }
+    }
+"""
+
+UNTRAIN_UNIT_DOCUMENT = """
+    mutation ($input: ActionUntrainUnitInput!) {
+        actionUntrainBuildingUnit(input: $input) {
+            id
+        }
+    }
+"""
+
+BUY_ITEMS_DOCUMENT = """
+    mutation ($input: ActionBuyItemsInput!) {
+        actionBuyItems(input: $input) {
+            owned_items {
+                item {
+                    id
+                    name
+                }
+                quantity
+            }
+        }
+    }
+"""
+
+ENTITIES_DOCUMENT = """
+    query {
+    buildings {
+        data {
+            units {
+                ...Unit
+            }
+            items {
+                ...Item
+            }
+        }
+    }
+    }
+
+    fragment Unit on Unit {
+        id
+        name
+        attack_strength
+        defense_strength
+        gold_proceeds
+        training_time {
+            totalSeconds
+        }
+        unit_items {
+            item {
+            ...Item
+            }
+            quantity
+        }
+    }
+
+    fragment Item on Item {
+        id
+        name
+        price
+    }
+"""
+
+DEPOSIT_TO_TREASURY_DOCUMENT = """
+    mutation ($input: ActionTreasuryTransferInput!) {
+        actionTreasuryDeposit(input: $input) {
+            id
+        }
+    }
+"""
+
+PLAYERS_DOCUMENT = """
+    query ($first: Int!) {
+        profiles(first: $first) {
+            data {
+                id
+                username
+                resources {
+                    gold
+                }
+            }
+        }
+    }
+"""
+
+PLAYERS_PAGE_DOCUMENT = """
+    query ($first: Int!, $page: Int!) {
+        profiles(first: $first, page: $page) {
+            paginatorInfo {
+                hasMorePages
+            }
+            data {
+                id
+                username
+                resources {
+                    gold
+                }
+            }
+        }
+    }
+"""
+
+ATTACK_PLAYER_DOCUMENT = """
+    mutation($input: ActionBattleInput!) {
+        actionBattle(input: $input) {
+            result
+            gold_stolen
+        }
+    }
+"""
+
+NOT_EXECUTED = "Not executed because an earlier mutation in its batch failed"
+
+
+def build_mutation_document(mutations: List[Mutation]) -> Tuple[str, Dict[str, Any]]:
+    definitions: List[str] = []
+    fields: List[str] = []
+    variables: Dict[str, Any] = {}
+    for index, mutation in enumerate(mutations):
+        alias = f"m{index}"
+        definitions.append(f"${alias}: {mutation.input_type}!")
+        fields.append(
+            f"{alias}: {mutation.field}(input: ${alias}) {{ {mutation.selection} }}")
+        variables[alias] = mutation.input
+    document = "mutation (%s) {\n%s\n}" % (
+        ", ".join(definitions),
+        "\n".join(fields)
+    )
+    return document, variables
+
+
+def first_failed_mutation(count: int, data: Optional[Dict], errors: Optional[List[Dict]]) -> Optional[int]:
+    # Mutation fields run one after the other and are non-null, so an error
+    # nulls the whole data and stops the fields after it from running.
+    if data is not None:
+        return None
+    aliases = {f"m{index}": index for index in range(count)}
+    return min((
+        aliases[error["path"][0]]
+        for error in errors or []
+        if error.get("path") and error["path"][0] in aliases
+    ), default=None)
+
+
+def map_mutation_results(
+    mutations: List[Mutation],
+    data: Optional[Dict],
+    errors: Optional[List[Dict]]
+) -> List[Tuple[Any, Optional[str]]]:
+    field_errors: Dict[str, str] = {}
+    global_error: Optional[str] = None
+    for error in errors or []:
+        path = error.get("path")
+        if path:
+            field_errors.setdefault(path[0], error.get("message"))
+        elif global_error is None:
+            global_error = error.get("message")
+    failed = first_failed_mutation(len(mutations), data, errors)
+    results: List[Tuple[Any, Optional[str]]] = []
+    for index in range(len(mutations)):
+        alias = f"m{index}"
+        if failed is not None:
+            if index < failed:
+                results.append((None, None))
+            elif index == failed:
+                results.append((None, field_errors[alias]))
+            else:
+                results.append((None, NOT_EXECUTED))
+            continue
+        field_data = data.get(alias) if data else None
+        error = field_errors.get(alias)
+        if error is None and field_data is None:
+            error = global_error or "No data returned"
+        results.append((field_data, error))
+    return results
+
+
+def is_persisted_query_not_found(errors: Optional[List[Dict]]) -> bool:
+    for error in errors or []:
+        code = (error.get("extensions") or {}).get("code")
+        if code == "PERSISTED_QUERY_NOT_FOUND" or error.get("message") == "PersistedQueryNotFound":
+            return True
+    return False
+
+
+def is_graphql_result(result: Any) -> bool:
+    return isinstance(result, dict) and ("errors" in result or "data" in result)
+
+
+def result_data(result: Dict) -> Dict:
+    if result.get("errors"):
+        raise TransportQueryError(
+            str(result["errors"][0]),
+            errors=result["errors"],
+            data=result.get("data")
+        )
+    return result["data"]
+
+
+def map_token(response) -> str:
+    token = response["refreshToken"]
+    return token
+
+
+def map_citizen_price(response) -> int:
+    price = response["recruitCitizenPrice"]
+    return price
+
+
+def map_profile_resources(response) -> Resources:
+    resources = Resources(
+        response["viewerProfile"]["housing"]["citizens"],
+        response["viewerProfile"]["resources"]["gold"],
+        response["viewerProfile"]["resources"]["treasury"],
+        response["viewerProfile"]["upgrades"]["treasury"]["current"]["limit"]
+    )
+    return resources
+
+
+def map_unit_item(response_unit_item) -> UnitItem:
+    response_item = response_unit_item["item"]
+    return UnitItem(
+        response_item["id"],
+        response_item["name"],
+        response_item["price"],
+        response_unit_item["quantity"]
+    )
+
+
+def map_unit(response_unit) -> Unit:
+    return Unit(
+        response_unit["id"],
+        response_unit["name"],
+        response_unit["training_time"]["totalSeconds"],
+        tuple(map(map_unit_item, response_unit["unit_items"])),
+        response_unit.get("attack_strength") or 0,
+        response_unit.get("defense_strength") or 0,
+        response_unit.get("gold_proceeds") or 0
+    )
+
+
+def map_item(response_item) -> Item:
+    return Item(
+        response_item["id"],
+        response_item["name"],
+        response_item["price"]
+    )
+
+
+def map_entities(response) -> Entities:
+    response_buildings = response["buildings"]["data"]
+    return Entities(
+        tuple(
+            map_unit(response_unit)
+            for response_building in response_buildings
+            for response_unit in response_building["units"]
+        ),
+        tuple(
+            map_item(response_item)
+            for response_building in response_buildings
+            for response_item in response_building["items"]
+        )
+    )
+
+
+def map_player(response_player) -> Player:
+    return Player(
+        response_player["id"],
+        response_player["username"],
+        response_player["resources"]["gold"]
+    )
+
+
+def map_players(response) -> List[Player]:
+    return list(map(map_player, response["profiles"]["data"]))
+
+
+def map_players_page(response) -> Tuple[List[Player], bool]:
+    players = map_players(response)
+    has_more_pages = response["profiles"]["paginatorInfo"]["hasMorePages"]
+    return players, has_more_pages
+
+
+def map_player_table_page(response, table: PlayerTable) -> Tuple[int, bool]:
+    response_players = response["profiles"]["data"]
+    for response_player in response_players:
+        table.append(
+            response_player["id"],
+            response_player["username"],
+            response_player["resources"]["gold"]
+        )
+    has_more_pages = response["profiles"]["paginatorInfo"]["hasMorePages"]
+    return len(response_players), has_more_pages
+
+
+def map_battle_result(response) -> BattleResult:
+    result = response["actionBattle"]["result"]
+    gold_stolen = response["actionBattle"]["gold_stolen"]
+    return BattleResult(result, gold_stolen)
+
+
 class API(ABC):
 
     @abstractmethod
@@ -57,15 +420,34 @@ class API(ABC):
     def get_players(self, first: int) -> List[Player]:
         pass
 
+    @abstractmethod
+    def get_players_page(self, first: int, page: int) -> Tuple[List[Player], bool]:
+        pass
+
     @abstractmethod
     def attack_player(self, id: int) -> BattleResult:
         pass
 
+    def iter_players(self, page_size: int, limit: Optional[int] = None) -> Iterator[Player]:
+        page = 1
+        count = 0
+        while True:
+            players, has_more_pages = self.get_players_page(page_size, page)
+            for player in players:
+                if limit is not None and count >= limit:
+                    return
+                count += 1
+                yield player
+            if not has_more_pages or not players:
+                return
+            page += 1
+
 
 class GraphQLAPI(API):
 
-    def __init__(self, value_store: ValueStore) -> None:
+    def __init__(self, value_store: ValueStore, entity_cache: Optional[EntityCatalogCache] = None) -> None:
         self.__value_store = value_store
+        self.__entity_cache = entity_cache
         self.__transport = AIOHTTPTransport(
             url=os.environ['API_ENDPOINT'],
             headers={
@@ -77,20 +459,8 @@ class GraphQLAPI(API):
         self.__client = Client(transport=self.__transport)
 
     def refresh_token(self) -> str:
-
-        def map(response) -> str:
-            token = response["refreshToken"]
-            return token
-
-        query = gql(
-            """
-                mutation {
-                    refreshToken
-                }
-            """
-        )
-        response = self.__client.execute(query)
-        token = map(response)
+        response = self.__client.execute(documents.get(REFRESH_TOKEN_DOCUMENT).document)
+        token = map_token(response)
         self.__value_store.update_value('token', token)
         self.__transport.headers = {
             "authorization": f"Bearer {token}",
@@ -98,295 +468,511 @@ class GraphQLAPI(API):
         return token
 
     def get_citizen_prize(self) -> int:
-
-        def map(response) -> int:
-            price = response["recruitCitizenPrice"]
-            return price
-
-        query = gql(
-            """
-                query {
-                    recruitCitizenPrice
-                }
-            """
-        )
-        response = self.__client.execute(query)
-        return map(response)
+        response = self.__client.execute(documents.get(CITIZEN_PRICE_DOCUMENT).document)
+        return map_citizen_price(response)
 
     def get_profile_resources(self) -> Resources:
-
-        def map(response) -> Resources:
-            resources = Resources(
-                response["viewerProfile"]["housing"]["citizens"],
-                response["viewerProfile"]["resources"]["gold"],
-                response["viewerProfile"]["resources"]["treasury"],
-                response["viewerProfile"]["upgrades"]["treasury"]["current"]["limit"]
-            )
-            return resources
-
-        query = gql(
-            """
-                query {
-                    viewerProfile {
-                        housing {
-                            citizens
-                        }
-                        resources {
-                            gold
-                            treasury
-                        }
-                        upgrades {
-                            treasury {
-                                current {
-                                    limit
-                                }
-                            }
-                        }
-                    }
-                }
-            """
-        )
-        response = self.__client.execute(query)
-        return map(response)
+        response = self.__client.execute(documents.get(PROFILE_RESOURCES_DOCUMENT).document)
+        return map_profile_resources(response)
 
     def recruit_citizen(self, amount: int) -> None:
-        query = gql(
-            """
-                mutation ($input: ActionRecruitCitizens!) {
-                    actionRecruitCitizens(input: $input) {
-                        citizens
-                        max_citizens
-                    }
-                }
-            """
-        )
         variables = {
             "input": {
                 "amount": amount
             }
         }
-        self.__client.execute(query, variable_values=variables)
+        self.__client.execute(
+            documents.get(RECRUIT_CITIZENS_DOCUMENT).document, variable_values=variables)
 
     def train_unit(self, unit_id: int, quantity: int) -> None:
-        query = gql(
-            """
-                mutation ($input: ActionTrainUnitInput!) {
-                    actionTrainBuildingUnit(input: $input) {
-                        id
-                    }
-                }
-            """
-        )
         variables = {
             "input": {
                 "id": unit_id,
                 "quantity": quantity
             }
         }
-        self.__client.execute(query, variable_values=variables)
+        self.__client.execute(
+            documents.get(TRAIN_UNIT_DOCUMENT).document, variable_values=variables)
 
     def untrain_unit(self, unit_id: int, quantity: int) -> None:
-        query = gql(
-            """
-                mutation ($input: ActionUntrainUnitInput!) {
-                    actionUntrainBuildingUnit(input: $input) {
-                        id
-                    }
-                }
-            """
-        )
         variables = {
             "input": {
                 "id": unit_id,
                 "quantity": quantity
             }
         }
-        self.__client.execute(query, variable_values=variables)
+        self.__client.execute(
+            documents.get(UNTRAIN_UNIT_DOCUMENT).document, variable_values=variables)
 
     def buy_items(self, items: List[Dict[str, int]]) -> None:
-        query = gql(
-            """
-                mutation ($input: ActionBuyItemsInput!) {
-                    actionBuyItems(input: $input) {
-                        owned_items {
-                            item {
-                                id
-                                name
-                            }
-                            quantity
-                        }
-                    }
-                }
-            """
-        )
         variables = {
             "input": {
                 "items": items
             }
         }
-        self.__client.execute(query, variable_values=variables)
+        self.__client.execute(
+            documents.get(BUY_ITEMS_DOCUMENT).document, variable_values=variables)
 
     def get_entities(self) -> Entities:
+        if self.__entity_cache is not None:
+            entities = self.__entity_cache.get()
+            if entities is not None:
+                return entities
+        response = self.__client.execute(documents.get(ENTITIES_DOCUMENT).document)
+        if self.__entity_cache is None:
+            return map_entities(response)
+        return self.__entity_cache.update(response)
 
-        def map(response) -> Entities:
-            units: List[Unit] = []
-            items: List[Item] = []
-            response_buildings = response["buildings"]["data"]
-            for response_building in response_buildings:
-                response_units = response_building["units"]
-                for response_unit in response_units:
-                    unit_items: List[UnitItem] = []
-                    response_items = response_unit["unit_items"]
-                    for response_item in response_items:
-                        unit_item = UnitItem(
-                            response_item["item"]["id"],
-                            response_item["item"]["name"],
-                            response_item["item"]["price"],
-                            response_item["quantity"]
-                        )
-                        unit_items.append(unit_item)
-                    unit = Unit(
-                        response_unit["id"],
-                        response_unit["name"],
-                        response_unit["training_time"]["totalSeconds"],
-                        unit_items
-                    )
-                    units.append(unit)
-                response_items = response_building["items"]
-                for response_item in response_items:
-                    item = Item(
-                        response_item["id"],
-                        response_item["name"],
-                        response_item["price"]
-                    )
-                    items.append(item)
-            return Entities(units, items)
-
-        query = gql(
-            """
-                query {
-                buildings {
-                    data {
-                        name
-                        main_type
-                        units {
-                            ...Unit
-                        }
-                        items {
-                            ...Item
-                        }
-                    }
-                }
-                }
+    def deposit_to_treasury(self, amount: int) -> None:
+        variables = {
+            "input": {
+                "amount": amount
+            }
+        }
+        self.__client.execute(
+            documents.get(DEPOSIT_TO_TREASURY_DOCUMENT).document, variable_values=variables)
 
-                fragment Unit on Unit {
-                    id
-                    name
-                    attack_strength
-                    defense_strength
-                    gold_proceeds
-                    training_time {
-                        totalSeconds
-                    }
-                    is_available
-                    unit_items {
-                        item {
-                        ...Item
-                        }
-                        quantity
-                    }
-                }
+    def get_players(self, first: int) -> List[Player]:
+        variables = {
+            "first": first
+        }
+        response = self.__client.execute(
+            documents.get(PLAYERS_DOCUMENT).document, variable_values=variables)
+        return map_players(response)
 
-                fragment Item on Item {
-                    id
-                    name
-                    price
-                }
-            """
+    def get_players_page(self, first: int, page: int) -> Tuple[List[Player], bool]:
+        variables = {
+            "first": first,
+            "page": page
+        }
+        response = self.__client.execute(
+            documents.get(PLAYERS_PAGE_DOCUMENT).document, variable_values=variables)
+        return map_players_page(response)
+
+    def attack_player(self, id: int) -> BattleResult:
+        variables = {
+            "input": {
+                "id": id
+            }
+        }
+        response = self.__client.execute(
+            documents.get(ATTACK_PLAYER_DOCUMENT).document, variable_values=variables)
+        return map_battle_result(response)
+
+
+class AsyncAPI(ABC):
+
+    @abstractmethod
+    async def refresh_token(self) -> str:
+        pass
+
+    async def reload_token(self) -> bool:
+        return False
+
+    @abstractmethod
+    async def get_citizen_prize(self) -> int:
+        pass
+
+    @abstractmethod
+    async def get_profile_resources(self) -> Resources:
+        pass
+
+    @abstractmethod
+    async def recruit_citizen(self, amount: int) -> None:
+        pass
+
+    @abstractmethod
+    async def train_unit(self, unit_id: int, quantity: int) -> None:
+        pass
+
+    @abstractmethod
+    async def untrain_unit(self, unit_id: int, quantity: int) -> None:
+        pass
+
+    @abstractmethod
+    async def buy_items(self, items: List[Dict[str, int]]) -> None:
+        pass
+
+    @abstractmethod
+    async def get_entities(self) -> Entities:
+        pass
+
+    @abstractmethod
+    async def deposit_to_treasury(self, amount: int) -> None:
+        pass
+
+    @abstractmethod
+    async def get_players(self, first: int) -> List[Player]:
+        pass
+
+    @abstractmethod
+    async def get_players_page(self, first: int, page: int) -> Tuple[List[Player], bool]:
+        pass
+
+    @abstractmethod
+    async def attack_player(self, id: int) -> BattleResult:
+        pass
+
+    @abstractmethod
+    async def execute_mutations(self, mutations: List[Mutation]) -> List[Tuple[Any, Optional[str]]]:
+        pass
+
+    async def fill_players_page(self, table: PlayerTable, first: int, page: int) -> Tuple[int, bool]:
+        players, has_more_pages = await self.get_players_page(first, page)
+        for player in players:
+            table.append(player.id, player.username, player.gold)
+        return len(players), has_more_pages
+
+    async def __fetch_players_page(self, first: int, page: int) -> Tuple[PlayerTable, int, bool]:
+        table = PlayerTable()
+        count, has_more_pages = await self.fill_players_page(table, first, page)
+        return table, count, has_more_pages
+
+    async def iter_player_pages(self, page_size: int, limit: Optional[int] = None) -> AsyncIterator[PlayerTable]:
+        page = 1
+        count = 0
+        next_page = asyncio.ensure_future(self.__fetch_players_page(page_size, page))
+        try:
+            while next_page is not None:
+                table, page_count, has_more_pages = await next_page
+                next_page = None
+                page += 1
+                if has_more_pages and page_count and (limit is None or count + page_count < limit):
+                    next_page = asyncio.ensure_future(
+                        self.__fetch_players_page(page_size, page))
+                if limit is not None:
+                    table.truncate(limit - count)
+                count += len(table)
+                yield table
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+
+    async def get_ranked_players(self, page_size: int, limit: Optional[int], k: int) -> RankedPlayers:
+        return await RankedPlayers.select_pages(self.iter_player_pages(page_size, limit), k)
+
+
+class AsyncGraphQLAPI(AsyncAPI):
+
+    def __init__(
+        self,
+        value_store: ValueStore,
+        entity_cache: Optional[EntityCatalogCache] = None,
+        metrics_registry: Optional[MetricsRegistry] = None,
+        governor: Optional[RequestGovernor] = None,
+        decoder: Optional[JSONDecoder] = None
+    ) -> None:
+        self.__value_store = value_store
+        self.__entity_cache = entity_cache
+        self.__governor = governor
+        self.__metrics_registry = metrics_registry
+        self.__decoder = decoder if decoder is not None else json_decoder()
+        self.__authorization = f"Bearer {value_store.get_value('token')}"
+        client_session_args = None
+        if metrics_registry is not None:
+            client_session_args = {
+                "trace_configs": [http_trace_config(metrics_registry)]
+            }
+        self.__transport = AIOHTTPTransport(
+            url=os.environ['API_ENDPOINT'],
+            headers={
+                "User-Agent": "okhttp/3.12.12",
+                "Content-Type": "application/json"
+            },
+            client_session_args=client_session_args
         )
-        response = self.__client.execute(query)
-        return map(response)
+        self.__client = Client(transport=self.__transport)
+        self.__session = None
+        self.__persisted_queries = os.environ.get(
+            'PERSISTED_QUERIES', 'false').lower() == 'true'
 
-    def deposit_to_treasury(self, amount: int) -> None:
-        query = gql(
-            """
-                mutation ($input: ActionTreasuryTransferInput!) {
-                    actionTreasuryDeposit(input: $input) {
-                        id
-                    }
-                }
-            """
+    async def __aenter__(self) -> "AsyncGraphQLAPI":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def connect(self) -> None:
+        if self.__session is None:
+            self.__session = await self.__client.__aenter__()
+
+    async def close(self) -> None:
+        if self.__session is not None:
+            await self.__client.__aexit__(None, None, None)
+            self.__session = None
+
+    async def __execute(self, document: str, variables: Dict = None) -> Dict:
+        await self.connect()
+        compiled = documents.get(document)
+        if self.__governor is None:
+            return await self.__execute_compiled(compiled, variables)
+        idempotent = compiled.is_query() or set(compiled.fields) <= self.__governor.safe_mutations
+        return await self.__governor.call(
+            lambda: self.__execute_compiled(compiled, variables),
+            idempotent,
+            compiled.key
         )
+
+    async def __execute_compiled(self, compiled: CompiledDocument, variables: Dict = None) -> Dict:
+        if self.__persisted_queries:
+            return await self.__execute_persisted(compiled, variables)
+        result = await self.__post({
+            "query": compiled.query,
+            "variables": variables or {}
+        })
+        return result_data(result)
+
+    def __decode(self, body: bytes) -> Any:
+        try:
+            if self.__metrics_registry is None:
+                return self.__decoder.loads(body)
+            with self.__metrics_registry.time("api_response_decode", decoder=self.__decoder.name):
+                return self.__decoder.loads(body)
+        except ValueError as e:
+            raise TransportProtocolError(
+                f"Server did not return a JSON result: {e}") from e
+
+    async def __post(self, payload: Dict) -> Dict:
+        async with self.__transport.session.post(
+            self.__transport.url,
+            json=payload,
+            headers={"authorization": self.__authorization}
+        ) as response:
+            body = await response.read()
+            try:
+                response.raise_for_status()
+                status_error = None
+            except ClientResponseError as e:
+                status_error = e
+        if status_error is not None:
+            # Keep the per-field errors of a GraphQL result sent with an error
+            # status, unless the server is overloaded and returned no data.
+            try:
+                result = self.__decode(body)
+            except TransportProtocolError:
+                result = None
+            if (
+                not is_graphql_result(result)
+                or ("data" not in result and (status_error.status == 429 or status_error.status >= 500))
+            ):
+                raise TransportServerError(str(status_error), status_error.status) from status_error
+            return result
+        result = self.__decode(body)
+        if not is_graphql_result(result):
+            raise TransportProtocolError(
+                f"Server did not return a GraphQL result: {result}")
+        return result
+
+    async def __execute_persisted(self, compiled: CompiledDocument, variables: Dict = None) -> Dict:
+        payload = {
+            "variables": variables or {},
+            "extensions": {
+                "persistedQuery": {
+                    "version": 1,
+                    "sha256Hash": compiled.sha256_hash
+                }
+            }
+        }
+        result = await self.__post(payload)
+        if is_persisted_query_not_found(result.get("errors")):
+            payload["query"] = compiled.query
+            result = await self.__post(payload)
+        return result_data(result)
+
+    async def refresh_token(self) -> str:
+        response = await self.__execute(REFRESH_TOKEN_DOCUMENT)
+        token = map_token(response)
+        await asyncio.to_thread(self.__value_store.update_value, 'token', token)
+        self.__authorization = f"Bearer {token}"
+        return token
+
+    async def reload_token(self) -> bool:
+        token = await asyncio.to_thread(self.__value_store.read_value, 'token')
+        if token is None or self.__authorization == f"Bearer {token}":
+            return False
+        self.__authorization = f"Bearer {token}"
+        return True
+
+    async def get_citizen_prize(self) -> int:
+        response = await self.__execute(CITIZEN_PRICE_DOCUMENT)
+        return map_citizen_price(response)
+
+    async def get_profile_resources(self) -> Resources:
+        response = await self.__execute(PROFILE_RESOURCES_DOCUMENT)
+        return map_profile_resources(response)
+
+    async def recruit_citizen(self, amount: int) -> None:
         variables = {
             "input": {
                 "amount": amount
             }
         }
-        self.__client.execute(query, variable_values=variables)
+        await self.__execute(RECRUIT_CITIZENS_DOCUMENT, variables)
 
-    def get_players(self, first: int) -> List[Player]:
+    async def train_unit(self, unit_id: int, quantity: int) -> None:
+        variables = {
+            "input": {
+                "id": unit_id,
+                "quantity": quantity
+            }
+        }
+        await self.__execute(TRAIN_UNIT_DOCUMENT, variables)
 
-        def map(response) -> List[Player]:
-            response_players = response["profiles"]["data"]
-            players: List = []
-            for response_player in response_players:
-                players.append(
-                    Player(
-                        response_player["id"],
-                        response_player["username"],
-                        response_player["resources"]["gold"]
-                    )
-                )
-            return players
-
-        query = gql(
-            """
-                query ($first: Int!) {
-                    profiles(first: $first) {
-                        data {
-                            id
-                            username
-                            resources {
-                                gold
-                            }
-                        }
-                    }
-                }
-            """
-        )
+    async def untrain_unit(self, unit_id: int, quantity: int) -> None:
+        variables = {
+            "input": {
+                "id": unit_id,
+                "quantity": quantity
+            }
+        }
+        await self.__execute(UNTRAIN_UNIT_DOCUMENT, variables)
+
+    async def buy_items(self, items: List[Dict[str, int]]) -> None:
+        variables = {
+            "input": {
+                "items": items
+            }
+        }
+        await self.__execute(BUY_ITEMS_DOCUMENT, variables)
+
+    async def get_entities(self) -> Entities:
+        if self.__entity_cache is not None:
+            entities = await asyncio.to_thread(self.__entity_cache.get)
+            if entities is not None:
+                return entities
+        response = await self.__execute(ENTITIES_DOCUMENT)
+        if self.__entity_cache is None:
+            return map_entities(response)
+        return await asyncio.to_thread(self.__entity_cache.update, response)
+
+    async def deposit_to_treasury(self, amount: int) -> None:
+        variables = {
+            "input": {
+                "amount": amount
+            }
+        }
+        await self.__execute(DEPOSIT_TO_TREASURY_DOCUMENT, variables)
+
+    async def get_players(self, first: int) -> List[Player]:
         variables = {
             "first": first
         }
-        response = self.__client.execute(query, variable_values=variables)
-        return map(response)
+        response = await self.__execute(PLAYERS_DOCUMENT, variables)
+        return map_players(response)
 
-    def attack_player(self, id: int) -> BattleResult:
+    async def get_players_page(self, first: int, page: int) -> Tuple[List[Player], bool]:
+        variables = {
+            "first": first,
+            "page": page
+        }
+        response = await self.__execute(PLAYERS_PAGE_DOCUMENT, variables)
+        return map_players_page(response)
 
-        def map(response) -> BattleResult:
-            result = response["actionBattle"]["result"]
-            gold_stolen = response["actionBattle"]["gold_stolen"]
-            return BattleResult(result, gold_stolen)
-
-        query = gql(
-            """
-                mutation($input: ActionBattleInput!) {
-                    actionBattle(input: $input) {
-                        result
-                        gold_stolen
-                    }
-                }
-            """
-        )
+    async def fill_players_page(self, table: PlayerTable, first: int, page: int) -> Tuple[int, bool]:
+        variables = {
+            "first": first,
+            "page": page
+        }
+        response = await self.__execute(PLAYERS_PAGE_DOCUMENT, variables)
+        return map_player_table_page(response, table)
+
+    async def attack_player(self, id: int) -> BattleResult:
         variables = {
             "input": {
                 "id": id
             }
         }
-        response = self.__client.execute(query, variable_values=variables)
-        return map(response)
+        response = await self.__execute(ATTACK_PLAYER_DOCUMENT, variables)
+        return map_battle_result(response)
+
+    async def execute_mutations(self, mutations: List[Mutation]) -> List[Tuple[Any, Optional[str]]]:
+        document, variables = build_mutation_document(mutations)
+        try:
+            response = await self.__execute(document, variables)
+            return map_mutation_results(mutations, response, None)
+        except TransportQueryError as e:
+            results = map_mutation_results(mutations, e.data, e.errors)
+            failed = first_failed_mutation(len(mutations), e.data, e.errors)
+        if failed is not None and failed + 1 < len(mutations):
+            results[failed + 1:] = await self.execute_mutations(mutations[failed + 1:])
+        return results
+
+
+class InstrumentedAsyncAPI(AsyncAPI):
+
+    def __init__(self, api: AsyncAPI, registry: MetricsRegistry = metrics) -> None:
+        self.__api = api
+        self.__registry = registry
 
+    async def refresh_token(self) -> str:
+        with self.__registry.time("api_call", method="refresh_token"):
+            return await self.__api.refresh_token()
 
-class MockAPI(ABC):
+    async def reload_token(self) -> bool:
+        return await self.__api.reload_token()
+
+    async def get_citizen_prize(self) -> int:
+        with self.__registry.time("api_call", method="get_citizen_prize"):
+            return await self.__api.get_citizen_prize()
+
+    async def get_profile_resources(self) -> Resources:
+        with self.__registry.time("api_call", method="get_profile_resources"):
+            return await self.__api.get_profile_resources()
+
+    async def recruit_citizen(self, amount: int) -> None:
+        with self.__registry.time("api_call", method="recruit_citizen"):
+            await self.__api.recruit_citizen(amount)
+
+    async def train_unit(self, unit_id: int, quantity: int) -> None:
+        with self.__registry.time("api_call", method="train_unit"):
+            await self.__api.train_unit(unit_id, quantity)
+
+    async def untrain_unit(self, unit_id: int, quantity: int) -> None:
+        with self.__registry.time("api_call", method="untrain_unit"):
+            await self.__api.untrain_unit(unit_id, quantity)
+
+    async def buy_items(self, items: List[Dict[str, int]]) -> None:
+        with self.__registry.time("api_call", method="buy_items"):
+            await self.__api.buy_items(items)
+
+    async def get_entities(self) -> Entities:
+        with self.__registry.time("api_call", method="get_entities"):
+            return await self.__api.get_entities()
+
+    async def deposit_to_treasury(self, amount: int) -> None:
+        with self.__registry.time("api_call", method="deposit_to_treasury"):
+            await self.__api.deposit_to_treasury(amount)
+
+    async def get_players(self, first: int) -> List[Player]:
+        with self.__registry.time("api_call", method="get_players"):
+            return await self.__api.get_players(first)
+
+    async def get_players_page(self, first: int, page: int) -> Tuple[List[Player], bool]:
+        with self.__registry.time("api_call", method="get_players_page"):
+            return await self.__api.get_players_page(first, page)
+
+    async def fill_players_page(self, table: PlayerTable, first: int, page: int) -> Tuple[int, bool]:
+        with self.__registry.time("api_call", method="get_players_page"):
+            return await self.__api.fill_players_page(table, first, page)
+
+    async def attack_player(self, id: int) -> BattleResult:
+        with self.__registry.time("api_call", method="attack_player"):
+            return await self.__api.attack_player(id)
+
+    async def execute_mutations(self, mutations: List[Mutation]) -> List[Tuple[Any, Optional[str]]]:
+        with self.__registry.time("api_call", method="execute_mutations"):
+            results = await self.__api.execute_mutations(mutations)
+        self.__registry.observe(
+            "api_mutation_batch_size", len(mutations), (1, 2, 4, 8, 16, 32, 64))
+        self.__registry.increment(
+            "api_mutation_errors_total",
+            sum(1 for _, error in results if error is not None)
+        )
+        return results
+
+
+class MockAPI(API):
 
     def refresh_token(self) -> str:
         print(f"Mock API -- Refreshing token...")
@@ -448,6 +1034,12 @@ class MockAPI(ABC):
         ]
         return players
 
+    def get_players_page(self, first: int, page: int) -> Tuple[List[Player], bool]:
+        print(f"Mock API -- Getting players page {page}...")
+        players = self.get_players(first)
+        start = (page - 1) * first
+        return players[start:start + first], start + first < len(players)
+
     def attack_player(self, id: int) -> BattleResult:
         print(f"Mock API -- Attack player with id {id}...")
         return BattleResult("Success", 50_000)
@@ -0,0 +1,208 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from action import ActionResult, AttackPlayerAction
+from api import AsyncAPI
+from history import BattleRecord
+from metrics import metrics
+from models import BattleResult, Player, RankedPlayers, player_gold
+import asyncio
+import time
+
+
+@dataclass
+class TargetStats:
+    attempts: int = 0
+    wins: int = 0
+    steal_fraction: Optional[float] = None
+
+
+class BattleHistory:
+
+    def __init__(self, prior_weight: float = 2.0, smoothing: float = 0.3) -> None:
+        self.__prior_weight = prior_weight
+        self.__smoothing = smoothing
+        self.__targets: Dict[int, TargetStats] = {}
+        self.__overall = TargetStats()
+
+    def __update(self, stats: TargetStats, won: bool, fraction: Optional[float]) -> None:
+        stats.attempts += 1
+        if won:
+            stats.wins += 1
+            if fraction is not None:
+                if stats.steal_fraction is None:
+                    stats.steal_fraction = fraction
+                else:
+                    stats.steal_fraction += self.__smoothing * (fraction - stats.steal_fraction)
+
+    def record(self, player_id: int, gold_before: int, result: BattleResult) -> None:
+        won = (result.gold_stolen or 0) > 0
+        fraction = result.gold_stolen / gold_before if won and gold_before > 0 else None
+        self.__update(self.__targets.setdefault(player_id, TargetStats()), won, fraction)
+        self.__update(self.__overall, won, fraction)
+
+    def load(self, battles: List[BattleRecord]) -> None:
+        for battle in sorted(battles, key=lambda battle: battle.timestamp):
+            self.record(
+                battle.player_id,
+                battle.gold_before,
+                BattleResult(battle.result, battle.gold_stolen)
+            )
+
+    def record_results(self, players: RankedPlayers, results: List[ActionResult]) -> None:
+        players_by_id = {player.id: player for player in players}
+        for result in results:
+            if not isinstance(result.action, AttackPlayerAction) or not result.succeeded():
+                continue
+            player = players_by_id.get(result.action.id)
+            battle_result = to_battle_result(result.data)
+            if player is not None and battle_result is not None:
+                self.record(player.id, player_gold(player), battle_result)
+
+    def stats(self, player_id: int) -> TargetStats:
+        return self.__targets.get(player_id, TargetStats())
+
+    def win_probability(self, player_id: int) -> float:
+        overall = (self.__overall.wins + 1) / (self.__overall.attempts + 2)
+        stats = self.stats(player_id)
+        return (stats.wins + self.__prior_weight * overall) / (stats.attempts + self.__prior_weight)
+
+    def steal_fraction(self, player_id: int) -> float:
+        stats = self.stats(player_id)
+        if stats.steal_fraction is not None:
+            return stats.steal_fraction
+        if self.__overall.steal_fraction is not None:
+            return self.__overall.steal_fraction
+        return 0.1
+
+    def expected_gold(self, player: Player, gold: Optional[int] = None) -> float:
+        if gold is None:
+            gold = player_gold(player)
+        return gold * self.win_probability(player.id) * self.steal_fraction(player.id)
+
+
+class AttackPlanner:
+
+    def __init__(self, history: BattleHistory, min_expected_gold: float = 0) -> None:
+        self.__history = history
+        self.__min_expected_gold = min_expected_gold
+
+    @property
+    def history(self) -> BattleHistory:
+        return self.__history
+
+    def rank(
+        self,
+        players: List[Player],
+        excluded: Set[int] = frozenset(),
+        gold: Optional[Dict[int, int]] = None
+    ) -> List[Tuple[Player, float]]:
+        gold = gold or {}
+        ranked = [
+            (player, self.__history.expected_gold(player, gold.get(player.id)))
+            for player in players
+            if player.id not in excluded
+        ]
+        ranked = [
+            (player, expected) for player, expected in ranked
+            if expected > self.__min_expected_gold
+        ]
+        ranked.sort(key=lambda ranking: ranking[1], reverse=True)
+        return ranked
+
+
+class AttackRunner:
+
+    def __init__(
+        self,
+        planner: AttackPlanner,
+        max_attacks: int = 10,
+        max_attacks_per_target: int = 1,
+        max_concurrency: int = 4,
+        candidates: int = 25,
+        window: float = 60.0,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.__planner = planner
+        self.__max_attacks = max_attacks
+        self.__max_attacks_per_target = max_attacks_per_target
+        self.__max_concurrency = max_concurrency
+        self.__candidates = candidates
+        self.__window = window
+        self.__clock = clock
+
+    @property
+    def candidates(self) -> int:
+        return self.__candidates
+
+    async def __attack(self, api: AsyncAPI, player: Player, gold_before: int) -> Tuple[Player, int, ActionResult]:
+        action = AttackPlayerAction(player.id)
+        try:
+            with metrics.time("attack"):
+                return player, gold_before, ActionResult(action, await action.execute_async(api))
+        except Exception as e:
+            return player, gold_before, ActionResult(action, error=str(e))
+
+    def __next_target(
+        self,
+        players: List[Player],
+        attacks: Dict[int, int],
+        in_flight: Set[int],
+        gold: Dict[int, int]
+    ) -> Optional[Player]:
+        excluded = in_flight | {
+            player_id for player_id, count in attacks.items()
+            if count >= self.__max_attacks_per_target
+        }
+        ranked = self.__planner.rank(players, excluded, gold)
+        return ranked[0][0] if ranked else None
+
+    async def run(self, api: AsyncAPI, players: RankedPlayers) -> Tuple[List[ActionResult], List[str]]:
+        deadline = self.__clock() + self.__window
+        candidates = list(players)
+        attacks: Dict[int, int] = {}
+        gold: Dict[int, int] = {}
+        in_flight_targets: Set[int] = set()
+        pending: Set["asyncio.Future"] = set()
+        results: List[ActionResult] = []
+        logs: List[str] = []
+        launched = 0
+
+        while True:
+            while (
+                launched < self.__max_attacks
+                and len(pending) < self.__max_concurrency
+                and self.__clock() < deadline
+            ):
+                target = self.__next_target(candidates, attacks, in_flight_targets, gold)
+                if target is None:
+                    break
+                attacks[target.id] = attacks.get(target.id, 0) + 1
+                in_flight_targets.add(target.id)
+                pending.add(asyncio.ensure_future(
+                    self.__attack(api, target, gold.get(target.id, player_gold(target)))))
+                launched += 1
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                player, gold_before, result = future.result()
+                in_flight_targets.discard(player.id)
+                results.append(result)
+                battle_result = to_battle_result(result.data)
+                if not result.succeeded() or battle_result is None:
+                    continue
+                self.__planner.history.record(player.id, gold_before, battle_result)
+                gold_stolen = battle_result.gold_stolen or 0
+                gold[player.id] = max(0, gold.get(player.id, player_gold(player)) - gold_stolen)
+                metrics.increment("attack_gold_stolen_total", gold_stolen)
+                logs.append(
+                    f"Attacked {player.username}: {battle_result.result}, stole {gold_stolen} gold")
+        return results, logs
+
+
+def to_battle_result(data: Any) -> Optional[BattleResult]:
+    if isinstance(data, BattleResult):
+        return data
+    if isinstance(data, dict):
+        return BattleResult(data.get("result"), data.get("gold_stolen") or 0)
+    return None
@@ -0,0 +1,240 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Sequence, Union
+from models import Entities, RankedPlayers, Resources, player_gold
+import numpy as np
+
+ArrayLike = Union[int, float, Sequence, np.ndarray]
+
+
+@dataclass
+class ResourceArrays:
+    citizens: np.ndarray
+    gold: np.ndarray
+    treasury: np.ndarray
+    treasury_limit: np.ndarray
+    has_treasury_limit: np.ndarray
+    highest_player_gold: np.ndarray
+    has_players: np.ndarray
+
+    @classmethod
+    def from_resources(
+        cls,
+        resources: Sequence[Resources],
+        players: Sequence[RankedPlayers]
+    ) -> "ResourceArrays":
+        highest_players = [ranked.highest() for ranked in players]
+        return cls(
+            np.array([r.citizens for r in resources], dtype=np.int64),
+            np.array([r.gold for r in resources], dtype=np.int64),
+            np.array([r.treasury for r in resources], dtype=np.int64),
+            np.array([
+                0 if r.treasury_limit is None else r.treasury_limit
+                for r in resources
+            ], dtype=np.int64),
+            np.array([r.treasury_limit is not None for r in resources]),
+            np.array([
+                0 if player is None else player_gold(player)
+                for player in highest_players
+            ], dtype=np.int64),
+            np.array([player is not None for player in highest_players])
+        )
+
+    def repeat(self, count: int) -> "ResourceArrays":
+        return ResourceArrays(
+            np.repeat(self.citizens, count),
+            np.repeat(self.gold, count),
+            np.repeat(self.treasury, count),
+            np.repeat(self.treasury_limit, count),
+            np.repeat(self.has_treasury_limit, count),
+            np.repeat(self.highest_player_gold, count),
+            np.repeat(self.has_players, count)
+        )
+
+    def __len__(self) -> int:
+        return len(self.gold)
+
+
+@dataclass
+class BatchStrategyPlan:
+    citizens: np.ndarray
+    gold: np.ndarray
+    treasury: np.ndarray
+    quantities: Dict[str, np.ndarray] = field(default_factory=dict)
+
+
+@dataclass
+class BatchPlan:
+    resources: ResourceArrays
+    citizens: np.ndarray
+    gold: np.ndarray
+    treasury: np.ndarray
+    quantities: List[Dict[str, np.ndarray]]
+
+
+def broadcast(values: ArrayLike, size: int, dtype=None) -> np.ndarray:
+    return np.broadcast_to(np.asarray(values, dtype=dtype), (size,))
+
+
+def floor_int(values: np.ndarray) -> np.ndarray:
+    return np.floor(values).astype(np.int64)
+
+
+class BatchStrategy(ABC):
+
+    def plan(self, entities: Entities, resources: ResourceArrays) -> BatchStrategyPlan:
+        size = len(resources)
+        plan = BatchStrategyPlan(
+            np.zeros(size, dtype=np.int64),
+            np.zeros(size, dtype=np.int64),
+            np.zeros(size, dtype=np.int64)
+        )
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self._plan(entities, resources, plan)
+        return plan
+
+    @abstractmethod
+    def _plan(self, entities: Entities, resources: ResourceArrays, plan: BatchStrategyPlan) -> None:
+        pass
+
+
+class BatchSkipGoldStrategy(BatchStrategy):
+
+    def __init__(self, percentage: ArrayLike) -> None:
+        self.__percentage = percentage
+
+    def _plan(self, entities: Entities, resources: ResourceArrays, plan: BatchStrategyPlan) -> None:
+        percentage = broadcast(self.__percentage, len(resources))
+        gold_skip = floor_int(resources.gold * percentage / 100)
+        plan.gold -= gold_skip
+        plan.quantities["skip_gold"] = gold_skip
+
+
+class BatchSkipGoldRelativeToPlayersStrategy(BatchStrategy):
+
+    def __init__(self, percentage: ArrayLike) -> None:
+        self.__percentage = percentage
+
+    def _plan(self, entities: Entities, resources: ResourceArrays, plan: BatchStrategyPlan) -> None:
+        percentage = broadcast(self.__percentage, len(resources))
+        gold_skip = np.minimum(
+            floor_int(resources.highest_player_gold * percentage / 100),
+            resources.gold
+        )
+        gold_skip = np.where(resources.has_players, gold_skip, 0)
+        plan.gold -= gold_skip
+        plan.quantities["skip_gold"] = gold_skip
+
+
+class BatchTrainMaxUnitStrategy(BatchStrategy):
+
+    def __init__(self, unit_names: Union[str, Sequence[str]], with_items: ArrayLike = True) -> None:
+        self.__unit_names = unit_names
+        self.__with_items = with_items
+
+    def _plan(self, entities: Entities, resources: ResourceArrays, plan: BatchStrategyPlan) -> None:
+        size = len(resources)
+        unit_names = broadcast(np.asarray(self.__unit_names, dtype=str), size)
+        with_items = broadcast(self.__with_items, size, dtype=bool)
+        names, choice = np.unique(unit_names, return_inverse=True)
+        units = [entities.unit_by_name(name) for name in names]
+        found = np.array([unit is not None for unit in units], dtype=bool)[choice]
+        price = np.array([
+            0 if unit is None else unit.total_item_price
+            for unit in units
+        ], dtype=np.int64)[choice]
+        has_items = np.array([
+            unit is not None and unit.has_items()
+            for unit in units
+        ], dtype=bool)[choice]
+        unit_ids = np.array([
+            -1 if unit is None else unit.id
+            for unit in units
+        ], dtype=np.int64)[choice]
+
+        active = found & (resources.citizens > 0)
+        buying = active & has_items & with_items
+        max_units = np.minimum(
+            floor_int(np.where(buying, resources.gold / np.where(buying, price, 1), 0)),
+            resources.citizens
+        )
+        buying &= max_units > 0
+        bought = np.where(buying, max_units, 0)
+        without_items = active & ~(has_items & with_items)
+        trained = np.where(without_items, resources.citizens, bought)
+
+        plan.gold -= price * bought
+        plan.citizens -= trained
+        plan.quantities["unit_id"] = unit_ids
+        plan.quantities["buy_items_for_units"] = bought
+        plan.quantities["train"] = trained
+
+
+class BatchDepositMaxGoldInTreasuryStrategy(BatchStrategy):
+
+    def _plan(self, entities: Entities, resources: ResourceArrays, plan: BatchStrategyPlan) -> None:
+        max_deposit = np.where(
+            resources.has_treasury_limit,
+            np.minimum(resources.treasury_limit - resources.treasury, resources.gold),
+            resources.gold
+        )
+        deposit = np.where(max_deposit > 0, max_deposit, 0)
+        plan.gold -= deposit
+        plan.treasury += deposit
+        plan.quantities["deposit"] = deposit
+
+
+class BatchBuyMaxItemStrategy(BatchStrategy):
+
+    def __init__(self, item_name: str) -> None:
+        self.__item_name = item_name
+
+    def _plan(self, entities: Entities, resources: ResourceArrays, plan: BatchStrategyPlan) -> None:
+        item = entities.item_by_name(self.__item_name)
+        quantity = np.zeros(len(resources), dtype=np.int64)
+        if item is not None:
+            max_items = floor_int(resources.gold / item.price)
+            quantity = np.where(max_items > 0, max_items, 0)
+            plan.gold -= item.price * quantity
+        plan.quantities["buy_items"] = quantity
+
+
+class BatchBuyMaxItemsForUnitStrategy(BatchStrategy):
+
+    def __init__(self, unit_name: str) -> None:
+        self.__unit_name = unit_name
+
+    def _plan(self, entities: Entities, resources: ResourceArrays, plan: BatchStrategyPlan) -> None:
+        unit = entities.unit_by_name(self.__unit_name)
+        quantity = np.zeros(len(resources), dtype=np.int64)
+        if unit is not None:
+            max_quantity = floor_int(resources.gold / unit.total_item_price)
+            quantity = np.where(max_quantity > 0, max_quantity, 0)
+            plan.gold -= unit.total_item_price * quantity
+        plan.quantities["buy_items_for_units"] = quantity
+
+
+class BatchPlanner:
+
+    def __init__(self, strategies: List[BatchStrategy]) -> None:
+        self.__strategies = strategies
+
+    def plan(self, entities: Entities, resources: ResourceArrays) -> BatchPlan:
+        size = len(resources)
+        citizens = np.zeros(size, dtype=np.int64)
+        gold = np.zeros(size, dtype=np.int64)
+        treasury = np.zeros(size, dtype=np.int64)
+        quantities: List[Dict[str, np.ndarray]] = []
+        for strategy in self.__strategies:
+            strategy_plan = strategy.plan(entities, resources)
+            resources = replace(
+                resources,
+                citizens=resources.citizens + strategy_plan.citizens,
+                gold=resources.gold + strategy_plan.gold,
+                treasury=resources.treasury + strategy_plan.treasury
+            )
+            citizens += strategy_plan.citizens
+            gold += strategy_plan.gold
+            treasury += strategy_plan.treasury
+            quantities.append(strategy_plan.quantities)
+        return BatchPlan(resources, citizens, gold, treasury, quantities)
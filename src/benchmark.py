@@ -0,0 +1,254 @@
+from dataclasses import dataclass, replace
+from typing import Awaitable, Callable, List, Optional
+from api import map_entities, map_player_table_page, result_data
+from decoding import available_decoders
+from executor import AsyncActionExecutor, BatchingActionExecutor, SimpleAsyncActionExecutor
+from notifier import EmptyNotifier
+from runner import (
+    PLAYER_PAGE_SIZE,
+    RANKED_PLAYER_COUNT,
+    AsyncStrategyRunner,
+    plan_strategies
+)
+from models import PlayerTable
+from simulation import SimulatedAPI, SimulatedAPIError, SimulationConfig, SimulatedGame
+from strategy import (
+    DepositMaxGoldInTreasuryStrategy,
+    SkipGoldStrategy,
+    Strategy,
+    TrainMaxUnitStrategy
+)
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import time
+import tracemalloc
+
+
+@dataclass
+class BenchmarkReport:
+    name: str
+    ticks: int
+    seconds: float
+    p50: float
+    p99: float
+    peak_bytes_per_tick: Optional[int]
+
+    @property
+    def ticks_per_second(self) -> float:
+        return self.ticks / self.seconds if self.seconds > 0 else float("inf")
+
+    def __str__(self) -> str:
+        report = (
+            f"{self.name:<24} {self.ticks_per_second:>10.1f} ticks/s"
+            f"  p50 {self.p50 * 1000:>8.3f} ms  p99 {self.p99 * 1000:>8.3f} ms"
+        )
+        if self.peak_bytes_per_tick is not None:
+            report += f"  peak {self.peak_bytes_per_tick / 1024:>8.1f} KiB/tick"
+        return report
+
+
+def percentile(values: List[float], percentage: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(percentage / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def simulation_strategies(api: SimulatedAPI) -> Callable[[], List[Strategy]]:
+    unit_name = next(
+        (unit["name"]
+         for building in api.game.buildings
+         for unit in building["units"]
+         if unit["unit_items"]),
+        "Unit 0"
+    )
+
+    def strategies() -> List[Strategy]:
+        return [
+            SkipGoldStrategy(10),
+            TrainMaxUnitStrategy(unit_name),
+            DepositMaxGoldInTreasuryStrategy()
+        ]
+
+    return strategies
+
+
+async def measure(
+    name: str,
+    ticks: int,
+    tick: Callable[[], Awaitable[None]],
+    allocations: bool
+) -> BenchmarkReport:
+    durations: List[float] = []
+    peaks: List[int] = []
+    if allocations:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        for _ in range(ticks):
+            if allocations:
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+            tick_started = time.perf_counter()
+            await tick()
+            durations.append(time.perf_counter() - tick_started)
+            if allocations:
+                peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        if allocations:
+            tracemalloc.stop()
+    seconds = time.perf_counter() - started
+    return BenchmarkReport(
+        name,
+        ticks,
+        seconds,
+        percentile(durations, 50),
+        percentile(durations, 99),
+        round(sum(peaks) / len(peaks)) if peaks else None
+    )
+
+
+async def benchmark_planning(config: SimulationConfig, ticks: int, allocations: bool) -> BenchmarkReport:
+    api = SimulatedAPI(replace(config, latency=0.0, latency_jitter=0.0, failure_rate=0.0))
+    strategies = simulation_strategies(api)
+    entities = await api.get_entities()
+    players = await api.get_ranked_players(PLAYER_PAGE_SIZE, None, RANKED_PLAYER_COUNT)
+
+    async def tick() -> None:
+        resources = await api.get_profile_resources()
+        plan_strategies(strategies(), entities, resources, players)
+
+    return await measure("planning", ticks, tick, allocations)
+
+
+async def benchmark_decoding(config: SimulationConfig, ticks: int, allocations: bool) -> List[BenchmarkReport]:
+    game = SimulatedGame(config)
+    entities_body = json.dumps({"data": game.buildings_response()}).encode()
+    player_bodies = [
+        json.dumps({"data": game.players_response(PLAYER_PAGE_SIZE, page)}).encode()
+        for page in range(1, -(-len(game.players) // PLAYER_PAGE_SIZE) + 1)
+    ]
+    payload_bytes = len(entities_body) + sum(len(body) for body in player_bodies)
+    print(f"{'':<24} {payload_bytes / 1024:.1f} KiB of responses per tick")
+    reports: List[BenchmarkReport] = []
+    for decoder in available_decoders():
+
+        async def tick() -> None:
+            map_entities(result_data(decoder.loads(entities_body)))
+            table = PlayerTable()
+            for body in player_bodies:
+                map_player_table_page(result_data(decoder.loads(body)), table)
+
+        reports.append(await measure(f"decode/{decoder.name}", ticks, tick, allocations))
+    return reports
+
+
+async def benchmark_runner(
+    name: str,
+    config: SimulationConfig,
+    executor_factory: Callable[[SimulatedAPI], AsyncActionExecutor],
+    ticks: int,
+    player_scan_limit: Optional[int],
+    allocations: bool
+) -> BenchmarkReport:
+    api = SimulatedAPI(config)
+    runner = AsyncStrategyRunner(
+        api,
+        executor_factory(api),
+        EmptyNotifier(),
+        player_scan_limit=player_scan_limit,
+        strategies=simulation_strategies(api)
+    )
+
+    async def tick() -> None:
+        api.game.next_tick()
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                await runner.run_main_strategies()
+            except SimulatedAPIError:
+                pass
+
+    report = await measure(name, ticks, tick, allocations)
+    print(f"{'':<24} {api.requests} requests, {api.failures} injected failures")
+    return report
+
+
+async def run_benchmarks(
+    config: SimulationConfig,
+    ticks: int,
+    player_scan_limit: Optional[int],
+    allocations: bool
+) -> List[BenchmarkReport]:
+    reports: List[BenchmarkReport] = []
+    for report in await benchmark_decoding(config, max(1, ticks // 10), allocations):
+        print(report)
+        reports.append(report)
+    for benchmark in (
+        benchmark_planning(config, ticks, allocations),
+        benchmark_runner(
+            "tick/simple executor",
+            config,
+            SimpleAsyncActionExecutor,
+            ticks,
+            player_scan_limit,
+            allocations
+        ),
+        benchmark_runner(
+            "tick/batching executor",
+            config,
+            BatchingActionExecutor,
+            ticks,
+            player_scan_limit,
+            allocations
+        )
+    ):
+        try:
+            report = await benchmark
+        except Exception as e:
+            print(f"Benchmark failed: {e}")
+            continue
+        print(report)
+        reports.append(report)
+    return reports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the strategy runner against a simulated game")
+    parser.add_argument("--ticks", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--buildings", type=int, default=4)
+    parser.add_argument("--units", type=int, default=4)
+    parser.add_argument("--items", type=int, default=4)
+    parser.add_argument("--players", type=int, default=1_000)
+    parser.add_argument("--scan-limit", type=int, default=PLAYER_PAGE_SIZE)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--allocations", action="store_true")
+    args = parser.parse_args()
+
+    config = SimulationConfig(
+        seed=args.seed,
+        building_count=args.buildings,
+        units_per_building=args.units,
+        items_per_building=args.items,
+        player_count=args.players,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        failure_rate=args.failure_rate
+    )
+    asyncio.run(run_benchmarks(
+        config,
+        args.ticks,
+        args.scan_limit,
+        args.allocations
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+from typing import Any, Callable, Dict, Optional
+from models import Entities
+from value_store import ValueStore
+import hashlib
+import json
+import threading
+import time
+
+
+class EntityCatalogCache:
+
+    def __init__(
+        self,
+        value_store: ValueStore,
+        mapper: Callable[[Dict], Entities],
+        ttl: int = 6 * 60 * 60,
+        key: str = 'entities'
+    ) -> None:
+        self.__value_store = value_store
+        self.__mapper = mapper
+        self.__ttl = ttl
+        self.__key = key
+        self.__entities: Optional[Entities] = None
+        self.__version: Optional[str] = None
+        self.__fetched_at = 0.0
+        self.__loaded = False
+        self.__lock = threading.Lock()
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.__version
+
+    def __load(self) -> None:
+        self.__loaded = True
+        stored = self.__value_store.get_value(self.__key)
+        if not stored:
+            return
+        try:
+            catalog = json.loads(stored)
+            self.__entities = self.__mapper(catalog["response"])
+            self.__version = catalog["version"]
+            self.__fetched_at = catalog["fetched_at"]
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Discarding stored entity catalog: {e}")
+
+    def __store(self, response: Dict) -> None:
+        catalog = {
+            "version": self.__version,
+            "fetched_at": self.__fetched_at,
+            "response": response
+        }
+        self.__value_store.update_value(self.__key, json.dumps(catalog))
+
+    def get(self) -> Optional[Entities]:
+        with self.__lock:
+            if not self.__loaded:
+                self.__load()
+            if self.__entities is None:
+                return None
+            if time.time() - self.__fetched_at >= self.__ttl:
+                return None
+            return self.__entities
+
+    def update(self, response: Dict[str, Any]) -> Entities:
+        version = hashlib.sha256(
+            json.dumps(response, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        ).hexdigest()
+        with self.__lock:
+            if version != self.__version or self.__entities is None:
+                self.__entities = self.__mapper(response)
+                self.__version = version
+            self.__fetched_at = time.time()
+            self.__store(response)
+            return self.__entities
+
+    def invalidate(self) -> None:
+        with self.__lock:
+            self.__fetched_at = 0.0
@@ -0,0 +1,43 @@
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Union
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+@dataclass(frozen=True)
+class JSONDecoder:
+    name: str
+    loads: Callable[[Union[bytes, str]], Any]
+
+
+def available_decoders() -> List[JSONDecoder]:
+    decoders: List[JSONDecoder] = []
+    if orjson is not None:
+        decoders.append(JSONDecoder("orjson", orjson.loads))
+    if ujson is not None:
+        decoders.append(JSONDecoder("ujson", ujson.loads))
+    decoders.append(JSONDecoder("json", json.loads))
+    return decoders
+
+
+def json_decoder(name: Optional[str] = None) -> JSONDecoder:
+    if name is None:
+        name = os.environ.get('JSON_DECODER')
+    decoders = available_decoders()
+    if name is None:
+        return decoders[0]
+    for decoder in decoders:
+        if decoder.name == name:
+            return decoder
+    print(f"JSON decoder {name} is not installed, using {decoders[0].name}")
+    return decoders[0]
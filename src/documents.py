@@ -0,0 +1,86 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from gql import gql
+from graphql import (
+    DocumentNode,
+    FieldNode,
+    GraphQLSchema,
+    OperationDefinitionNode,
+    build_schema,
+    print_ast,
+    validate
+)
+import hashlib
+import os
+import threading
+
+SCHEMA_FILE = os.path.join(os.path.dirname(__file__), "schema.graphql")
+
+
+@dataclass(frozen=True)
+class CompiledDocument:
+    document: DocumentNode
+    query: str
+    sha256_hash: str
+    operation: str
+    fields: Tuple[str, ...]
+
+    @property
+    def key(self) -> str:
+        return "+".join(sorted(set(self.fields)))
+
+    def is_query(self) -> bool:
+        return self.operation == "query"
+
+
+class DocumentRegistry:
+
+    def __init__(self, schema: Optional[GraphQLSchema] = None, max_size: int = 256) -> None:
+        self.__schema = schema
+        self.__max_size = max_size
+        self.__documents: "OrderedDict[str, CompiledDocument]" = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __compile(self, source: str) -> CompiledDocument:
+        document = gql(source)
+        if self.__schema is not None:
+            errors = validate(self.__schema, document)
+            if errors:
+                raise ValueError(f"Invalid GraphQL document: {errors[0]}")
+        query = print_ast(document)
+        sha256_hash = hashlib.sha256(query.encode("utf-8")).hexdigest()
+        operation = next(
+            definition for definition in document.definitions
+            if isinstance(definition, OperationDefinitionNode)
+        )
+        fields = tuple(
+            selection.name.value
+            for selection in operation.selection_set.selections
+            if isinstance(selection, FieldNode)
+        )
+        return CompiledDocument(document, query, sha256_hash, operation.operation.value, fields)
+
+    def get(self, source: str) -> CompiledDocument:
+        with self.__lock:
+            compiled = self.__documents.get(source)
+            if compiled is not None:
+                self.__documents.move_to_end(source)
+                return compiled
+        compiled = self.__compile(source)
+        with self.__lock:
+            self.__documents[source] = compiled
+            if len(self.__documents) > self.__max_size:
+                self.__documents.popitem(last=False)
+        return compiled
+
+    def __len__(self) -> int:
+        return len(self.__documents)
+
+
+def load_schema(path: str = SCHEMA_FILE) -> GraphQLSchema:
+    with open(path) as file:
+        return build_schema(file.read())
+
+
+documents = DocumentRegistry(load_schema())
@@ -1,7 +1,8 @@
 from abc import ABC, abstractmethod
-from typing import List
-from action import Action
-from api import API
+from typing import Dict, List
+from action import Action, ActionResult
+from api import API, AsyncAPI
+from metrics import metrics
 
 
 class ActionExecutor(ABC):
@@ -19,3 +20,72 @@ class SimpleActionExecutor(ActionExecutor):
     def execute(self, actions: List[Action]) -> None:
         for action in actions:
             action.execute(self.__api)
+
+
+class AsyncActionExecutor(ABC):
+
+    @abstractmethod
+    async def execute(self, actions: List[Action]) -> List[ActionResult]:
+        pass
+
+
+class SimpleAsyncActionExecutor(AsyncActionExecutor):
+
+    def __init__(self, api: AsyncAPI) -> None:
+        self.__api = api
+
+    async def execute(self, actions: List[Action]) -> List[ActionResult]:
+        results: List[ActionResult] = []
+        for action in actions:
+            with metrics.time("action_execute", action=type(action).__name__):
+                data = await action.execute_async(self.__api)
+            metrics.increment("actions_total", action=type(action).__name__, outcome="succeeded")
+            results.append(ActionResult(action, data))
+        return results
+
+
+class BatchingActionExecutor(AsyncActionExecutor):
+
+    def __init__(self, api: AsyncAPI) -> None:
+        self.__api = api
+
+    def __split_batches(self, actions: List[Action]) -> List[List[Action]]:
+        batches: List[List[Action]] = []
+        batch: List[Action] = []
+        for action in actions:
+            if any(action.depends_on(previous) for previous in batch):
+                batches.append(batch)
+                batch = []
+            batch.append(action)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def execute(self, actions: List[Action]) -> List[ActionResult]:
+        results: Dict[int, ActionResult] = {}
+        failed: List[Action] = []
+        for batch in self.__split_batches(actions):
+            runnable: List[Action] = []
+            for action in batch:
+                if any(action.depends_on(previous) for previous in failed):
+                    failed.append(action)
+                    results[id(action)] = ActionResult(
+                        action, error="Skipped because a previous action failed")
+                else:
+                    runnable.append(action)
+            if not runnable:
+                continue
+            mutations = [action.to_mutation() for action in runnable]
+            with metrics.time("action_batch"):
+                batch_results = await self.__api.execute_mutations(mutations)
+            for action, (data, error) in zip(runnable, batch_results):
+                if error is not None:
+                    failed.append(action)
+                results[id(action)] = ActionResult(action, data, error)
+        for result in results.values():
+            metrics.increment(
+                "actions_total",
+                action=type(result.action).__name__,
+                outcome="succeeded" if result.succeeded() else "failed"
+            )
+        return [results[id(action)] for action in actions]
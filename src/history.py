@@ -0,0 +1,393 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from metrics import metrics
+from notifier import Notifier
+from value_store import BlockingConnectionPool
+import csv
+import io
+import sqlite3
+import threading
+import os
+
+
+@dataclass
+class BattleRecord:
+    timestamp: float
+    account_id: str
+    player_id: int
+    gold_before: int
+    result: str
+    gold_stolen: int
+
+
+@dataclass
+class PlayerSnapshot:
+    timestamp: float
+    player_id: int
+    username: str
+    gold: Optional[int]
+
+
+@dataclass
+class ResourceSnapshot:
+    timestamp: float
+    account_id: str
+    citizens: int
+    gold: int
+    treasury: int
+
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+    type: str
+    nullable: bool = False
+
+
+TABLES: Dict[str, Tuple[Column, ...]] = {
+    "battles": (
+        Column("recorded_at", "timestamp"),
+        Column("account_id", "text"),
+        Column("player_id", "integer"),
+        Column("gold_before", "bigint"),
+        Column("result", "text", nullable=True),
+        Column("gold_stolen", "bigint")
+    ),
+    "player_snapshots": (
+        Column("recorded_at", "timestamp"),
+        Column("player_id", "integer"),
+        Column("username", "text", nullable=True),
+        Column("gold", "bigint", nullable=True)
+    ),
+    "resource_snapshots": (
+        Column("recorded_at", "timestamp"),
+        Column("account_id", "text"),
+        Column("citizens", "bigint"),
+        Column("gold", "bigint"),
+        Column("treasury", "bigint")
+    )
+}
+
+INDEXES: Dict[str, Tuple[Tuple[str, ...], ...]] = {
+    "battles": (("player_id", "recorded_at"), ("account_id", "recorded_at")),
+    "player_snapshots": (("player_id", "recorded_at"),),
+    "resource_snapshots": (("account_id", "recorded_at"),)
+}
+
+POSTGRESQL_TYPES = {"timestamp": "TIMESTAMPTZ", "text": "VARCHAR", "integer": "INTEGER", "bigint": "BIGINT"}
+
+SQLITE_TYPES = {"timestamp": "REAL", "text": "TEXT", "integer": "INTEGER", "bigint": "INTEGER"}
+
+EPOCH = "EXTRACT(EPOCH FROM {})::float8"
+
+
+def create_tables(types: Dict[str, str]) -> str:
+    statements = []
+    for table, columns in TABLES.items():
+        definitions = ",\n    ".join(
+            f"{column.name} {types[column.type]}{'' if column.nullable else ' NOT NULL'}"
+            for column in columns
+        )
+        statements.append(f"CREATE TABLE IF NOT EXISTS {table} (\n    {definitions}\n);")
+        statements.extend(
+            f"CREATE INDEX IF NOT EXISTS {table}_{'_'.join(index)} ON {table} ({', '.join(index)});"
+            for index in INDEXES[table]
+        )
+    return "\n".join(statements)
+
+
+def column_names(table: str) -> str:
+    return ", ".join(column.name for column in TABLES[table])
+
+
+def select_columns(table: str, timestamp: str = "{}") -> str:
+    return ", ".join(
+        timestamp.format(column.name) if column.type == "timestamp" else column.name
+        for column in TABLES[table]
+    )
+
+
+class HistoryStore(ABC):
+
+    @abstractmethod
+    def record_battles(self, battles: List[BattleRecord]) -> None:
+        pass
+
+    @abstractmethod
+    def record_players(self, snapshots: List[PlayerSnapshot]) -> None:
+        pass
+
+    @abstractmethod
+    def record_resources(self, snapshots: List[ResourceSnapshot]) -> None:
+        pass
+
+    @abstractmethod
+    def battles(
+        self,
+        account_id: Optional[str] = None,
+        player_id: Optional[int] = None,
+        since: Optional[float] = None,
+        limit: int = 1000
+    ) -> List[BattleRecord]:
+        pass
+
+    @abstractmethod
+    def player_gold(self, player_id: int, since: Optional[float] = None, limit: int = 1000) -> List[PlayerSnapshot]:
+        pass
+
+    @abstractmethod
+    def resources(self, account_id: str, since: Optional[float] = None, limit: int = 1000) -> List[ResourceSnapshot]:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def to_timestamptz(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def filters(columns: Iterable[str], values: Iterable[Any], placeholder: str) -> str:
+    conditions = [
+        f"{column} {'>=' if column == 'recorded_at' else '='} {placeholder}"
+        for column, value in zip(columns, values)
+        if value is not None
+    ]
+    if not conditions:
+        return ""
+    return "WHERE " + " AND ".join(conditions)
+
+
+class PostgreSQLHistoryStore(HistoryStore):
+
+    def __init__(self, notifier: Notifier, max_connections: int = 2) -> None:
+        self.__notifier = notifier
+        self.__pool = BlockingConnectionPool(
+            1,
+            max_connections,
+            os.environ['DATABASE_URL']
+        )
+        self.__create_tables_if_not_exist()
+
+    def __run_query(self, name: str, callable: Callable) -> Any:
+        connection = None
+        cursor = None
+        try:
+            connection = self.__pool.getconn()
+            cursor = connection.cursor()
+            with metrics.time("history_store_query", query=name):
+                return callable(cursor, connection)
+        except Exception as e:
+            if connection and not connection.closed:
+                connection.rollback()
+            print(f"Unexpected database error: {e}")
+            self.__notifier.notify_error(f"Unexpected database error: {e}")
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                self.__pool.putconn(connection)
+
+    def __create_tables_if_not_exist(self) -> None:
+
+        def query(cursor, connection) -> None:
+            cursor.execute(create_tables(POSTGRESQL_TYPES))
+            connection.commit()
+
+        self.__run_query("history_create", query)
+
+    def __copy(self, name: str, table: str, rows: List[tuple]) -> None:
+        if not rows:
+            return
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+
+        def query(cursor, connection) -> None:
+            cursor.copy_expert(f"COPY {table} ({column_names(table)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            connection.commit()
+
+        self.__run_query(name, query)
+
+    def record_battles(self, battles: List[BattleRecord]) -> None:
+        self.__copy(
+            "battles_insert",
+            "battles",
+            [
+                (to_timestamptz(battle.timestamp), battle.account_id, battle.player_id,
+                 battle.gold_before, battle.result, battle.gold_stolen)
+                for battle in battles
+            ]
+        )
+
+    def record_players(self, snapshots: List[PlayerSnapshot]) -> None:
+        self.__copy(
+            "player_snapshots_insert",
+            "player_snapshots",
+            [
+                (to_timestamptz(snapshot.timestamp), snapshot.player_id,
+                 snapshot.username, snapshot.gold)
+                for snapshot in snapshots
+            ]
+        )
+
+    def record_resources(self, snapshots: List[ResourceSnapshot]) -> None:
+        self.__copy(
+            "resource_snapshots_insert",
+            "resource_snapshots",
+            [
+                (to_timestamptz(snapshot.timestamp), snapshot.account_id,
+                 snapshot.citizens, snapshot.gold, snapshot.treasury)
+                for snapshot in snapshots
+            ]
+        )
+
+    def __select(self, name: str, query: str, parameters: List[Any]) -> List[tuple]:
+
+        def select(cursor, connection) -> List[tuple]:
+            cursor.execute(query, [parameter for parameter in parameters if parameter is not None])
+            return cursor.fetchall()
+
+        return self.__run_query(name, select) or []
+
+    def battles(
+        self,
+        account_id: Optional[str] = None,
+        player_id: Optional[int] = None,
+        since: Optional[float] = None,
+        limit: int = 1000
+    ) -> List[BattleRecord]:
+        since_timestamp = to_timestamptz(since) if since is not None else None
+        rows = self.__select("battles_select", f"""
+            SELECT {select_columns("battles", EPOCH)}
+            FROM battles
+            {filters(("account_id", "player_id", "recorded_at"), (account_id, player_id, since), "%s")}
+            ORDER BY recorded_at DESC
+            LIMIT %s;
+        """, [account_id, player_id, since_timestamp, limit])
+        return [BattleRecord(*row) for row in rows]
+
+    def player_gold(self, player_id: int, since: Optional[float] = None, limit: int = 1000) -> List[PlayerSnapshot]:
+        since_timestamp = to_timestamptz(since) if since is not None else None
+        rows = self.__select("player_snapshots_select", f"""
+            SELECT {select_columns("player_snapshots", EPOCH)}
+            FROM player_snapshots
+            {filters(("player_id", "recorded_at"), (player_id, since), "%s")}
+            ORDER BY recorded_at DESC
+            LIMIT %s;
+        """, [player_id, since_timestamp, limit])
+        return [PlayerSnapshot(*row) for row in rows]
+
+    def resources(self, account_id: str, since: Optional[float] = None, limit: int = 1000) -> List[ResourceSnapshot]:
+        since_timestamp = to_timestamptz(since) if since is not None else None
+        rows = self.__select("resource_snapshots_select", f"""
+            SELECT {select_columns("resource_snapshots", EPOCH)}
+            FROM resource_snapshots
+            {filters(("account_id", "recorded_at"), (account_id, since), "%s")}
+            ORDER BY recorded_at DESC
+            LIMIT %s;
+        """, [account_id, since_timestamp, limit])
+        return [ResourceSnapshot(*row) for row in rows]
+
+    def close(self) -> None:
+        self.__pool.closeall()
+
+
+class SQLiteHistoryStore(HistoryStore):
+
+    def __init__(self, path: str = "history.sqlite3") -> None:
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        self.__lock = threading.Lock()
+        with self.__lock:
+            self.__connection.execute("PRAGMA journal_mode = WAL;")
+            self.__connection.executescript(create_tables(SQLITE_TYPES))
+
+    def __insert(self, name: str, table: str, rows: List[tuple]) -> None:
+        if not rows:
+            return
+        placeholders = ", ".join("?" for _ in TABLES[table])
+        with self.__lock, metrics.time("history_store_query", query=name):
+            with self.__connection:
+                self.__connection.executemany(
+                    f"INSERT INTO {table} ({column_names(table)}) VALUES ({placeholders});",
+                    rows
+                )
+
+    def record_battles(self, battles: List[BattleRecord]) -> None:
+        self.__insert("battles_insert", "battles", [
+            (battle.timestamp, battle.account_id, battle.player_id,
+             battle.gold_before, battle.result, battle.gold_stolen)
+            for battle in battles
+        ])
+
+    def record_players(self, snapshots: List[PlayerSnapshot]) -> None:
+        self.__insert("player_snapshots_insert", "player_snapshots", [
+            (snapshot.timestamp, snapshot.player_id, snapshot.username, snapshot.gold)
+            for snapshot in snapshots
+        ])
+
+    def record_resources(self, snapshots: List[ResourceSnapshot]) -> None:
+        self.__insert("resource_snapshots_insert", "resource_snapshots", [
+            (snapshot.timestamp, snapshot.account_id,
+             snapshot.citizens, snapshot.gold, snapshot.treasury)
+            for snapshot in snapshots
+        ])
+
+    def __select(self, name: str, query: str, parameters: List[Any]) -> List[tuple]:
+        with self.__lock, metrics.time("history_store_query", query=name):
+            return self.__connection.execute(
+                query,
+                [parameter for parameter in parameters if parameter is not None]
+            ).fetchall()
+
+    def battles(
+        self,
+        account_id: Optional[str] = None,
+        player_id: Optional[int] = None,
+        since: Optional[float] = None,
+        limit: int = 1000
+    ) -> List[BattleRecord]:
+        rows = self.__select("battles_select", f"""
+            SELECT {select_columns("battles")}
+            FROM battles
+            {filters(("account_id", "player_id", "recorded_at"), (account_id, player_id, since), "?")}
+            ORDER BY recorded_at DESC
+            LIMIT ?;
+        """, [account_id, player_id, since, limit])
+        return [BattleRecord(*row) for row in rows]
+
+    def player_gold(self, player_id: int, since: Optional[float] = None, limit: int = 1000) -> List[PlayerSnapshot]:
+        rows = self.__select("player_snapshots_select", f"""
+            SELECT {select_columns("player_snapshots")}
+            FROM player_snapshots
+            {filters(("player_id", "recorded_at"), (player_id, since), "?")}
+            ORDER BY recorded_at DESC
+            LIMIT ?;
+        """, [player_id, since, limit])
+        return [PlayerSnapshot(*row) for row in rows]
+
+    def resources(self, account_id: str, since: Optional[float] = None, limit: int = 1000) -> List[ResourceSnapshot]:
+        rows = self.__select("resource_snapshots_select", f"""
+            SELECT {select_columns("resource_snapshots")}
+            FROM resource_snapshots
+            {filters(("account_id", "recorded_at"), (account_id, since), "?")}
+            ORDER BY recorded_at DESC
+            LIMIT ?;
+        """, [account_id, since, limit])
+        return [ResourceSnapshot(*row) for row in rows]
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__connection.close()
+
+
+def open_history_store(notifier: Notifier) -> HistoryStore:
+    if os.environ.get('DATABASE_URL'):
+        try:
+            return PostgreSQLHistoryStore(notifier)
+        except Exception as e:
+            print(f"Falling back to the SQLite history store: {e}")
+            notifier.notify_error(f"Falling back to the SQLite history store: {e}")
+    return SQLiteHistoryStore(os.environ.get('HISTORY_FILE', "history.sqlite3"))
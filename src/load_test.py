@@ -0,0 +1,183 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from aiohttp import ClientSession, web
+from api import AsyncGraphQLAPI
+from benchmark import percentile
+from executor import BatchingActionExecutor, SimpleAsyncActionExecutor
+from notifier import EmptyNotifier
+from ratelimit import RequestGovernor
+from runner import AsyncStrategyRunner, MultiAccountRunner
+from simulation import SimulationConfig
+from stand_in_server import StandInConfig, StandInServer
+from strategy import (
+    DepositMaxGoldInTreasuryStrategy,
+    SkipGoldStrategy,
+    Strategy,
+    TrainMaxUnitStrategy
+)
+from value_store import InMemoryValueStore
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import time
+
+
+@dataclass
+class LoadTestReport:
+    bots: int
+    ticks: int
+    seconds: float
+    failures: int
+    p50: float
+    p99: float
+    stats: Dict[str, int]
+
+    def __str__(self) -> str:
+        bot_ticks = self.bots * self.ticks
+        return (
+            f"{bot_ticks} bot ticks in {self.seconds:.2f} s"
+            f" ({bot_ticks / self.seconds:.1f} bot ticks/s, {self.failures} failed)\n"
+            f"bot tick p50 {self.p50 * 1000:.1f} ms  p99 {self.p99 * 1000:.1f} ms\n"
+            f"{self.stats['requests']} requests over {self.stats['connections']} connections,"
+            f" {self.stats['rate_limited']} rate limited,"
+            f" {self.stats['persisted_query_misses']} persisted query misses,"
+            f" {self.stats['errors']} with errors"
+        )
+
+
+def load_test_strategies() -> List[Strategy]:
+    return [
+        SkipGoldStrategy(10),
+        TrainMaxUnitStrategy("Unit 0"),
+        DepositMaxGoldInTreasuryStrategy()
+    ]
+
+
+async def fetch_stats(endpoint: str) -> Dict[str, int]:
+    async with ClientSession() as session:
+        async with session.get(endpoint.rsplit("/", 1)[0] + "/stats") as response:
+            return await response.json()
+
+
+async def run_load_test(
+    endpoint: str,
+    bots: int,
+    ticks: int,
+    max_concurrency: int,
+    batching: bool,
+    player_scan_limit: Optional[int],
+    governor: Optional[RequestGovernor] = None
+) -> LoadTestReport:
+    os.environ['API_ENDPOINT'] = endpoint
+    apis: Dict[str, AsyncGraphQLAPI] = {}
+    runners: Dict[str, AsyncStrategyRunner] = {}
+    for index in range(bots):
+        value_store = InMemoryValueStore()
+        value_store.update_value('token', f"bot-{index}")
+        api = AsyncGraphQLAPI(value_store, governor=governor)
+        executor = BatchingActionExecutor(api) if batching else SimpleAsyncActionExecutor(api)
+        apis[f"bot-{index}"] = api
+        runners[f"bot-{index}"] = AsyncStrategyRunner(
+            api,
+            executor,
+            EmptyNotifier(),
+            player_scan_limit=player_scan_limit,
+            strategies=load_test_strategies
+        )
+    runner = MultiAccountRunner(runners, EmptyNotifier(), max_concurrency=max_concurrency)
+    durations: List[float] = []
+    failures = 0
+
+    async def run_bot(account_id: str) -> bool:
+        started = time.perf_counter()
+        succeeded = await runner.run_account(account_id)
+        durations.append(time.perf_counter() - started)
+        return succeeded
+
+    baseline = await fetch_stats(endpoint)
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(ticks):
+                results = await asyncio.gather(*map(run_bot, runner.account_ids))
+                failures += results.count(False)
+    finally:
+        await asyncio.gather(*(api.close() for api in apis.values()))
+    seconds = time.perf_counter() - started
+    stats = await fetch_stats(endpoint)
+    return LoadTestReport(
+        bots,
+        ticks,
+        seconds,
+        failures,
+        percentile(durations, 50),
+        percentile(durations, 99),
+        {
+            key: stats[key] - baseline.get(key, 0)
+            for key in ("requests", "connections", "rate_limited", "persisted_query_misses", "errors")
+        }
+    )
+
+
+async def serve(config: StandInConfig, host: str, port: int) -> web.AppRunner:
+    app_runner = web.AppRunner(StandInServer(config).application())
+    await app_runner.setup()
+    await web.TCPSite(app_runner, host, port).start()
+    return app_runner
+
+
+async def run(args: argparse.Namespace) -> None:
+    app_runner = None
+    if args.serve:
+        app_runner = await serve(
+            StandInConfig(
+                SimulationConfig(seed=args.seed, player_count=args.players),
+                latency=args.latency,
+                rate_limit=args.rate_limit,
+                burst=args.burst
+            ),
+            "127.0.0.1",
+            args.port
+        )
+    try:
+        report = await run_load_test(
+            args.endpoint or f"http://127.0.0.1:{args.port}/graphql",
+            args.bots,
+            args.ticks,
+            args.concurrency,
+            args.executor == "batching",
+            args.scan_limit,
+            RequestGovernor(rate=args.client_rate, burst=args.client_burst)
+            if args.client_rate is not None else None
+        )
+        print(report)
+    finally:
+        if app_runner is not None:
+            await app_runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run many concurrent bots against the GraphQL stand-in server")
+    parser.add_argument("--endpoint", default=None)
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--serve", action="store_true")
+    parser.add_argument("--bots", type=int, default=20)
+    parser.add_argument("--ticks", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--executor", choices=("simple", "batching"), default="batching")
+    parser.add_argument("--scan-limit", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--players", type=int, default=1_000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--client-rate", type=float, default=None)
+    parser.add_argument("--client-burst", type=int, default=10)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
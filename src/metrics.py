@@ -0,0 +1,228 @@
+from aiohttp import TraceConfig
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional, Tuple
+import bisect
+import json
+import os
+import threading
+import time
+
+SECONDS_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+BYTES_BUCKETS = (
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+@dataclass
+class Histogram:
+    buckets: Tuple[float, ...]
+    counts: List[int] = field(init=False)
+    sum: float = 0.0
+    count: int = 0
+
+    def __post_init__(self) -> None:
+        self.counts = [0] * len(self.buckets)
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def copy(self) -> "Histogram":
+        histogram = Histogram(self.buckets, sum=self.sum, count=self.count)
+        histogram.counts = list(self.counts)
+        return histogram
+
+    def cumulative_counts(self) -> List[int]:
+        counts: List[int] = []
+        total = 0
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: Labels, extra: Labels = ()) -> str:
+    labels = labels + extra
+    if not labels:
+        return ""
+    return "{" + ",".join(
+        f'{key}="{escape_label_value(str(value))}"'
+        for key, value in labels
+    ) + "}"
+
+
+def format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+class MetricsRegistry:
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.__counters: Dict[Tuple[str, Labels], float] = {}
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = SECONDS_BUCKETS, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            histogram = self.__histograms.get(key)
+            if histogram is None:
+                histogram = Histogram(buckets)
+                self.__histograms[key] = histogram
+            histogram.observe(value)
+
+    def increment(self, name: str, amount: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            self.__counters[key] = self.__counters.get(key, 0) + amount
+
+    @contextmanager
+    def time(self, name: str, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.increment(f"{name}_errors_total", **labels)
+            raise
+        finally:
+            self.observe(f"{name}_seconds", time.perf_counter() - started, **labels)
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__histograms.clear()
+            self.__counters.clear()
+
+    def __snapshot(self) -> Tuple[Dict[Tuple[str, Labels], Histogram], Dict[Tuple[str, Labels], float]]:
+        with self.__lock:
+            histograms = {
+                key: histogram.copy()
+                for key, histogram in self.__histograms.items()
+            }
+            return histograms, dict(self.__counters)
+
+    def to_prometheus(self) -> str:
+        histograms, counters = self.__snapshot()
+        lines: List[str] = []
+        typed = set()
+        for (name, labels), value in sorted(counters.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{format_labels(labels)} {value}")
+        for (name, labels), histogram in sorted(histograms.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bound, count in zip(histogram.buckets, histogram.cumulative_counts()):
+                lines.append(
+                    f"{name}_bucket{format_labels(labels, (('le', format_bound(bound)),))} {count}")
+            lines.append(f"{name}_bucket{format_labels(labels, (('le', '+Inf'),))} {histogram.count}")
+            lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_json_lines(self, timestamp: Optional[float] = None) -> str:
+        if timestamp is None:
+            timestamp = time.time()
+        histograms, counters = self.__snapshot()
+        lines: List[str] = []
+        for (name, labels), value in sorted(counters.items()):
+            lines.append(json.dumps({
+                "timestamp": timestamp,
+                "name": name,
+                "type": "counter",
+                "labels": dict(labels),
+                "value": value
+            }))
+        for (name, labels), histogram in sorted(histograms.items()):
+            lines.append(json.dumps({
+                "timestamp": timestamp,
+                "name": name,
+                "type": "histogram",
+                "labels": dict(labels),
+                "count": histogram.count,
+                "sum": histogram.sum,
+                "buckets": dict(zip(map(format_bound, histogram.buckets), histogram.cumulative_counts()))
+            }))
+        return "".join(f"{line}\n" for line in lines)
+
+
+metrics = MetricsRegistry()
+
+
+def write_metrics(registry: MetricsRegistry, path: str) -> None:
+    if path.endswith(".jsonl"):
+        with open(path, "a") as file:
+            file.write(registry.to_json_lines())
+        return
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as file:
+        file.write(registry.to_prometheus())
+    os.replace(temporary_path, path)
+
+
+def serve_metrics(registry: MetricsRegistry, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self) -> None:
+            if self.path == "/metrics":
+                body = registry.to_prometheus().encode("utf-8")
+                content_type = "text/plain; version=0.0.4"
+            elif self.path == "/metrics.jsonl":
+                body = registry.to_json_lines().encode("utf-8")
+                content_type = "application/x-ndjson"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def http_trace_config(registry: MetricsRegistry) -> TraceConfig:
+
+    async def on_request_start(session, context: SimpleNamespace, params) -> None:
+        context.sent = 0
+
+    async def on_request_chunk_sent(session, context: SimpleNamespace, params) -> None:
+        context.sent += len(params.chunk)
+
+    async def on_request_end(session, context: SimpleNamespace, params) -> None:
+        registry.observe("http_request_bytes", context.sent, BYTES_BUCKETS)
+        if params.response.content_length is not None:
+            registry.observe("http_response_bytes", params.response.content_length, BYTES_BUCKETS)
+        registry.increment("http_responses_total", status=str(params.response.status))
+
+    async def on_request_exception(session, context: SimpleNamespace, params) -> None:
+        registry.increment("http_request_errors_total", error=type(params.exception).__name__)
+
+    trace_config = TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_chunk_sent.append(on_request_chunk_sent)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
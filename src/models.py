@@ -1,16 +1,45 @@
-from dataclasses import dataclass
-from typing import List
+from array import array
+from dataclasses import dataclass, field, fields
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+import heapq
 import math
 
+JOB_INTERVAL = 30 * 60
+UNKNOWN_GOLD = -1
+UNKNOWN_ID = -1
 
-@dataclass
+
+def slotted(cls):
+    cls_dict = dict(cls.__dict__)
+    field_names = tuple(cls_field.name for cls_field in fields(cls))
+    cls_dict["__slots__"] = field_names
+    for field_name in field_names:
+        cls_dict.pop(field_name, None)
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+
+    def __getstate__(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, field_name) for field_name in field_names)
+
+    def __setstate__(self, state: Tuple[Any, ...]) -> None:
+        for field_name, value in zip(field_names, state):
+            object.__setattr__(self, field_name, value)
+
+    cls_dict["__getstate__"] = __getstate__
+    cls_dict["__setstate__"] = __setstate__
+    return type(cls)(cls.__name__, cls.__bases__, cls_dict)
+
+
+@slotted
+@dataclass(frozen=True)
 class Item:
     id: int
     name: str
     price: int
 
 
-@dataclass
+@slotted
+@dataclass(frozen=True)
 class UnitItem:
     id: int
     name: str
@@ -18,34 +47,46 @@ class UnitItem:
     quantity: int
 
 
-@dataclass
+@slotted
+@dataclass(frozen=True)
 class Unit:
     id: int
     name: str
     training_time: int
-    unit_items: List[UnitItem]
-
-    def total_item_price(self) -> int:
-        total_price = sum(
+    unit_items: Tuple[UnitItem, ...]
+    attack_strength: int = 0
+    defense_strength: int = 0
+    gold_proceeds: int = 0
+    total_item_price: int = field(init=False)
+    units_per_job: int = field(init=False)
+    item_buy_template: Tuple[Tuple[int, int], ...] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        unit_items = tuple(self.unit_items or ())
+        object.__setattr__(self, "unit_items", unit_items)
+        object.__setattr__(self, "total_item_price", sum(
             int(unit_item.price * unit_item.quantity)
-            for unit_item in self.unit_items
-        )
-        return total_price
-
-    def units_per_job(self) -> int:
-        return math.floor(1800 / self.training_time)
+            for unit_item in unit_items
+        ))
+        object.__setattr__(self, "units_per_job", math.floor(
+            JOB_INTERVAL / self.training_time) if self.training_time else 0)
+        object.__setattr__(self, "item_buy_template", tuple(
+            (unit_item.id, unit_item.quantity)
+            for unit_item in unit_items
+        ))
 
     def has_items(self) -> bool:
-        return self.unit_items is not None and len(self.unit_items) != 0
+        return len(self.unit_items) != 0
 
     def get_item_buy_structure_for_quantity(self, quantity: int) -> List:
-        items: List = list(map(lambda unit_item: {
-            "id": unit_item.id,
-            "quantity": unit_item.quantity * quantity
-        }, self.unit_items))
+        items: List = [{
+            "id": item_id,
+            "quantity": item_quantity * quantity
+        } for item_id, item_quantity in self.item_buy_template]
         return items
 
 
+@slotted
 @dataclass
 class Player:
     id: int
@@ -53,18 +94,137 @@ class Player:
     gold: int
 
 
+def player_gold(player: Player) -> int:
+    if player.gold is None:
+        return 0
+    else:
+        return player.gold
+
+
+class PlayerTable:
+
+    def __init__(self) -> None:
+        self.ids = array("q")
+        self.usernames: List[str] = []
+        self.gold = array("q")
+
+    def append(self, id: Optional[int], username: str, gold: Optional[int]) -> None:
+        self.ids.append(UNKNOWN_ID if id is None else id)
+        self.usernames.append(username)
+        self.gold.append(UNKNOWN_GOLD if gold is None else gold)
+
+    def truncate(self, size: int) -> None:
+        del self.ids[size:]
+        del self.usernames[size:]
+        del self.gold[size:]
+
+    def player(self, index: int) -> Player:
+        id = self.ids[index]
+        gold = self.gold[index]
+        return Player(
+            None if id == UNKNOWN_ID else id,
+            self.usernames[index],
+            None if gold == UNKNOWN_GOLD else gold
+        )
+
+    def __iter__(self) -> Iterator[Player]:
+        return (self.player(index) for index in range(len(self.ids)))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+@dataclass(frozen=True)
+class RankedPlayers:
+    players: Tuple[Player, ...]
+
+    @classmethod
+    def select(cls, players: Iterable[Player], k: int) -> "RankedPlayers":
+        return cls(tuple(heapq.nlargest(k, players, key=player_gold)))
+
+    @classmethod
+    async def select_pages(cls, pages: AsyncIterator[PlayerTable], k: int) -> "RankedPlayers":
+        heap: List[Tuple[int, int, Player]] = []
+        if k <= 0:
+            return cls(())
+        index = 0
+        async for table in pages:
+            for row, gold in enumerate(table.gold):
+                gold = max(gold, 0)
+                if len(heap) < k:
+                    heapq.heappush(heap, (gold, -index, table.player(row)))
+                elif gold > heap[0][0]:
+                    heapq.heapreplace(heap, (gold, -index, table.player(row)))
+                index += 1
+        heap.sort(key=lambda entry: entry[:2], reverse=True)
+        return cls(tuple(entry[2] for entry in heap))
+
+    def highest(self) -> Optional[Player]:
+        if len(self.players) == 0:
+            return None
+        return self.players[0]
+
+    def top(self, n: int) -> Tuple[Player, ...]:
+        return self.players[:n]
+
+    def __iter__(self) -> Iterator[Player]:
+        return iter(self.players)
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+
 @dataclass
 class BattleResult:
     result: str
     gold_stolen: int
 
 
-@dataclass
+@dataclass(frozen=True)
 class Entities:
-    units: List[Unit]
-    items: List[Item]
-
-
+    units: Tuple[Unit, ...]
+    items: Tuple[Item, ...]
+    units_by_name: Dict[str, Unit] = field(init=False, repr=False, compare=False)
+    units_by_id: Dict[int, Unit] = field(init=False, repr=False, compare=False)
+    items_by_name: Dict[str, Item] = field(init=False, repr=False, compare=False)
+    items_by_id: Dict[int, Item] = field(init=False, repr=False, compare=False)
+    fingerprint: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        units = tuple(self.units)
+        items = tuple(self.items)
+        object.__setattr__(self, "units", units)
+        object.__setattr__(self, "items", items)
+        object.__setattr__(self, "fingerprint", hash((units, items)))
+        units_by_name: Dict[str, Unit] = {}
+        units_by_id: Dict[int, Unit] = {}
+        for unit in units:
+            units_by_name.setdefault(unit.name, unit)
+            units_by_id.setdefault(unit.id, unit)
+        items_by_name: Dict[str, Item] = {}
+        items_by_id: Dict[int, Item] = {}
+        for item in items:
+            items_by_name.setdefault(item.name, item)
+            items_by_id.setdefault(item.id, item)
+        object.__setattr__(self, "units_by_name", units_by_name)
+        object.__setattr__(self, "units_by_id", units_by_id)
+        object.__setattr__(self, "items_by_name", items_by_name)
+        object.__setattr__(self, "items_by_id", items_by_id)
+
+    def unit_by_name(self, name: str) -> Optional[Unit]:
+        return self.units_by_name.get(name)
+
+    def unit_by_id(self, id: int) -> Optional[Unit]:
+        return self.units_by_id.get(id)
+
+    def item_by_name(self, name: str) -> Optional[Item]:
+        return self.items_by_name.get(name)
+
+    def item_by_id(self, id: int) -> Optional[Item]:
+        return self.items_by_id.get(id)
+
+
+@slotted
 @dataclass
 class Resources:
     citizens: int = 0
@@ -76,3 +236,11 @@ class Resources:
         self.citizens += citizens
         self.gold += gold
         self.treasury += treasury
+
+
+@dataclass
+class Mutation:
+    field: str
+    input_type: str
+    input: Dict[str, Any]
+    selection: str
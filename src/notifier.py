@@ -1,7 +1,16 @@
 from abc import ABC, abstractclassmethod
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+from metrics import MetricsRegistry, metrics
+from ratelimit import TokenBucket
+from telegram.error import RetryAfter
 import telegram
+import threading
+import time
 import os
 
+TELEGRAM_MESSAGE_LENGTH = 4096
+
 
 class Notifier(ABC):
 
@@ -52,3 +61,158 @@ class EmptyNotifier(Notifier):
 
     def notify_error(self, text: str) -> None:
         pass
+
+
+class PrefixedNotifier(Notifier):
+
+    def __init__(self, notifier: Notifier, prefix: str) -> None:
+        self.__notifier = notifier
+        self.__prefix = prefix
+
+    def notify_info(self, text: str) -> None:
+        self.__notifier.notify_info(f"[{self.__prefix}] {text}")
+
+    def notify_error(self, text: str) -> None:
+        self.__notifier.notify_error(f"[{self.__prefix}] {text}")
+
+
+class InstrumentedNotifier(Notifier):
+
+    def __init__(self, notifier: Notifier, registry: MetricsRegistry = metrics) -> None:
+        self.__notifier = notifier
+        self.__registry = registry
+
+    def notify_info(self, text: str) -> None:
+        self.__registry.observe(
+            "notifier_message_length", len(text), (64, 256, 1024, 4096), level="info")
+        with self.__registry.time("notifier_send", level="info"):
+            self.__notifier.notify_info(text)
+
+    def notify_error(self, text: str) -> None:
+        self.__registry.observe(
+            "notifier_message_length", len(text), (64, 256, 1024, 4096), level="error")
+        with self.__registry.time("notifier_send", level="error"):
+            self.__notifier.notify_error(text)
+
+
+class QueuedNotifier(Notifier):
+
+    def __init__(
+        self,
+        notifier: Notifier,
+        max_size: int = 100,
+        window: float = 2.0,
+        rate: float = 1.0,
+        burst: int = 3,
+        max_retries: int = 3,
+        registry: MetricsRegistry = metrics
+    ) -> None:
+        self.__notifier = notifier
+        self.__messages: Deque[Tuple[str, str]] = deque()
+        self.__max_size = max_size
+        self.__window = window
+        self.__bucket = TokenBucket(rate, burst)
+        self.__max_retries = max_retries
+        self.__registry = registry
+        self.__dropped: Dict[str, int] = {"info": 0, "error": 0}
+        self.__condition = threading.Condition()
+        self.__stopping = False
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def __drop(self, level: str) -> None:
+        self.__dropped[level] += 1
+        self.__registry.increment("notifier_dropped_total", level=level)
+
+    def __enqueue(self, level: str, text: str) -> None:
+        with self.__condition:
+            if len(self.__messages) >= self.__max_size:
+                oldest_info = next(
+                    (message for message in self.__messages if message[0] == "info"),
+                    None
+                )
+                if level == "info" or oldest_info is None:
+                    self.__drop(level)
+                    return
+                self.__messages.remove(oldest_info)
+                self.__drop("info")
+            self.__messages.append((level, text))
+            self.__condition.notify()
+
+    def notify_info(self, text: str) -> None:
+        self.__enqueue("info", text)
+
+    def notify_error(self, text: str) -> None:
+        self.__enqueue("error", text)
+
+    def __collect(self) -> Tuple[List[Tuple[str, str]], Dict[str, int]]:
+        with self.__condition:
+            while not self.__messages and not self.__stopping:
+                self.__condition.wait()
+            deadline = time.monotonic() + self.__window
+            while not self.__stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.__condition.wait(remaining)
+            messages = list(self.__messages)
+            self.__messages.clear()
+            dropped = self.__dropped
+            self.__dropped = {"info": 0, "error": 0}
+        return messages, dropped
+
+    def __send(self, level: str, text: str) -> None:
+        for attempt in range(self.__max_retries + 1):
+            delay = self.__bucket.reserve()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                if level == "error":
+                    self.__notifier.notify_error(text)
+                else:
+                    self.__notifier.notify_info(text)
+                return
+            except RetryAfter as e:
+                if attempt == self.__max_retries:
+                    print(f"Dropping notification after {attempt + 1} attempts: {e}")
+                    return
+                time.sleep(e.retry_after)
+            except Exception as e:
+                print(f"Unexpected notifier error: {e}")
+                return
+
+    def __run(self) -> None:
+        while True:
+            messages, dropped = self.__collect()
+            texts: Dict[str, List[str]] = {"error": [], "info": []}
+            for level, text in messages:
+                texts[level].append(text)
+            for level, count in dropped.items():
+                if count > 0:
+                    texts[level].append(
+                        f"{count} {level} notifications were dropped because the queue was full")
+            for level in ("error", "info"):
+                for chunk in split_message("\n\n".join(texts[level])):
+                    self.__send(level, chunk)
+            with self.__condition:
+                if self.__stopping and not self.__messages:
+                    return
+
+    def close(self, timeout: float = 10.0) -> None:
+        with self.__condition:
+            self.__stopping = True
+            self.__condition.notify()
+        self.__thread.join(timeout)
+
+
+def split_message(text: str, length: int = TELEGRAM_MESSAGE_LENGTH) -> List[str]:
+    chunks: List[str] = []
+    while len(text) > length:
+        split = text.rfind("\n", 0, length)
+        if split <= 0:
+            split = length
+        chunks.append(text[:split])
+        text = text[split:].lstrip("\n")
+    if text:
+        chunks.append(text)
+    return chunks
@@ -0,0 +1,212 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple, Type, get_type_hints
+from allocator import UnitWeights
+from notifier import Notifier
+from value_store import ValueStore
+from strategy import (
+    AttackHighestGoldPlayerStrategy,
+    BuyMaxItemStrategy,
+    BuyMaxItemsForUnitStrategy,
+    DepositMaxGoldInTreasuryStrategy,
+    OptimalAllocationStrategy,
+    SkipGoldRelativeToPlayersStrategy,
+    SkipGoldStrategy,
+    Strategy,
+    TrainMaxUnitStrategy
+)
+import hashlib
+import json
+import os
+import time
+import yaml
+
+STRATEGY_TYPES: Dict[str, Type[Strategy]] = {
+    "SkipGold": SkipGoldStrategy,
+    "SkipGoldRelativeToPlayers": SkipGoldRelativeToPlayersStrategy,
+    "TrainMaxUnit": TrainMaxUnitStrategy,
+    "DepositMaxGoldInTreasury": DepositMaxGoldInTreasuryStrategy,
+    "BuyMaxItem": BuyMaxItemStrategy,
+    "BuyMaxItemsForUnit": BuyMaxItemsForUnitStrategy,
+    "AttackHighestGoldPlayer": AttackHighestGoldPlayerStrategy,
+    "OptimalAllocation": OptimalAllocationStrategy
+}
+
+ARGUMENT_TYPES: Dict[type, Tuple[type, ...]] = {
+    bool: (bool,),
+    int: (int,),
+    float: (int, float),
+    str: (str,)
+}
+
+
+@dataclass(frozen=True)
+class StrategyPipeline:
+    factory: Callable[[], List[Strategy]]
+    requires: FrozenSet[str]
+    version: str
+
+    @classmethod
+    def from_factory(cls, factory: Callable[[], List[Strategy]]) -> "StrategyPipeline":
+        requires = frozenset().union(*(strategy.requires for strategy in factory()))
+        return cls(factory, requires, f"{factory.__module__}.{factory.__qualname__}")
+
+    def strategies(self) -> List[Strategy]:
+        return self.factory()
+
+
+def check_argument_types(name: str, annotated: Callable, arguments: Dict[str, Any]) -> None:
+    annotations = get_type_hints(annotated)
+    for argument, value in arguments.items():
+        expected = annotations.get(argument)
+        accepted = ARGUMENT_TYPES.get(expected)
+        if accepted is None:
+            continue
+        # bool is a subclass of int, so true is not a valid percentage
+        if not isinstance(value, accepted) or (isinstance(value, bool) and bool not in accepted):
+            raise ValueError(
+                f"Invalid arguments for strategy {name}: {argument} must be {expected.__name__}, not {value!r}")
+
+
+def build_strategy(spec: Dict[str, Any]) -> Strategy:
+    arguments = dict(spec)
+    name = arguments.pop("type", None)
+    if not isinstance(name, str) or name not in STRATEGY_TYPES:
+        raise ValueError(f"Unknown strategy type {name}")
+    strategy_type = STRATEGY_TYPES[name]
+    check_argument_types(name, strategy_type.__init__, arguments)
+    try:
+        if "weights" in arguments:
+            if isinstance(arguments["weights"], dict):
+                check_argument_types(name, UnitWeights, arguments["weights"])
+            arguments["weights"] = UnitWeights(**arguments["weights"])
+        return strategy_type(**arguments)
+    except TypeError as e:
+        raise ValueError(f"Invalid arguments for strategy {name}: {e}") from e
+
+
+def parse_pipeline(text: str, format: str = "json") -> StrategyPipeline:
+    if format == "yaml":
+        try:
+            config = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise ValueError(f"Invalid YAML: {e}") from e
+    else:
+        config = json.loads(text)
+    if isinstance(config, dict):
+        config = config.get("strategies")
+    if not isinstance(config, list) or not all(isinstance(spec, dict) for spec in config):
+        raise ValueError("A strategy pipeline must be a list of strategies")
+    strategies = [build_strategy(spec) for spec in config]
+    return StrategyPipeline(
+        lambda: [build_strategy(spec) for spec in config],
+        frozenset().union(*(strategy.requires for strategy in strategies)),
+        hashlib.sha256(text.encode("utf-8")).hexdigest()
+    )
+
+
+class PipelineSource(ABC):
+
+    @abstractmethod
+    def current(self) -> StrategyPipeline:
+        pass
+
+
+class StaticPipelineSource(PipelineSource):
+
+    def __init__(self, pipeline: StrategyPipeline) -> None:
+        self.__pipeline = pipeline
+
+    def current(self) -> StrategyPipeline:
+        return self.__pipeline
+
+
+class ReloadingPipelineSource(PipelineSource):
+
+    def __init__(
+        self,
+        default: StrategyPipeline,
+        notifier: Notifier,
+        reload_interval: float = 60,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.__default = default
+        self.__pipeline = default
+        self.__notifier = notifier
+        self.__reload_interval = reload_interval
+        self.__clock = clock
+        self.__checked_at: Optional[float] = None
+        self.__text: Optional[str] = None
+
+    @abstractmethod
+    def _read(self) -> Optional[str]:
+        pass
+
+    def _format(self) -> str:
+        return "json"
+
+    def current(self) -> StrategyPipeline:
+        now = self.__clock()
+        if self.__checked_at is not None and now - self.__checked_at < self.__reload_interval:
+            return self.__pipeline
+        self.__checked_at = now
+        try:
+            text = self._read()
+        except Exception as e:
+            print(f"Unexpected error reading the strategy pipeline: {e}")
+            return self.__pipeline
+        if text == self.__text:
+            return self.__pipeline
+        self.__text = text
+        if text is None:
+            print("Strategy pipeline was removed, using the default one")
+            self.__pipeline = self.__default
+            return self.__pipeline
+        try:
+            self.__pipeline = parse_pipeline(text, self._format())
+            print(f"Loaded strategy pipeline {self.__pipeline.version[:12]}")
+        except ValueError as e:
+            print(f"Invalid strategy pipeline, keeping the previous one: {e}")
+            self.__notifier.notify_error(
+                f"Invalid strategy pipeline, keeping the previous one: {e}")
+        return self.__pipeline
+
+
+class FilePipelineSource(ReloadingPipelineSource):
+
+    def __init__(self, path: str, default: StrategyPipeline, notifier: Notifier, reload_interval: float = 60) -> None:
+        super().__init__(default, notifier, reload_interval)
+        self.__path = path
+        self.__modified_at: Optional[float] = None
+        self.__text: Optional[str] = None
+
+    def _read(self) -> Optional[str]:
+        modified_at = os.path.getmtime(self.__path)
+        if modified_at != self.__modified_at:
+            with open(self.__path) as file:
+                self.__text = file.read()
+            self.__modified_at = modified_at
+        return self.__text
+
+    def _format(self) -> str:
+        if self.__path.endswith((".yaml", ".yml")):
+            return "yaml"
+        return "json"
+
+
+class ValueStorePipelineSource(ReloadingPipelineSource):
+
+    def __init__(
+        self,
+        value_store: ValueStore,
+        default: StrategyPipeline,
+        notifier: Notifier,
+        key: str = 'strategies',
+        reload_interval: float = 60
+    ) -> None:
+        super().__init__(default, notifier, reload_interval)
+        self.__value_store = value_store
+        self.__key = key
+
+    def _read(self) -> Optional[str]:
+        return self.__value_store.read_value(self.__key)
@@ -0,0 +1,202 @@
+from typing import Awaitable, Callable, Dict, FrozenSet, Optional, TypeVar
+from aiohttp import ClientConnectorError, ClientError
+from gql.transport.exceptions import TransportProtocolError, TransportServerError
+from metrics import metrics
+import asyncio
+import random
+import threading
+import time
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.__rate = rate
+        self.__capacity = capacity
+        self.__clock = clock
+        self.__tokens = capacity
+        self.__updated_at = clock()
+        self.__lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self.__rate
+
+    @rate.setter
+    def rate(self, rate: float) -> None:
+        with self.__lock:
+            self.__refill()
+            self.__rate = rate
+
+    def __refill(self) -> None:
+        now = self.__clock()
+        self.__tokens = min(
+            self.__capacity,
+            self.__tokens + (now - self.__updated_at) * self.__rate
+        )
+        self.__updated_at = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        with self.__lock:
+            self.__refill()
+            if self.__tokens >= tokens:
+                self.__tokens -= tokens
+                return True
+            return False
+
+    def reserve(self, tokens: float = 1) -> float:
+        with self.__lock:
+            self.__refill()
+            self.__tokens -= tokens
+            if self.__tokens >= 0:
+                return 0.0
+            if self.__rate <= 0:
+                return float("inf")
+            return -self.__tokens / self.__rate
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    cause = error.__cause__
+    headers = getattr(cause, "headers", None)
+    if not headers or "Retry-After" not in headers:
+        return None
+    try:
+        return max(0.0, float(headers["Retry-After"]))
+    except ValueError:
+        return None
+
+
+def classify_error(error: BaseException) -> Optional[str]:
+    if isinstance(error, TransportServerError):
+        if error.code == 429:
+            return "rate_limited"
+        if error.code is not None and error.code >= 500:
+            return "transient"
+        return None
+    if isinstance(error, ClientConnectorError):
+        return "unsent"
+    if isinstance(error, (ClientError, asyncio.TimeoutError, TransportProtocolError)):
+        return "transient"
+    return None
+
+
+class RequestGovernor:
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        burst: int = 10,
+        min_rate: float = 0.5,
+        max_rate: float = 50.0,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        safe_mutations: FrozenSet[str] = frozenset(),
+        clock: Callable[[], float] = time.monotonic,
+        seed: Optional[int] = None
+    ) -> None:
+        self.__rate = rate
+        self.__burst = burst
+        self.__buckets: Dict[str, TokenBucket] = {}
+        self.__min_rate = min_rate
+        self.__max_rate = max_rate
+        self.__max_attempts = max_attempts
+        self.__base_delay = base_delay
+        self.__max_delay = max_delay
+        self.__failure_threshold = failure_threshold
+        self.__reset_timeout = reset_timeout
+        self.__safe_mutations = safe_mutations
+        self.__clock = clock
+        self.__random = random.Random(seed)
+        self.__failures = 0
+        self.__opened_at: Optional[float] = None
+        self.__trial_in_flight = False
+        self.__decreased_at: Dict[str, float] = {}
+
+    def __bucket(self, key: str) -> TokenBucket:
+        bucket = self.__buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.__rate, self.__burst, self.__clock)
+            self.__buckets[key] = bucket
+        return bucket
+
+    def rate(self, key: str) -> float:
+        return self.__bucket(key).rate
+
+    @property
+    def safe_mutations(self) -> FrozenSet[str]:
+        return self.__safe_mutations
+
+    def __acquire_circuit(self) -> bool:
+        if self.__opened_at is None:
+            return False
+        if self.__clock() - self.__opened_at < self.__reset_timeout or self.__trial_in_flight:
+            metrics.increment("governor_rejected_total")
+            raise CircuitOpenError("Circuit breaker is open, not sending request")
+        self.__trial_in_flight = True
+        return True
+
+    def __record_success(self, bucket: TokenBucket, trial: bool) -> None:
+        self.__failures = 0
+        if trial:
+            print("Circuit breaker closed")
+            self.__opened_at = None
+            self.__trial_in_flight = False
+        rate = bucket.rate
+        bucket.rate = min(self.__max_rate, rate + 1 / rate)
+
+    def __record_failure(self, key: str, kind: str, trial: bool) -> None:
+        if kind == "rate_limited":
+            now = self.__clock()
+            decreased_at = self.__decreased_at.get(key)
+            if decreased_at is None or now - decreased_at >= 1.0:
+                bucket = self.__bucket(key)
+                bucket.rate = max(self.__min_rate, bucket.rate / 2)
+                self.__decreased_at[key] = now
+        else:
+            self.__failures += 1
+        if trial or self.__failures >= self.__failure_threshold:
+            if self.__opened_at is None or trial:
+                print(f"Circuit breaker opened after {self.__failures} consecutive failures")
+                metrics.increment("governor_circuit_opened_total")
+            self.__opened_at = self.__clock()
+            self.__trial_in_flight = False
+
+    def __backoff(self, attempt: int) -> float:
+        return self.__random.uniform(0, min(self.__max_delay, self.__base_delay * 2 ** attempt))
+
+    async def call(self, request: Callable[[], Awaitable[T]], idempotent: bool, key: str = "default") -> T:
+        bucket = self.__bucket(key)
+        attempt = 0
+        while True:
+            trial = self.__acquire_circuit()
+            delay = bucket.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                result = await request()
+            except Exception as e:
+                kind = classify_error(e)
+                if kind is None:
+                    if trial:
+                        self.__record_success(bucket, trial)
+                    raise
+                self.__record_failure(key, kind, trial)
+                metrics.increment("governor_failures_total", kind=kind)
+                retryable = kind in ("rate_limited", "unsent") or idempotent
+                attempt += 1
+                if not retryable or attempt >= self.__max_attempts:
+                    raise
+                metrics.increment("governor_retries_total", kind=kind)
+                await asyncio.sleep(max(retry_after(e) or 0, self.__backoff(attempt - 1)))
+                continue
+            self.__record_success(bucket, trial)
+            return result
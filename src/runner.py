@@ -1,53 +1,188 @@
 from strategy import (
+    ENTITIES,
+    PLAYERS,
+    RESOURCES,
     Strategy,
     SkipGoldRelativeToPlayersStrategy,
     DepositMaxGoldInTreasuryStrategy,
+    OptimalAllocationStrategy,
     TrainMaxUnitStrategy
 )
-from typing import List
-from action import Action
-from executor import SimpleActionExecutor
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Hashable, List, Optional, Tuple
+from action import Action, ActionResult, AttackPlayerAction, TrainUnitAction
+from executor import AsyncActionExecutor, SimpleActionExecutor
+from models import JOB_INTERVAL, Entities, RankedPlayers, Resources
 from notifier import Notifier
-from api import API
+from metrics import metrics
+from attack import AttackRunner, BattleHistory, to_battle_result
+from history import BattleRecord, HistoryStore, PlayerSnapshot, ResourceSnapshot
+from scheduler import align_interval
+from tracker import ResourceTracker, gold_stolen
+from pipeline import PipelineSource, StaticPipelineSource, StrategyPipeline
+from api import API, AsyncAPI
+from value_store import ValueStore, ValueStoreError
+from dataclasses import replace
+import asyncio
 import random
+import time
+
+PLAYER_PAGE_SIZE = 50
+RANKED_PLAYER_COUNT = 10
+PLAN_CACHE_SIZE = 128
+
+
+def main_strategies() -> List[Strategy]:
+    return [
+        SkipGoldRelativeToPlayersStrategy(50),
+        TrainMaxUnitStrategy("Slinger"),
+        DepositMaxGoldInTreasuryStrategy()
+    ]
+
+
+def allocation_strategies() -> List[Strategy]:
+    return [
+        SkipGoldRelativeToPlayersStrategy(50),
+        OptimalAllocationStrategy()
+    ]
+
+
+def plan_strategies(
+    strategies: List[Strategy],
+    entities: Entities,
+    resources: Resources,
+    players: RankedPlayers
+) -> Tuple[List[Action], List[str]]:
+    actions: List[Action] = []
+    logs: List[str] = []
+
+    for strategy in strategies:
+        with metrics.time("strategy_plan", strategy=type(strategy).__name__):
+            strategy_plan = strategy.plan(entities, resources, players)
+        actions.extend(strategy_plan.actions)
+        resources.adjust(
+            strategy_plan.adjusted_resources.citizens,
+            strategy_plan.adjusted_resources.gold,
+            strategy_plan.adjusted_resources.treasury
+        )
+        logs.extend(strategy_plan.logs)
+
+    return actions, logs
+
+
+def tick_fingerprint(
+    entities: Entities,
+    resources: Resources,
+    players: RankedPlayers,
+    requires: FrozenSet[str] = Strategy.requires
+) -> Hashable:
+    # Strategies only read the highest ranked player of the leaderboard
+    highest = players.highest() if PLAYERS in requires else None
+    return (
+        entities.fingerprint if ENTITIES in requires else None,
+        (
+            resources.citizens,
+            resources.gold,
+            resources.treasury,
+            resources.treasury_limit
+        ) if RESOURCES in requires else None,
+        None if highest is None else (highest.id, highest.username, highest.gold)
+    )
+
+
+class PlanCache:
+
+    def __init__(self, max_size: int = PLAN_CACHE_SIZE) -> None:
+        self.__max_size = max_size
+        self.__plans: "OrderedDict[Hashable, Tuple[List[Action], List[str], Resources]]" = OrderedDict()
+
+    def plan(
+        self,
+        strategies: Callable[[], List[Strategy]],
+        entities: Entities,
+        resources: Resources,
+        players: RankedPlayers,
+        version: Hashable = None,
+        requires: FrozenSet[str] = Strategy.requires
+    ) -> Tuple[List[Action], List[str]]:
+        fingerprint = (version, tick_fingerprint(entities, resources, players, requires))
+        cached = self.__plans.get(fingerprint)
+        if cached is not None:
+            self.__plans.move_to_end(fingerprint)
+            metrics.increment("plan_cache_hits_total")
+            actions, logs, adjustment = cached
+        else:
+            metrics.increment("plan_cache_misses_total")
+            adjusted_resources = replace(resources)
+            actions, logs = plan_strategies(strategies(), entities, adjusted_resources, players)
+            adjustment = Resources(
+                adjusted_resources.citizens - resources.citizens,
+                adjusted_resources.gold - resources.gold,
+                adjusted_resources.treasury - resources.treasury
+            )
+            self.__plans[fingerprint] = (actions, logs, adjustment)
+            if len(self.__plans) > self.__max_size:
+                self.__plans.popitem(last=False)
+        resources.adjust(adjustment.citizens, adjustment.gold, adjustment.treasury)
+        return list(actions), list(logs)
+
+    def __len__(self) -> int:
+        return len(self.__plans)
+
+
+def build_rapport(logs: List[str], results: Optional[List[ActionResult]] = None) -> str:
+    rapport = ""
+    for log in logs:
+        rapport += log
+        rapport += "\n"
+    errors = [result for result in results or [] if not result.succeeded()]
+    for result in errors:
+        rapport += f"Failed {result.action}: {result.error}"
+        rapport += "\n"
+    if errors:
+        rapport += f"Job ran with {len(errors)} failed actions!"
+    else:
+        rapport += f"Job ran successfully!"
+    return rapport
 
 
 class StrategyRunner:
 
-    def __init__(self, api: API, executor: SimpleActionExecutor, notifier: Notifier) -> None:
+    def __init__(
+        self,
+        api: API,
+        executor: SimpleActionExecutor,
+        notifier: Notifier,
+        player_scan_limit: Optional[int] = PLAYER_PAGE_SIZE
+    ) -> None:
         self.__api = api
         self.__executor = executor
         self.__notifier = notifier
+        self.__player_scan_limit = player_scan_limit
+        self.__plan_cache = PlanCache()
 
-    def __run_strategies(self, strategies: List[Strategy]) -> None:
+    def __run_strategies(self, strategies: Callable[[], List[Strategy]]) -> None:
         # Get resources
         entities = self.__api.get_entities()
         resources = self.__api.get_profile_resources()
-        players = self.__api.get_players(50)
+        players = RankedPlayers.select(
+            self.__api.iter_players(PLAYER_PAGE_SIZE, self.__player_scan_limit),
+            RANKED_PLAYER_COUNT
+        )
 
         # Build actions
-        actions: List[Action] = []
-        logs: List[str] = []
-
-        for strategy in strategies:
-            strategy_plan = strategy.plan(entities, resources, players)
-            actions.extend(strategy_plan.actions)
-            resources.adjust(
-                strategy_plan.adjusted_resources.citizens,
-                strategy_plan.adjusted_resources.gold,
-                strategy_plan.adjusted_resources.treasury
-            )
-            logs.extend(strategy_plan.logs)
+        actions, logs = self.__plan_cache.plan(
+            strategies, entities, resources, players)
+        if not actions:
+            print("Nothing to do this tick, skipping the rapport")
+            metrics.increment("tick_skipped_total")
+            return
 
         # Execute
         self.__executor.execute(actions)
 
         # Report
-        rapport = ""
-        for log in logs:
-            rapport += log
-            rapport += "\n"
-        rapport += f"Job ran successfully!"
+        rapport = build_rapport(logs)
         print(rapport)
         self.__notifier.notify_info(rapport)
 
@@ -57,10 +192,262 @@ class StrategyRunner:
         print(f"New token: {new_token}")
 
         # Plan
-        strategies: List[Strategy] = [
-            SkipGoldRelativeToPlayersStrategy(50),
-            TrainMaxUnitStrategy("Slinger"),
-            DepositMaxGoldInTreasuryStrategy()
+        self.__run_strategies(main_strategies)
+
+
+class AsyncStrategyRunner:
+
+    def __init__(
+        self,
+        api: AsyncAPI,
+        executor: AsyncActionExecutor,
+        notifier: Notifier,
+        player_scan_limit: Optional[int] = PLAYER_PAGE_SIZE,
+        strategies: Callable[[], List[Strategy]] = main_strategies,
+        resource_tracker: Optional[ResourceTracker] = None,
+        attack_runner: Optional[AttackRunner] = None,
+        battle_history: Optional[BattleHistory] = None,
+        history_store: Optional[HistoryStore] = None,
+        account_id: str = "default",
+        pipeline_source: Optional[PipelineSource] = None,
+        value_store: Optional[ValueStore] = None
+    ) -> None:
+        self.__api = api
+        self.__executor = executor
+        self.__notifier = notifier
+        self.__player_scan_limit = player_scan_limit
+        self.__pipeline_source = pipeline_source
+        if pipeline_source is None:
+            self.__pipeline_source = StaticPipelineSource(StrategyPipeline.from_factory(strategies))
+        self.__resource_tracker = resource_tracker
+        self.__attack_runner = attack_runner
+        self.__battle_history = battle_history
+        self.__history_store = history_store
+        self.__account_id = account_id
+        self.__ranked_player_count = RANKED_PLAYER_COUNT
+        if attack_runner is not None:
+            self.__ranked_player_count = max(RANKED_PLAYER_COUNT, attack_runner.candidates)
+        self.__value_store = value_store
+        self.__training_time: Optional[int] = None
+        self.__plan_cache = PlanCache()
+
+    def job_interval(self, interval: float = JOB_INTERVAL) -> float:
+        if self.__training_time is None:
+            return interval
+        return align_interval(interval, self.__training_time)
+
+    async def shared_job_interval(self, interval: float = JOB_INTERVAL) -> float:
+        # Workers learn the training time from their own jobs, so adopt the
+        # one saved by whichever worker ran the account last.
+        if self.__value_store is not None:
+            try:
+                training_time = await asyncio.to_thread(self.__value_store.read_value, 'training_time')
+            except ValueStoreError as e:
+                print(f"Could not read the shared training time, using the local one: {e}")
+            else:
+                self.__training_time = int(training_time or 0) or None
+        return self.job_interval(interval)
+
+    async def restore(self) -> None:
+        try:
+            changed = await self.__api.reload_token()
+        except ValueStoreError as e:
+            print(f"Could not reload the token, using the current one: {e}")
+            return
+        if changed:
+            print(f"Account {self.__account_id} was run by another worker, reloading its state")
+            if self.__resource_tracker is not None:
+                self.__resource_tracker.reset()
+
+    def __track_training_time(self, entities: Entities, results: List[ActionResult]) -> None:
+        training_times = [
+            unit.training_time
+            for unit in (
+                entities.unit_by_id(result.action.unit_id)
+                for result in results
+                if isinstance(result.action, TrainUnitAction) and result.succeeded()
+            )
+            if unit is not None and unit.training_time
+        ]
+        self.__training_time = max(training_times, default=None)
+
+    async def __get_resources(self) -> Resources:
+        tracker = self.__resource_tracker
+        if tracker is None or tracker.needs_sync():
+            resources = await self.__api.get_profile_resources()
+            if tracker is not None:
+                tracker.sync(resources)
+            return resources
+        return tracker.resources()
+
+    async def __get_tick_data(self, requires: FrozenSet[str]) -> Tuple[Entities, Optional[Resources], RankedPlayers]:
+
+        async def skipped(value):
+            return value
+
+        return await asyncio.gather(
+            self.__api.get_entities() if ENTITIES in requires else skipped(Entities((), ())),
+            self.__get_resources() if RESOURCES in requires else skipped(None),
+            self.__api.get_ranked_players(
+                PLAYER_PAGE_SIZE,
+                self.__player_scan_limit,
+                self.__ranked_player_count
+            ) if PLAYERS in requires else skipped(RankedPlayers(()))
+        )
+
+    def __record_history(
+        self,
+        timestamp: float,
+        resources: Optional[ResourceSnapshot],
+        players: List[PlayerSnapshot],
+        results: List[ActionResult]
+    ) -> None:
+        gold_by_player_id = {player.player_id: player.gold or 0 for player in players}
+        battles = []
+        for result in results:
+            battle_result = to_battle_result(result.data)
+            if not isinstance(result.action, AttackPlayerAction) or battle_result is None:
+                continue
+            battles.append(BattleRecord(
+                timestamp,
+                self.__account_id,
+                result.action.id,
+                gold_by_player_id.get(result.action.id, 0),
+                battle_result.result,
+                battle_result.gold_stolen or 0
+            ))
+        if resources is not None:
+            self.__history_store.record_resources([resources])
+        self.__history_store.record_players(players)
+        self.__history_store.record_battles(battles)
+
+    async def __run_strategies(self, pipeline: StrategyPipeline) -> None:
+        requires = pipeline.requires
+        if self.__attack_runner is not None:
+            requires = requires | {PLAYERS}
+
+        # Get resources
+        with metrics.time("tick_stage", stage="tick_data"):
+            entities, resources, players = await self.__get_tick_data(requires)
+        timestamp = time.time()
+        resource_snapshot = None
+        if resources is None:
+            resources = Resources()
+        else:
+            resource_snapshot = ResourceSnapshot(
+                timestamp,
+                self.__account_id,
+                resources.citizens,
+                resources.gold,
+                resources.treasury
+            )
+        player_snapshots = [
+            PlayerSnapshot(timestamp, player.id, player.username, player.gold)
+            for player in players
         ]
 
-        self.__run_strategies(strategies)
+        # Attack
+        attack_results: List[ActionResult] = []
+        attack_logs: List[str] = []
+        if self.__attack_runner is not None:
+            with metrics.time("tick_stage", stage="attack"):
+                attack_results, attack_logs = await self.__attack_runner.run(
+                    self.__api, players)
+            resources.adjust(0, sum(
+                gold_stolen(result.data) for result in attack_results if result.succeeded()
+            ), 0)
+
+        # Build actions
+        with metrics.time("tick_stage", stage="plan"):
+            actions, logs = self.__plan_cache.plan(
+                pipeline.strategies, entities, resources, players, pipeline.version, pipeline.requires)
+
+        # Execute
+        if actions:
+            with metrics.time("tick_stage", stage="execute"):
+                results = await self.__executor.execute(actions)
+        else:
+            results = []
+        self.__track_training_time(entities, results)
+        if self.__value_store is not None:
+            await asyncio.to_thread(
+                self.__value_store.update_value, 'training_time', self.__training_time or 0)
+        if self.__battle_history is not None:
+            self.__battle_history.record_results(players, results)
+        results = attack_results + results
+        if self.__resource_tracker is not None:
+            self.__resource_tracker.apply(entities, results)
+
+        # Report
+        with metrics.time("tick_stage", stage="report"):
+            if self.__history_store is not None:
+                await asyncio.to_thread(
+                    self.__record_history,
+                    timestamp,
+                    resource_snapshot,
+                    player_snapshots,
+                    results
+                )
+            if not results:
+                print("Nothing to do this tick, skipping the rapport")
+                metrics.increment("tick_skipped_total")
+                return
+            rapport = build_rapport(attack_logs + logs, results)
+            print(rapport)
+            self.__notifier.notify_info(rapport)
+
+    async def run_main_strategies(self) -> None:
+        with metrics.time("tick"):
+            # Refresh token
+            with metrics.time("tick_stage", stage="refresh_token"):
+                new_token = await self.__api.refresh_token()
+            print(f"New token: {new_token}")
+
+            # Plan
+            pipeline = await asyncio.to_thread(self.__pipeline_source.current)
+            await self.__run_strategies(pipeline)
+
+
+class MultiAccountRunner:
+
+    def __init__(
+        self,
+        runners: Dict[str, AsyncStrategyRunner],
+        notifier: Notifier,
+        max_concurrency: int = 4
+    ) -> None:
+        self.__runners = runners
+        self.__notifier = notifier
+        self.__semaphore = asyncio.Semaphore(max_concurrency)
+
+    @property
+    def account_ids(self) -> List[str]:
+        return list(self.__runners.keys())
+
+    def job_interval(self, account_id: str, interval: float = JOB_INTERVAL) -> float:
+        return self.__runners[account_id].job_interval(interval)
+
+    async def shared_job_interval(self, account_id: str, interval: float = JOB_INTERVAL) -> float:
+        return await self.__runners[account_id].shared_job_interval(interval)
+
+    async def restore(self, account_id: str) -> None:
+        await self.__runners[account_id].restore()
+
+    async def run_account(self, account_id: str) -> bool:
+        async with self.__semaphore:
+            try:
+                await self.__runners[account_id].run_main_strategies()
+                return True
+            except Exception as e:
+                print(f"Unexpected job error for {account_id}: {e}")
+                self.__notifier.notify_error(
+                    f"Unexpected job error for {account_id}: {e}")
+                return False
+
+    async def run_main_strategies(self, account_ids: Optional[List[str]] = None) -> List[bool]:
+        if account_ids is None:
+            account_ids = self.account_ids
+        return await asyncio.gather(*(
+            self.run_account(account_id)
+            for account_id in account_ids
+        ))
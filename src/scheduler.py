@@ -0,0 +1,133 @@
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional, Union
+import asyncio
+import math
+import random
+import time
+
+Interval = Union[float, Callable[[], float]]
+
+
+def align_interval(interval: float, period: float) -> float:
+    if period <= 0:
+        return interval
+    return max(period, math.floor(interval / period) * period)
+
+
+def window_start(timestamp: float, interval: float, offset: float = 0) -> float:
+    return math.floor((timestamp - offset) / interval) * interval + offset
+
+
+@dataclass
+class ScheduledJob:
+    name: str
+    interval: Interval
+    job: Callable[[float], Awaitable[None]]
+    offset: float = 0
+    jitter: float = 0
+    delay: float = 0
+    next_window: float = 0
+    next_run: float = 0
+    task: Optional["asyncio.Task"] = field(default=None, repr=False)
+
+    def current_interval(self) -> float:
+        return self.interval() if callable(self.interval) else self.interval
+
+
+class AsyncScheduler:
+
+    def __init__(self, clock: Callable[[], float] = time.time, seed: Optional[int] = None) -> None:
+        self.__clock = clock
+        self.__random = random.Random(seed)
+        self.__jobs: List[ScheduledJob] = []
+        self.__wakeup: Optional[asyncio.Event] = None
+        self.__stopping = False
+
+    @property
+    def jobs(self) -> List[ScheduledJob]:
+        return list(self.__jobs)
+
+    def __schedule(self, job: ScheduledJob, window: float) -> None:
+        job.next_window = window
+        job.next_run = window + job.delay
+
+    def every(
+        self,
+        interval: Interval,
+        job: Callable[[float], Awaitable[None]],
+        name: str,
+        offset: float = 0,
+        jitter: float = 0,
+        catch_up_from: Optional[float] = None
+    ) -> ScheduledJob:
+        # The delay is drawn once, so every run of the job starts the same time
+        # after its window and units trained by the last run are ready
+        scheduled_job = ScheduledJob(name, interval, job, offset, jitter, self.__random.uniform(0, jitter))
+        now = self.__clock()
+        current_interval = scheduled_job.current_interval()
+        current_window = window_start(now, current_interval, offset)
+        if catch_up_from is not None and catch_up_from < current_window:
+            print(f"Catching up on missed window of {name}")
+            self.__schedule(scheduled_job, current_window)
+        else:
+            self.__schedule(scheduled_job, current_window + current_interval)
+        self.__jobs.append(scheduled_job)
+        if self.__wakeup is not None:
+            self.__wakeup.set()
+        return scheduled_job
+
+    def __start(self, job: ScheduledJob) -> None:
+        window = job.next_window
+        if job.task is not None and not job.task.done():
+            print(f"Skipping window of {job.name} because its previous run is still going")
+        else:
+            job.task = asyncio.ensure_future(self.__run_job(job, window))
+        self.__schedule_after(job, window)
+
+    def __schedule_after(self, job: ScheduledJob, window: float) -> None:
+        interval = job.current_interval()
+        self.__schedule(
+            job,
+            max(window_start(self.__clock(), interval, job.offset), window) + interval
+        )
+
+    async def __run_job(self, job: ScheduledJob, window: float) -> None:
+        try:
+            await job.job(window)
+        except Exception as e:
+            print(f"Unexpected error in scheduled job {job.name}: {e}")
+        # A run can change the interval of its job, which then applies from
+        # the window after it instead of one window later
+        self.__schedule_after(job, window)
+        if self.__wakeup is not None:
+            self.__wakeup.set()
+
+    async def run(self) -> None:
+        self.__wakeup = asyncio.Event()
+        self.__stopping = False
+        try:
+            while not self.__stopping:
+                now = self.__clock()
+                for job in self.__jobs:
+                    if job.next_run <= now:
+                        self.__start(job)
+                if not self.__jobs:
+                    timeout = None
+                else:
+                    timeout = max(0.0, min(job.next_run for job in self.__jobs) - self.__clock())
+                    print(f"Sleeping for {math.floor(timeout)} seconds...")
+                self.__wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.__wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            tasks = [job.task for job in self.__jobs if job.task is not None and not job.task.done()]
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            self.__wakeup = None
+
+    def stop(self) -> None:
+        self.__stopping = True
+        if self.__wakeup is not None:
+            self.__wakeup.set()
@@ -0,0 +1,202 @@
+from bisect import bisect
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+from notifier import Notifier
+from runner import MultiAccountRunner
+from value_store import BlockingConnectionPool
+import asyncio
+import hashlib
+import os
+
+
+def hash_key(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+def tick_key(window: float, interval: float) -> str:
+    return str(int(window // interval))
+
+
+class HashRing:
+
+    def __init__(self, nodes: Iterable[str], replicas: int = 64) -> None:
+        ring: List[Tuple[int, str]] = []
+        for node in nodes:
+            for replica in range(replicas):
+                ring.append((hash_key(f"{node}#{replica}"), node))
+        ring.sort()
+        self.__hashes = [entry[0] for entry in ring]
+        self.__nodes = [entry[1] for entry in ring]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self.__nodes:
+            return None
+        index = bisect(self.__hashes, hash_key(key)) % len(self.__hashes)
+        return self.__nodes[index]
+
+
+class PostgreSQLLeaseStore:
+
+    def __init__(self, notifier: Notifier, max_connections: int = 2) -> None:
+        self.__notifier = notifier
+        self.__pool = BlockingConnectionPool(
+            1,
+            max_connections,
+            os.environ['DATABASE_URL']
+        )
+        self.__create_table_if_not_exists()
+
+    def __run_query(self, callable: Callable) -> Any:
+        connection = None
+        cursor = None
+        try:
+            connection = self.__pool.getconn()
+            cursor = connection.cursor()
+            return callable(cursor, connection)
+        except Exception as e:
+            if connection and not connection.closed:
+                connection.rollback()
+            print(f"Unexpected database error: {e}")
+            self.__notifier.notify_error(f"Unexpected database error: {e}")
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                self.__pool.putconn(connection)
+
+    def __create_table_if_not_exists(self) -> None:
+
+        def query(cursor, connection) -> None:
+            query = """
+                CREATE TABLE IF NOT EXISTS leases (
+                    name VARCHAR NOT NULL,
+                    owner VARCHAR NOT NULL,
+                    expires_at TIMESTAMPTZ NOT NULL,
+                    PRIMARY KEY (name)
+                );
+            """
+            cursor.execute(query)
+            connection.commit()
+
+        self.__run_query(query)
+
+    def heartbeat(self, worker_id: str, ttl: int) -> None:
+
+        def query(cursor, connection) -> None:
+            query = """
+                INSERT INTO leases (name, owner, expires_at)
+                VALUES (%s, %s, now() + %s * interval '1 second')
+                ON CONFLICT (name) DO UPDATE
+                SET owner = EXCLUDED.owner, expires_at = EXCLUDED.expires_at;
+            """
+            cursor.execute(query, (f"worker:{worker_id}", worker_id, ttl))
+            connection.commit()
+
+        self.__run_query(query)
+
+    def retire(self, worker_id: str) -> None:
+
+        def query(cursor, connection) -> None:
+            query = """
+                DELETE FROM leases
+                WHERE name = %s;
+            """
+            cursor.execute(query, (f"worker:{worker_id}",))
+            connection.commit()
+
+        self.__run_query(query)
+
+    def live_workers(self) -> List[str]:
+
+        def query(cursor, connection) -> List[str]:
+            query = """
+                SELECT owner
+                FROM leases
+                WHERE name LIKE 'worker:%' AND expires_at > now();
+            """
+            cursor.execute(query)
+            return [row[0] for row in cursor.fetchall()]
+
+        return self.__run_query(query) or []
+
+    def acquire_tick(self, account_id: str, tick: str, worker_id: str, ttl: int) -> bool:
+
+        def query(cursor, connection) -> bool:
+            query = """
+                INSERT INTO leases (name, owner, expires_at)
+                VALUES (%s, %s, now() + %s * interval '1 second')
+                ON CONFLICT (name) DO NOTHING
+                RETURNING owner;
+            """
+            cursor.execute(query, (f"tick:{account_id}:{tick}", worker_id, ttl))
+            acquired = cursor.fetchone() is not None
+            connection.commit()
+            return acquired
+
+        return bool(self.__run_query(query))
+
+    def purge_expired_ticks(self) -> None:
+
+        def query(cursor, connection) -> None:
+            query = """
+                DELETE FROM leases
+                WHERE name LIKE 'tick:%' AND expires_at < now();
+            """
+            cursor.execute(query)
+            connection.commit()
+
+        self.__run_query(query)
+
+    def close(self) -> None:
+        self.__pool.closeall()
+
+
+class ShardedRunner:
+
+    def __init__(
+        self,
+        runner: MultiAccountRunner,
+        lease_store: PostgreSQLLeaseStore,
+        worker_id: str,
+        heartbeat_ttl: int = 180,
+        tick_ttl: int = 24 * 60 * 60
+    ) -> None:
+        self.__runner = runner
+        self.__lease_store = lease_store
+        self.__worker_id = worker_id
+        self.__heartbeat_ttl = heartbeat_ttl
+        self.__tick_ttl = tick_ttl
+
+    def heartbeat(self) -> None:
+        self.__lease_store.heartbeat(self.__worker_id, self.__heartbeat_ttl)
+
+    def retire(self) -> None:
+        self.__lease_store.retire(self.__worker_id)
+
+    def purge_expired_ticks(self) -> None:
+        self.__lease_store.purge_expired_ticks()
+
+    def shard(self) -> List[str]:
+        workers = set(self.__lease_store.live_workers())
+        workers.add(self.__worker_id)
+        ring = HashRing(sorted(workers))
+        return [
+            account_id for account_id in self.__runner.account_ids
+            if ring.owner(account_id) == self.__worker_id
+        ]
+
+    async def run_account(self, account_id: str, window: float) -> bool:
+        shard = await asyncio.to_thread(self.shard)
+        if account_id not in shard:
+            return False
+        tick = tick_key(window, await self.__runner.shared_job_interval(account_id))
+        if not await asyncio.to_thread(
+            self.__lease_store.acquire_tick,
+            account_id,
+            tick,
+            self.__worker_id,
+            self.__tick_ttl
+        ):
+            print(f"Account {account_id} already ran in tick {tick}")
+            return False
+        await self.__runner.restore(account_id)
+        return await self.__runner.run_account(account_id)
@@ -0,0 +1,299 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from api import (
+    AsyncAPI,
+    map_battle_result,
+    map_citizen_price,
+    map_entities,
+    map_players,
+    map_players_page,
+    map_player_table_page,
+    map_profile_resources,
+    map_token
+)
+from models import BattleResult, Entities, Mutation, Player, PlayerTable, Resources
+import asyncio
+import math
+import random
+
+
+class SimulatedAPIError(Exception):
+    pass
+
+
+@dataclass
+class SimulationConfig:
+    seed: int = 0
+    building_count: int = 4
+    units_per_building: int = 4
+    items_per_building: int = 4
+    player_count: int = 1_000
+    citizens: int = 50
+    gold: int = 1_000_000
+    treasury: int = 0
+    treasury_limit: int = 5_000_000
+    citizens_per_tick: int = 10
+    gold_per_tick: int = 250_000
+    latency: float = 0.0
+    latency_jitter: float = 0.0
+    failure_rate: float = 0.0
+
+
+class SimulatedGame:
+
+    def __init__(self, config: SimulationConfig) -> None:
+        self.__config = config
+        self.__random = random.Random(config.seed)
+        self.citizens = config.citizens
+        self.gold = config.gold
+        self.treasury = config.treasury
+        self.treasury_limit = config.treasury_limit
+        self.units: Dict[int, int] = {}
+        self.owned_items: Dict[int, int] = {}
+        self.buildings = self.__generate_buildings()
+        self.item_prices = {
+            item["id"]: item["price"]
+            for building in self.buildings
+            for item in building["items"]
+        }
+        self.unit_items = {
+            unit["id"]: [
+                (unit_item["item"]["id"], unit_item["quantity"])
+                for unit_item in unit["unit_items"]
+            ]
+            for building in self.buildings
+            for unit in building["units"]
+        }
+        self.players = [
+            {
+                "id": id,
+                "username": f"Player {id}",
+                "resources": {
+                    "gold": None if self.__random.random() < 0.05
+                    else self.__random.randint(0, 10_000_000)
+                }
+            }
+            for id in range(self.__config.player_count)
+        ]
+
+    def __generate_buildings(self) -> List[Dict]:
+        buildings: List[Dict] = []
+        unit_id = 0
+        item_id = 0
+        for building_id in range(self.__config.building_count):
+            items: List[Dict] = []
+            for _ in range(self.__config.items_per_building):
+                items.append({
+                    "id": item_id,
+                    "name": f"Item {item_id}",
+                    "price": self.__random.randint(1, 50) * 1_000
+                })
+                item_id += 1
+            units: List[Dict] = []
+            for _ in range(self.__config.units_per_building):
+                unit_items = [
+                    {"item": item, "quantity": self.__random.randint(1, 3)}
+                    for item in self.__random.sample(items, self.__random.randint(0, min(2, len(items))))
+                ]
+                units.append({
+                    "id": unit_id,
+                    "name": f"Unit {unit_id}",
+                    "attack_strength": self.__random.randint(0, 100),
+                    "defense_strength": self.__random.randint(0, 100),
+                    "gold_proceeds": self.__random.randint(0, 100),
+                    "training_time": {"totalSeconds": self.__random.choice([30, 60, 120, 300])},
+                    "is_available": True,
+                    "unit_items": unit_items
+                })
+                unit_id += 1
+            buildings.append({
+                "name": f"Building {building_id}",
+                "main_type": "MILITARY",
+                "units": units,
+                "items": items
+            })
+        return buildings
+
+    def next_tick(self) -> None:
+        self.citizens += self.__config.citizens_per_tick
+        self.gold += self.__config.gold_per_tick
+        for player in self.players:
+            if player["resources"]["gold"] is not None:
+                player["resources"]["gold"] += self.__random.randint(0, 100_000)
+
+    def profile_response(self) -> Dict:
+        return {
+            "viewerProfile": {
+                "housing": {"citizens": self.citizens},
+                "resources": {"gold": self.gold, "treasury": self.treasury},
+                "upgrades": {"treasury": {"current": {"limit": self.treasury_limit}}}
+            }
+        }
+
+    def buildings_response(self) -> Dict:
+        return {"buildings": {"data": self.buildings}}
+
+    def players_response(self, first: int, page: int = 1) -> Dict:
+        start = (page - 1) * first
+        return {
+            "profiles": {
+                "paginatorInfo": {"hasMorePages": start + first < len(self.players)},
+                "data": self.players[start:start + first]
+            }
+        }
+
+    def recruit_citizens(self, amount: int) -> Dict:
+        self.citizens += amount
+        return {"citizens": self.citizens, "max_citizens": self.citizens}
+
+    def buy_items(self, items: List[Dict[str, int]]) -> Dict:
+        price = sum(self.item_prices[item["id"]] * item["quantity"] for item in items)
+        if price > self.gold:
+            raise SimulatedAPIError("Not enough gold")
+        self.gold -= price
+        for item in items:
+            self.owned_items[item["id"]] = self.owned_items.get(item["id"], 0) + item["quantity"]
+        return {
+            "owned_items": [
+                {"item": {"id": id, "name": f"Item {id}"}, "quantity": quantity}
+                for id, quantity in self.owned_items.items()
+            ]
+        }
+
+    def train_unit(self, unit_id: int, quantity: int) -> Dict:
+        if quantity > self.citizens:
+            raise SimulatedAPIError("Not enough citizens")
+        for item_id, item_quantity in self.unit_items[unit_id]:
+            if self.owned_items.get(item_id, 0) < item_quantity * quantity:
+                raise SimulatedAPIError("Not enough items")
+        for item_id, item_quantity in self.unit_items[unit_id]:
+            self.owned_items[item_id] -= item_quantity * quantity
+        self.citizens -= quantity
+        self.units[unit_id] = self.units.get(unit_id, 0) + quantity
+        return {"id": unit_id}
+
+    def untrain_unit(self, unit_id: int, quantity: int) -> Dict:
+        quantity = min(quantity, self.units.get(unit_id, 0))
+        self.units[unit_id] = self.units.get(unit_id, 0) - quantity
+        self.citizens += quantity
+        return {"id": unit_id}
+
+    def deposit_to_treasury(self, amount: int) -> Dict:
+        if amount > self.gold or self.treasury + amount > self.treasury_limit:
+            raise SimulatedAPIError("Invalid deposit")
+        self.gold -= amount
+        self.treasury += amount
+        return {"id": 0}
+
+    def battle(self, id: int) -> Dict:
+        player = self.players[id]
+        gold = player["resources"]["gold"] or 0
+        if self.__random.random() < 0.5:
+            stolen = math.floor(gold * self.__random.uniform(0.05, 0.2))
+            player["resources"]["gold"] = gold - stolen
+            self.gold += stolen
+            return {"result": "Success", "gold_stolen": stolen}
+        return {"result": "Defeat", "gold_stolen": 0}
+
+
+class SimulatedAPI(AsyncAPI):
+
+    def __init__(self, config: SimulationConfig, game: Optional[SimulatedGame] = None) -> None:
+        self.__config = config
+        self.__game = game if game is not None else SimulatedGame(config)
+        self.__random = random.Random(config.seed + 1)
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def game(self) -> SimulatedGame:
+        return self.__game
+
+    async def __request(self) -> None:
+        self.requests += 1
+        latency = self.__config.latency
+        if self.__config.latency_jitter:
+            latency += self.__random.uniform(0, self.__config.latency_jitter)
+        if latency > 0:
+            await asyncio.sleep(latency)
+        if self.__random.random() < self.__config.failure_rate:
+            self.failures += 1
+            raise SimulatedAPIError("Simulated transport failure")
+
+    async def refresh_token(self) -> str:
+        await self.__request()
+        return map_token({"refreshToken": f"SIMULATED_TOKEN_{self.requests}"})
+
+    async def get_citizen_prize(self) -> int:
+        await self.__request()
+        return map_citizen_price({"recruitCitizenPrice": 100_000})
+
+    async def get_profile_resources(self) -> Resources:
+        await self.__request()
+        return map_profile_resources(self.__game.profile_response())
+
+    async def recruit_citizen(self, amount: int) -> None:
+        await self.__request()
+        self.__game.recruit_citizens(amount)
+
+    async def train_unit(self, unit_id: int, quantity: int) -> None:
+        await self.__request()
+        self.__game.train_unit(unit_id, quantity)
+
+    async def untrain_unit(self, unit_id: int, quantity: int) -> None:
+        await self.__request()
+        self.__game.untrain_unit(unit_id, quantity)
+
+    async def buy_items(self, items: List[Dict[str, int]]) -> None:
+        await self.__request()
+        self.__game.buy_items(items)
+
+    async def get_entities(self) -> Entities:
+        await self.__request()
+        return map_entities(self.__game.buildings_response())
+
+    async def deposit_to_treasury(self, amount: int) -> None:
+        await self.__request()
+        self.__game.deposit_to_treasury(amount)
+
+    async def get_players(self, first: int) -> List[Player]:
+        await self.__request()
+        return map_players(self.__game.players_response(first))
+
+    async def get_players_page(self, first: int, page: int) -> Tuple[List[Player], bool]:
+        await self.__request()
+        return map_players_page(self.__game.players_response(first, page))
+
+    async def fill_players_page(self, table: PlayerTable, first: int, page: int) -> Tuple[int, bool]:
+        await self.__request()
+        return map_player_table_page(self.__game.players_response(first, page), table)
+
+    async def attack_player(self, id: int) -> BattleResult:
+        await self.__request()
+        return map_battle_result({"actionBattle": self.__game.battle(id)})
+
+    def __apply_mutation(self, mutation: Mutation) -> Any:
+        input = mutation.input
+        if mutation.field == "actionBuyItems":
+            return self.__game.buy_items(input["items"])
+        elif mutation.field == "actionTrainBuildingUnit":
+            return self.__game.train_unit(input["id"], input["quantity"])
+        elif mutation.field == "actionUntrainBuildingUnit":
+            return self.__game.untrain_unit(input["id"], input["quantity"])
+        elif mutation.field == "actionTreasuryDeposit":
+            return self.__game.deposit_to_treasury(input["amount"])
+        elif mutation.field == "actionRecruitCitizens":
+            return self.__game.recruit_citizens(input["amount"])
+        elif mutation.field == "actionBattle":
+            return self.__game.battle(input["id"])
+        raise SimulatedAPIError(f"Unknown mutation {mutation.field}")
+
+    async def execute_mutations(self, mutations: List[Mutation]) -> List[Tuple[Any, Optional[str]]]:
+        await self.__request()
+        results: List[Tuple[Any, Optional[str]]] = []
+        for mutation in mutations:
+            try:
+                results.append((self.__apply_mutation(mutation), None))
+            except SimulatedAPIError as e:
+                results.append((None, str(e)))
+        return results
@@ -0,0 +1,191 @@
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional, Set, Tuple
+from aiohttp import web
+from documents import load_schema
+from graphql import graphql
+from ratelimit import TokenBucket
+from simulation import SimulatedGame, SimulationConfig
+import argparse
+import asyncio
+import hashlib
+import json
+
+SCHEMA = load_schema()
+
+
+@dataclass
+class StandInConfig:
+    simulation: SimulationConfig
+    latency: float = 0.0
+    rate_limit: Optional[float] = None
+    burst: int = 10
+    batch_latency: float = 0.0
+    error_status: int = 200
+
+
+class StandInServer:
+
+    def __init__(self, config: StandInConfig) -> None:
+        self.__config = config
+        self.__games: Dict[str, SimulatedGame] = {}
+        self.__buckets: Dict[str, TokenBucket] = {}
+        self.__persisted_queries: Dict[str, str] = {}
+        self.__connections: Set[Tuple] = set()
+        self.__token_counter = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.persisted_query_misses = 0
+        self.errors = 0
+
+    def __game(self, token: str) -> SimulatedGame:
+        game = self.__games.get(token)
+        if game is None:
+            game = SimulatedGame(replace(
+                self.__config.simulation,
+                seed=self.__config.simulation.seed + len(self.__games)
+            ))
+            self.__games[token] = game
+        return game
+
+    def __refresh_token(self, token: str) -> str:
+        self.__token_counter += 1
+        new_token = f"stand-in-{self.__token_counter}"
+        game = self.__game(token)
+        game.next_tick()
+        self.__games[new_token] = game
+        return new_token
+
+    def __profiles(self, game: SimulatedGame, first: int, page: int) -> Dict[str, Any]:
+        profiles = game.players_response(first, page)["profiles"]
+        profiles["paginatorInfo"]["currentPage"] = page
+        return profiles
+
+    def __root(self, token: str) -> Dict[str, Any]:
+        game = self.__game(token)
+        return {
+            "refreshToken": lambda info: self.__refresh_token(token),
+            "recruitCitizenPrice": lambda info: 100_000,
+            "viewerProfile": lambda info: game.profile_response()["viewerProfile"],
+            "buildings": lambda info: game.buildings_response()["buildings"],
+            "profiles": lambda info, first, page=1: self.__profiles(game, first, page),
+            "actionRecruitCitizens": lambda info, input: game.recruit_citizens(input["amount"]),
+            "actionTrainBuildingUnit": lambda info, input: game.train_unit(input["id"], input["quantity"]),
+            "actionUntrainBuildingUnit": lambda info, input: game.untrain_unit(input["id"], input["quantity"]),
+            "actionBuyItems": lambda info, input: game.buy_items(input["items"]),
+            "actionTreasuryDeposit": lambda info, input: game.deposit_to_treasury(input["amount"]),
+            "actionBattle": lambda info, input: game.battle(input["id"])
+        }
+
+    def __query(self, payload: Dict) -> Tuple[Optional[str], Optional[Dict]]:
+        query = payload.get("query")
+        persisted = (payload.get("extensions") or {}).get("persistedQuery")
+        if persisted is None:
+            return query, None
+        sha256_hash = persisted.get("sha256Hash")
+        if query is not None:
+            if hashlib.sha256(query.encode("utf-8")).hexdigest() != sha256_hash:
+                return None, {"message": "provided sha does not match query"}
+            self.__persisted_queries[sha256_hash] = query
+            return query, None
+        query = self.__persisted_queries.get(sha256_hash)
+        if query is None:
+            return None, {
+                "message": "PersistedQueryNotFound",
+                "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"}
+            }
+        return query, None
+
+    async def handle_graphql(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        self.__connections.add(request.transport.get_extra_info("peername"))
+        token = request.headers.get("authorization", "").replace("Bearer ", "")
+        if self.__config.rate_limit is not None:
+            bucket = self.__buckets.get(token)
+            if bucket is None:
+                bucket = TokenBucket(self.__config.rate_limit, self.__config.burst)
+                self.__buckets[token] = bucket
+            if not bucket.try_acquire():
+                self.rate_limited += 1
+                return web.json_response(
+                    {"errors": [{"message": "Too Many Requests"}]},
+                    status=429,
+                    headers={"Retry-After": str(1 / self.__config.rate_limit)}
+                )
+        payload = await request.json()
+        query, error = self.__query(payload)
+        if error is not None:
+            self.persisted_query_misses += 1
+            return web.json_response({"errors": [error]})
+        latency = self.__config.latency
+        latency += self.__config.batch_latency * max(0, query.count("(input:") - 1)
+        if latency > 0:
+            await asyncio.sleep(latency)
+        result = await graphql(
+            SCHEMA,
+            query,
+            root_value=self.__root(token),
+            variable_values=payload.get("variables")
+        )
+        response: Dict[str, Any] = {"data": result.data}
+        if result.errors:
+            self.errors += 1
+            response["errors"] = [error.formatted for error in result.errors]
+        return web.json_response(
+            response,
+            status=self.__config.error_status if result.errors else 200,
+            dumps=lambda data: json.dumps(data, separators=(",", ":"))
+        )
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "requests": self.requests,
+            "connections": len(self.__connections),
+            "rate_limited": self.rate_limited,
+            "persisted_query_misses": self.persisted_query_misses,
+            "errors": self.errors,
+            "games": len(set(map(id, self.__games.values())))
+        })
+
+    def application(self) -> web.Application:
+        application = web.Application()
+        application.router.add_post("/graphql", self.handle_graphql)
+        application.router.add_get("/stats", self.handle_stats)
+        return application
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Serve a local stand-in for the game's GraphQL API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--buildings", type=int, default=4)
+    parser.add_argument("--units", type=int, default=4)
+    parser.add_argument("--items", type=int, default=4)
+    parser.add_argument("--players", type=int, default=1_000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--batch-latency", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--error-status", type=int, default=200)
+    args = parser.parse_args()
+
+    server = StandInServer(StandInConfig(
+        SimulationConfig(
+            seed=args.seed,
+            building_count=args.buildings,
+            units_per_building=args.units,
+            items_per_building=args.items,
+            player_count=args.players
+        ),
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        burst=args.burst,
+        batch_latency=args.batch_latency,
+        error_status=args.error_status
+    ))
+    web.run_app(server.application(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
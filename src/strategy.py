@@ -5,10 +5,11 @@ from action import (
     TrainUnitAction,
     AttackPlayerAction
 )
-from models import Entities, Player, Resources
+from allocator import UnitWeights, allocate
+from models import Entities, RankedPlayers, Resources, player_gold
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, FrozenSet, List
 import math
 
 
@@ -19,52 +20,57 @@ class StrategyPlan:
     logs: List[str]
 
 
+ENTITIES = "entities"
+RESOURCES = "resources"
+PLAYERS = "players"
+
+
 class Strategy(ABC):
+    requires: FrozenSet[str] = frozenset((ENTITIES, RESOURCES, PLAYERS))
 
     def __init__(self) -> None:
         self._actions: List[Action] = []
         self._adjusted_resources = Resources()
         self._logs: List[str] = []
 
-    def plan(self, entities: Entities, resources: Resources, players: List[Player]) -> StrategyPlan:
+    def plan(self, entities: Entities, resources: Resources, players: RankedPlayers) -> StrategyPlan:
+        self._actions = []
+        self._adjusted_resources = Resources()
+        self._logs = []
         self._plan(entities, resources, players)
         return StrategyPlan(self._actions, self._adjusted_resources, self._logs)
 
     @abstractmethod
-    def _plan(self, entities: Entities, resources: Resources, players: List[Player]) -> None:
+    def _plan(self, entities: Entities, resources: Resources, players: RankedPlayers) -> None:
         pass
 
 
 class SkipGoldStrategy(Strategy):
+    requires = frozenset((RESOURCES,))
 
     def __init__(self, percentage: int) -> None:
         super().__init__()
         self.__percentage = percentage
 
-    def _plan(self, entities: Entities, resources: Resources, players: List[Player]) -> None:
+    def _plan(self, entities: Entities, resources: Resources, players: RankedPlayers) -> None:
         gold_skip = math.floor(resources.gold * self.__percentage / 100)
         self._adjusted_resources.gold -= gold_skip
         self._logs.append(f"Skipping {self.__percentage}% ({gold_skip}) gold")
 
 
 class SkipGoldRelativeToPlayersStrategy(Strategy):
+    requires = frozenset((RESOURCES, PLAYERS))
 
     def __init__(self, percentage: int) -> None:
         super().__init__()
         self.__percentage = percentage
 
-    def _plan(self, entities: Entities, resources: Resources, players: List[Player]) -> None:
-
-        def player_gold_sort(player: Player):
-            if player.gold is None:
-                return 0
-            else:
-                return player.gold
-
-        players.sort(key=player_gold_sort, reverse=True)
-        highest_gold_player = players[0]
+    def _plan(self, entities: Entities, resources: Resources, players: RankedPlayers) -> None:
+        highest_gold_player = players.highest()
+        if highest_gold_player is None:
+            return
         gold_skip = min(
-            math.floor(highest_gold_player.gold * self.__percentage / 100),
+            math.floor(player_gold(highest_gold_player) * self.__percentage / 100),
             resources.gold
         )
         self._adjusted_resources.gold -= gold_skip
@@ -73,24 +79,24 @@ class SkipGoldRelativeToPlayersStrategy(Strategy):
 
 
 class TrainMaxUnitStrategy(Strategy):
+    requires = frozenset((ENTITIES, RESOURCES))
 
     def __init__(self, unit_name: str, with_items: bool = True) -> None:
         super().__init__()
         self.__unit_name = unit_name
         self.__with_items = with_items
 
-    def _plan(self, entities: Entities, resources: Resources, players: List[Player]) -> None:
+    def _plan(self, entities: Entities, resources: Resources, players: RankedPlayers) -> None:
         if resources.citizens > 0:
-            unit = next((unit for unit in entities.units
-                         if unit.name == self.__unit_name), None)
+            unit = entities.unit_by_name(self.__unit_name)
             if unit is not None:
                 if unit.has_items() and self.__with_items:
                     max_units = min(
-                        math.floor(resources.gold / unit.total_item_price()),
+                        math.floor(resources.gold / unit.total_item_price),
                         resources.citizens
                     )
                     if max_units > 0:
-                        self._adjusted_resources.gold -= unit.total_item_price() * max_units
+                        self._adjusted_resources.gold -= unit.total_item_price * max_units
                         self._actions.append(
                             BuyItemsAction(unit.get_item_buy_structure_for_quantity(max_units)))
                         self._logs.append(
@@ -109,8 +115,9 @@ class TrainMaxUnitStrategy(Strategy):
 
 
 class DepositMaxGoldInTreasuryStrategy(Strategy):
+    requires = frozenset((RESOURCES,))
 
-    def _plan(self, entities: Entities, resources: Resources, players: List[Player]) -> None:
+    def _plan(self, entities: Entities, resources: Resources, players: RankedPlayers) -> None:
         if resources.treasury_limit is None:
             max_deposit = resources.gold
         else:
@@ -126,14 +133,14 @@ class DepositMaxGoldInTreasuryStrategy(Strategy):
 
 
 class BuyMaxItemStrategy(Strategy):
+    requires = frozenset((ENTITIES, RESOURCES))
 
     def __init__(self, item_name: str) -> None:
         super().__init__()
         self.__item_name = item_name
 
-    def _plan(self, entities: Entities, resources: Resources, players: List[Player]) -> None:
-        item = next((item for item in entities.items
-                     if item.name == self.__item_name), None)
+    def _plan(self, entities: Entities, resources: Resources, players: RankedPlayers) -> None:
+        item = entities.item_by_name(self.__item_name)
         if item is not None:
             max_items = math.floor(resources.gold / item.price)
             if max_items > 0:
@@ -144,18 +151,18 @@ class BuyMaxItemStrategy(Strategy):
 
 
 class BuyMaxItemsForUnitStrategy(Strategy):
+    requires = frozenset((ENTITIES, RESOURCES))
 
     def __init__(self, unit_name: str) -> None:
         super().__init__()
         self.__unit_name = unit_name
 
-    def _plan(self, entities: Entities, resources: Resources, players: List[Player]) -> None:
-        unit = next((unit for unit in entities.units
-                     if unit.name == self.__unit_name), None)
+    def _plan(self, entities: Entities, resources: Resources, players: RankedPlayers) -> None:
+        unit = entities.unit_by_name(self.__unit_name)
         if unit is not None:
-            max_quantity = math.floor(resources.gold / unit.total_item_price())
+            max_quantity = math.floor(resources.gold / unit.total_item_price)
             if max_quantity > 0:
-                self._adjusted_resources.gold -= unit.total_item_price() * max_quantity
+                self._adjusted_resources.gold -= unit.total_item_price * max_quantity
                 self._actions.append(BuyItemsAction(
                     unit.get_item_buy_structure_for_quantity(max_quantity)))
                 self._logs.append(
@@ -163,21 +170,59 @@ class BuyMaxItemsForUnitStrategy(Strategy):
 
 
 class AttackHighestGoldPlayerStrategy(Strategy):
+    requires = frozenset((PLAYERS,))
 
     def __init__(self, first: int) -> None:
         super().__init__()
         self.__first = first
 
-    def _plan(self, entities: Entities, resources: Resources, players: List[Player]) -> None:
-
-        def player_gold_sort(player: Player):
-            if player.gold is None:
-                return 0
-            else:
-                return player.gold
-
-        players.sort(key=player_gold_sort, reverse=True)
-        target = players[0]
+    def _plan(self, entities: Entities, resources: Resources, players: RankedPlayers) -> None:
+        target = players.highest()
+        if target is None:
+            return
         self._actions.append(AttackPlayerAction(target.id))
         self._logs.append(
             f"Attacking {target.username} with {target.gold} gold")
+
+
+class OptimalAllocationStrategy(Strategy):
+    requires = frozenset((ENTITIES, RESOURCES))
+
+    def __init__(self, weights: UnitWeights = UnitWeights(), gold_value: float = 0.0) -> None:
+        super().__init__()
+        self.__weights = weights
+        self.__gold_value = gold_value
+
+    def _plan(self, entities: Entities, resources: Resources, players: RankedPlayers) -> None:
+        if resources.treasury_limit is None:
+            treasury_space = resources.gold
+        else:
+            treasury_space = resources.treasury_limit - resources.treasury
+        allocation = allocate(
+            entities.units,
+            resources.citizens,
+            resources.gold,
+            treasury_space,
+            self.__weights,
+            self.__gold_value
+        )
+        items: Dict[int, int] = {}
+        for unit, quantity in allocation.units:
+            for item_id, item_quantity in unit.item_buy_template:
+                items[item_id] = items.get(item_id, 0) + item_quantity * quantity
+        if items:
+            self._adjusted_resources.gold -= allocation.gold_spent
+            self._actions.append(BuyItemsAction([
+                {"id": item_id, "quantity": quantity}
+                for item_id, quantity in items.items()
+            ]))
+            self._logs.append(f"Buying items for {allocation.gold_spent} gold")
+        for unit, quantity in allocation.units:
+            self._adjusted_resources.citizens -= quantity
+            self._actions.append(TrainUnitAction(unit.id, quantity))
+            self._logs.append(f"Training {quantity} {unit.name} units")
+        if allocation.deposit > 0:
+            self._adjusted_resources.gold -= allocation.deposit
+            self._adjusted_resources.treasury += allocation.deposit
+            self._actions.append(DepositGoldInTreasuryAction(allocation.deposit))
+            self._logs.append(f"Depositing {allocation.deposit} gold in treasury")
@@ -0,0 +1,143 @@
+from dataclasses import replace
+from typing import Any, Callable, List, Optional, Tuple
+from action import (
+    ActionResult,
+    AttackPlayerAction,
+    BuyItemsAction,
+    DepositGoldInTreasuryAction,
+    TrainUnitAction,
+    UntrainUnitAction
+)
+from metrics import metrics
+from models import BattleResult, Entities, Resources
+import math
+import time
+
+
+class ResourceTracker:
+
+    def __init__(
+        self,
+        sync_every: int = 4,
+        max_age: float = 4 * 60 * 60,
+        tolerance: float = 0.01,
+        smoothing: float = 0.5,
+        clock: Callable[[], float] = time.time
+    ) -> None:
+        self.__sync_every = sync_every
+        self.__max_age = max_age
+        self.__tolerance = tolerance
+        self.__smoothing = smoothing
+        self.__clock = clock
+        self.__resources: Optional[Resources] = None
+        self.__synced_at = 0.0
+        self.__ticks_since_sync = 0
+        self.__drifted = False
+        self.__rates: Optional[Tuple[float, float, float]] = None
+
+    def reset(self) -> None:
+        self.__resources = None
+        self.__rates = None
+        self.__drifted = False
+
+    def needs_sync(self) -> bool:
+        return (
+            self.__resources is None
+            or self.__drifted
+            or self.__rates is None
+            or self.__ticks_since_sync >= self.__sync_every
+            or self.__clock() - self.__synced_at >= self.__max_age
+        )
+
+    def __income(self, now: float) -> Tuple[int, int, int]:
+        if self.__rates is None:
+            return 0, 0, 0
+        elapsed = now - self.__synced_at
+        citizens_rate, gold_rate, treasury_rate = self.__rates
+        return (
+            math.floor(citizens_rate * elapsed),
+            math.floor(gold_rate * elapsed),
+            math.floor(treasury_rate * elapsed)
+        )
+
+    def resources(self) -> Resources:
+        citizens, gold, treasury = self.__income(self.__clock())
+        resources = replace(self.__resources)
+        resources.adjust(citizens, gold, treasury)
+        resources.citizens = max(resources.citizens, 0)
+        resources.gold = max(resources.gold, 0)
+        resources.treasury = max(resources.treasury, 0)
+        if resources.treasury_limit is not None:
+            resources.treasury = min(resources.treasury, resources.treasury_limit)
+        self.__ticks_since_sync += 1
+        return resources
+
+    def __is_drift(self, predicted: int, observed: int) -> bool:
+        return abs(observed - predicted) > self.__tolerance * max(abs(observed), 1)
+
+    def sync(self, resources: Resources) -> None:
+        now = self.__clock()
+        elapsed = now - self.__synced_at
+        if self.__resources is not None and elapsed > 0:
+            tracked = (self.__resources.citizens, self.__resources.gold, self.__resources.treasury)
+            observed = (resources.citizens, resources.gold, resources.treasury)
+            # Keep losses such as gold stolen by other players in the estimate,
+            # so the tracker predicts too little gold rather than too much
+            samples = tuple(
+                (observed_value - tracked_value) / elapsed
+                for tracked_value, observed_value in zip(tracked, observed)
+            )
+            if self.__rates is None:
+                self.__rates = samples
+            elif any(
+                self.__is_drift(tracked_value + income, observed_value)
+                for tracked_value, income, observed_value in zip(tracked, self.__income(now), observed)
+            ):
+                print("Tracked resources drifted from the server, re-estimating income")
+                metrics.increment("resource_tracker_drift_total")
+                self.__rates = samples
+            else:
+                self.__rates = tuple(
+                    self.__smoothing * sample + (1 - self.__smoothing) * rate
+                    for sample, rate in zip(samples, self.__rates)
+                )
+        self.__resources = replace(resources)
+        self.__synced_at = now
+        self.__ticks_since_sync = 0
+        self.__drifted = False
+        metrics.increment("resource_tracker_syncs_total")
+
+    def apply(self, entities: Entities, results: List[ActionResult]) -> None:
+        if self.__resources is None:
+            return
+        for result in results:
+            if not result.succeeded():
+                self.__drifted = True
+                continue
+            action = result.action
+            if isinstance(action, BuyItemsAction):
+                for item in action.items:
+                    entity = entities.item_by_id(item["id"])
+                    if entity is None:
+                        self.__drifted = True
+                    else:
+                        self.__resources.gold -= entity.price * item["quantity"]
+            elif isinstance(action, TrainUnitAction):
+                self.__resources.citizens -= action.quantity
+            elif isinstance(action, UntrainUnitAction):
+                self.__resources.citizens += action.quantity
+            elif isinstance(action, DepositGoldInTreasuryAction):
+                self.__resources.gold -= action.amount
+                self.__resources.treasury += action.amount
+            elif isinstance(action, AttackPlayerAction):
+                self.__resources.gold += gold_stolen(result.data)
+            else:
+                self.__drifted = True
+
+
+def gold_stolen(data: Any) -> int:
+    if isinstance(data, BattleResult):
+        return data.gold_stolen or 0
+    if isinstance(data, dict):
+        return data.get("gold_stolen") or 0
+    return 0
@@ -1,10 +1,40 @@
 from abc import ABC, abstractmethod
-from typing import Any, Callable
+from typing import Any, Callable, Dict, Optional, Tuple
+from metrics import metrics
 from notifier import Notifier
-import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+import threading
+import weakref
 import os
 
 
+class ValueStoreError(Exception):
+    pass
+
+
+class BlockingConnectionPool(ThreadedConnectionPool):
+
+    def __init__(self, min_connections: int, max_connections: int, *args, **kwargs) -> None:
+        super().__init__(min_connections, max_connections, *args, **kwargs)
+        # ThreadedConnectionPool raises PoolError once every connection is in
+        # use, so callers wait for a free connection instead
+        self.__available = threading.BoundedSemaphore(max_connections)
+
+    def getconn(self, key=None):
+        self.__available.acquire()
+        try:
+            return super().getconn(key)
+        except Exception:
+            self.__available.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False) -> None:
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self.__available.release()
+
+
 class ValueStore(ABC):
 
     @abstractmethod
@@ -15,85 +45,141 @@ class ValueStore(ABC):
     def get_value(self, key: str) -> Any:
         pass
 
+    def has_value(self, key: str) -> bool:
+        return self.get_value(key) is not None
+
+    def read_value(self, key: str) -> Any:
+        self.invalidate(key)
+        return self.get_value(key)
+
+    def invalidate(self, key: str = None) -> None:
+        pass
+
 
 class PostgreSQLValueStore(ValueStore):
 
-    def __init__(self, notifier: Notifier) -> None:
+    def __init__(self, notifier: Notifier, min_connections: int = 1, max_connections: int = 5) -> None:
         self.__notifier = notifier
         self.__database_url = os.environ['DATABASE_URL']
-        self.__create_table_if_not_exists()
-        if not self.__key_exist('token'):
-            initial_token = os.environ['INITIAL_TOKEN']
-            self.update_value('token', initial_token)
-
-    def __run_query(self, callable: Callable) -> Any:
+        self.__pool = BlockingConnectionPool(
+            min_connections,
+            max_connections,
+            self.__database_url
+        )
+        self.__prepared_connections = weakref.WeakSet()
+        self.__cache: Dict[str, Any] = {}
+        self.__cache_lock = threading.Lock()
+
+    def __run_query(self, name: str, callable: Callable, raise_errors: bool = False) -> Any:
+        connection = None
+        cursor = None
         try:
-            connection = psycopg2.connect(self.__database_url)
+            connection = self.__pool.getconn()
             cursor = connection.cursor()
-            return callable(cursor, connection)
+            if connection not in self.__prepared_connections:
+                self.__prepare_connection(cursor, connection)
+                self.__prepared_connections.add(connection)
+            with metrics.time("value_store_query", query=name):
+                return callable(cursor, connection)
         except Exception as e:
+            if connection and not connection.closed:
+                connection.rollback()
             print(f"Unexpected database error: {e}")
             self.__notifier.notify_error(f"Unexpected database error: {e}")
+            if raise_errors:
+                raise ValueStoreError(str(e)) from e
         finally:
             if cursor:
                 cursor.close()
             if connection:
-                connection.close()
-
-    def __create_table_if_not_exists(self) -> None:
-
-        def query(cursor, connection) -> None:
-            query = """
-                CREATE TABLE IF NOT EXISTS config (
-                    key VARCHAR UNIQUE NOT NULL,
-                    value varchar,
-                    PRIMARY KEY (key)
-                );
-            """
-            cursor.execute(query)
-            connection.commit()
+                self.__pool.putconn(connection)
+
+    def __prepare_connection(self, cursor, connection) -> None:
+        # Prepared statements outlive a rolled back transaction, so clear the
+        # ones left behind by an earlier attempt that failed halfway.
+        cursor.execute("DEALLOCATE ALL;")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS config (
+                key VARCHAR UNIQUE NOT NULL,
+                value varchar,
+                PRIMARY KEY (key)
+            );
+        """)
+        cursor.execute("""
+            PREPARE config_select (varchar) AS
+                SELECT value
+                FROM config
+                WHERE key = $1;
+        """)
+        cursor.execute("""
+            PREPARE config_upsert (varchar, varchar) AS
+                INSERT INTO config (key, value)
+                VALUES ($1, $2)
+                ON CONFLICT (key) DO UPDATE
+                SET value = EXCLUDED.value;
+        """)
+        connection.commit()
 
-        self.__run_query(query)
+    def __select(self, key: str, raise_errors: bool = False) -> Optional[Tuple]:
 
-    def __key_exist(self, key: str) -> bool:
+        def query(cursor, connection) -> Optional[Tuple]:
+            cursor.execute("EXECUTE config_select (%s);", (key,))
+            return cursor.fetchone()
 
-        def query(cursor, connection) -> Any:
-            query = """
-                SELECT *
-                FROM config
-                WHERE key = '%s';
-            """ % key
-            cursor.execute(query)
-            return cursor.fetchone() is not None
+        return self.__run_query("config_select", query, raise_errors)
 
-        return self.__run_query(query)
+    def has_value(self, key: str) -> bool:
+        with self.__cache_lock:
+            if key in self.__cache:
+                return True
+        row = self.__select(key)
+        if row is None:
+            return False
+        with self.__cache_lock:
+            self.__cache[key] = row[0]
+        return True
 
     def update_value(self, key: str, value: Any) -> None:
 
-        def query(cursor, connection) -> None:
-            query = """
-                INSERT INTO config (key, value)
-                VALUES ('%s', '%s')
-                ON CONFLICT (key) DO UPDATE
-                SET value = EXCLUDED.value;
-            """ % (key, value)
-            cursor.execute(query)
+        def query(cursor, connection) -> bool:
+            cursor.execute("EXECUTE config_upsert (%s, %s);", (key, str(value)))
             connection.commit()
+            return True
 
-        self.__run_query(query)
+        if self.__run_query("config_upsert", query):
+            with self.__cache_lock:
+                self.__cache[key] = str(value)
 
     def get_value(self, key: str) -> Any:
-
-        def query(cursor, connection) -> Any:
-            query = """
-                SELECT *
-                FROM config
-                WHERE key = '%s';
-            """ % key
-            cursor.execute(query)
-            return cursor.fetchone()[1]
-
-        return self.__run_query(query)
+        with self.__cache_lock:
+            if key in self.__cache:
+                return self.__cache[key]
+        row = self.__select(key)
+        if row is None:
+            return None
+        value = row[0]
+        with self.__cache_lock:
+            self.__cache[key] = value
+        return value
+
+    def read_value(self, key: str) -> Any:
+        row = self.__select(key, raise_errors=True)
+        with self.__cache_lock:
+            if row is None:
+                self.__cache.pop(key, None)
+                return None
+            self.__cache[key] = row[0]
+            return row[0]
+
+    def invalidate(self, key: str = None) -> None:
+        with self.__cache_lock:
+            if key is None:
+                self.__cache.clear()
+            else:
+                self.__cache.pop(key, None)
+
+    def close(self) -> None:
+        self.__pool.closeall()
 
 
 class InMemoryValueStore(ValueStore):
@@ -105,4 +191,31 @@ class InMemoryValueStore(ValueStore):
         self.__value_store[key] = value
 
     def get_value(self, key: str) -> Any:
-        return self.__value_store[key]
+        return self.__value_store.get(key)
+
+
+class NamespacedValueStore(ValueStore):
+
+    def __init__(self, value_store: ValueStore, namespace: Optional[str]) -> None:
+        self.__value_store = value_store
+        self.__namespace = namespace
+
+    def __key(self, key: str) -> str:
+        if self.__namespace is None:
+            return key
+        return f"{self.__namespace}:{key}"
+
+    def update_value(self, key: str, value: Any) -> None:
+        self.__value_store.update_value(self.__key(key), value)
+
+    def get_value(self, key: str) -> Any:
+        return self.__value_store.get_value(self.__key(key))
+
+    def has_value(self, key: str) -> bool:
+        return self.__value_store.has_value(self.__key(key))
+
+    def read_value(self, key: str) -> Any:
+        return self.__value_store.read_value(self.__key(key))
+
+    def invalidate(self, key: str = None) -> None:
+        self.__value_store.invalidate(None if key is None else self.__key(key))
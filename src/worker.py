@@ -1,41 +1,241 @@
-from api import GraphQLAPI
-from schedule import repeat, every, idle_seconds, run_pending
+from accounts import Account, load_accounts
+from attack import AttackPlanner, AttackRunner, BattleHistory
+from api import AsyncGraphQLAPI, InstrumentedAsyncAPI, map_entities
+from catalog import EntityCatalogCache
 from dotenv import load_dotenv
-from executor import SimpleActionExecutor
-from runner import StrategyRunner
-from value_store import PostgreSQLValueStore
-from notifier import TelegramNotifier
-import time
-import math
+from executor import BatchingActionExecutor
+from history import HistoryStore, open_history_store
+from metrics import metrics, serve_metrics, write_metrics
+from ratelimit import RequestGovernor
+from runner import AsyncStrategyRunner, MultiAccountRunner, allocation_strategies, main_strategies
+from scheduler import AsyncScheduler
+from sharding import PostgreSQLLeaseStore, ShardedRunner
+from tracker import ResourceTracker
+from value_store import PostgreSQLValueStore, ValueStore
+from pipeline import FilePipelineSource, StrategyPipeline, ValueStorePipelineSource
+from notifier import (
+    InstrumentedNotifier,
+    Notifier,
+    PrefixedNotifier,
+    QueuedNotifier,
+    TelegramNotifier
+)
+from multiprocessing import Process
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import functools
+import signal
+import socket
+import os
 
 load_dotenv()
 
-notifier = TelegramNotifier()
-value_store = PostgreSQLValueStore(notifier)
-api = GraphQLAPI(value_store)
-executor = SimpleActionExecutor(api)
-runner = StrategyRunner(api, executor, notifier)
 
+def build_governor() -> RequestGovernor:
+    return RequestGovernor(
+        rate=float(os.environ.get('API_RATE_LIMIT', 10)),
+        max_attempts=int(os.environ.get('API_MAX_ATTEMPTS', 4)),
+        safe_mutations=frozenset(
+            mutation.strip()
+            for mutation in os.environ.get('API_RETRY_MUTATIONS', '').split(',')
+            if mutation.strip()
+        )
+    )
+
+
+def build_runner(
+    account: Account,
+    accounts: List[Account],
+    account_store: ValueStore,
+    entity_cache: EntityCatalogCache,
+    notifier: Notifier,
+    apis: List[AsyncGraphQLAPI],
+    history_store: Optional[HistoryStore] = None
+) -> AsyncStrategyRunner:
+    graphql_api = AsyncGraphQLAPI(
+        account_store,
+        entity_cache,
+        metrics_registry=metrics,
+        governor=build_governor()
+    )
+    apis.append(graphql_api)
+    api = InstrumentedAsyncAPI(graphql_api)
+    account_notifier = notifier
+    if len(accounts) > 1:
+        account_notifier = PrefixedNotifier(notifier, account.id)
+    resource_tracker = None
+    if os.environ.get('RESOURCE_SYNC_INTERVAL'):
+        resource_tracker = ResourceTracker(
+            sync_every=int(os.environ['RESOURCE_SYNC_INTERVAL']))
+    battle_history = BattleHistory()
+    if history_store is not None:
+        battle_history.load(history_store.battles(account_id=account.id))
+    attack_runner = None
+    if os.environ.get('ATTACK_MAX_TARGETS'):
+        attack_runner = AttackRunner(
+            AttackPlanner(battle_history),
+            max_attacks=int(os.environ['ATTACK_MAX_TARGETS']),
+            max_concurrency=int(os.environ.get('ATTACK_CONCURRENCY', 4)),
+            window=float(os.environ.get('ATTACK_WINDOW', 60))
+        )
+    default_pipeline = StrategyPipeline.from_factory(
+        allocation_strategies
+        if os.environ.get('OPTIMAL_ALLOCATION', 'false').lower() == 'true'
+        else main_strategies
+    )
+    reload_interval = float(os.environ.get('STRATEGY_RELOAD_INTERVAL', 60))
+    if os.environ.get('STRATEGY_PIPELINE_FILE'):
+        pipeline_source = FilePipelineSource(
+            os.environ['STRATEGY_PIPELINE_FILE'],
+            default_pipeline,
+            account_notifier,
+            reload_interval
+        )
+    else:
+        pipeline_source = ValueStorePipelineSource(
+            account_store,
+            default_pipeline,
+            account_notifier,
+            reload_interval=reload_interval
+        )
+    return AsyncStrategyRunner(
+        api,
+        BatchingActionExecutor(api),
+        account_notifier,
+        player_scan_limit=int(os.environ.get('PLAYER_SCAN_LIMIT', 50)),
+        pipeline_source=pipeline_source,
+        resource_tracker=resource_tracker,
+        attack_runner=attack_runner,
+        battle_history=battle_history,
+        history_store=history_store,
+        account_id=account.id,
+        value_store=account_store
+    )
+
+
+def run_worker(
+    worker_id: Optional[str],
+    metrics_file: Optional[str] = None,
+    metrics_port: Optional[int] = None
+) -> None:
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    notifier = QueuedNotifier(InstrumentedNotifier(TelegramNotifier()))
+    if metrics_port is not None:
+        serve_metrics(metrics, metrics_port)
+    max_concurrency = int(os.environ.get('MAX_CONCURRENT_ACCOUNTS', 4))
+    value_store = PostgreSQLValueStore(notifier, max_connections=max_concurrency + 1)
+    entity_cache = EntityCatalogCache(
+        value_store,
+        map_entities,
+        ttl=int(os.environ.get('ENTITY_CACHE_TTL', 6 * 60 * 60))
+    )
+    accounts = load_accounts()
+    account_stores: Dict[str, ValueStore] = {
+        account.id: account.value_store(value_store)
+        for account in accounts
+    }
+    history_store: Optional[HistoryStore] = None
+    if os.environ.get('RECORD_HISTORY', 'false').lower() == 'true':
+        history_store = open_history_store(notifier)
+    apis: List[AsyncGraphQLAPI] = []
+    runners: Dict[str, AsyncStrategyRunner] = {
+        account.id: build_runner(
+            account,
+            accounts,
+            account_stores[account.id],
+            entity_cache,
+            notifier,
+            apis,
+            history_store
+        )
+        for account in accounts
+    }
+    runner = MultiAccountRunner(runners, notifier, max_concurrency=max_concurrency)
+    sharded_runner: Optional[ShardedRunner] = None
+    if worker_id is not None:
+        sharded_runner = ShardedRunner(
+            runner,
+            PostgreSQLLeaseStore(notifier, max_connections=max_concurrency + 1),
+            worker_id
+        )
+        sharded_runner.heartbeat()
+
+    def account_job(account_id: str) -> Callable[[float], Awaitable[None]]:
+
+        async def job(window: float) -> None:
+            if sharded_runner is None:
+                succeeded = await runner.run_account(account_id)
+            else:
+                succeeded = await sharded_runner.run_account(account_id, window)
+            if succeeded:
+                await asyncio.to_thread(
+                    account_stores[account_id].update_value, 'last_run', window)
+            if metrics_file is not None:
+                write_metrics(metrics, metrics_file)
+
+        return job
+
+    async def heartbeat_job(window: float) -> None:
+        await asyncio.to_thread(sharded_runner.heartbeat)
+        await asyncio.to_thread(sharded_runner.purge_expired_ticks)
+
+    scheduler = AsyncScheduler()
+    for account_id in runner.account_ids:
+        last_run = account_stores[account_id].get_value('last_run')
+        scheduler.every(
+            functools.partial(runner.job_interval, account_id),
+            account_job(account_id),
+            account_id,
+            offset=int(os.environ.get('JOB_OFFSET', 20)),
+            jitter=float(os.environ.get('JOB_JITTER', 30)),
+            catch_up_from=float(last_run) if last_run is not None else None
+        )
+    if sharded_runner is not None:
+        scheduler.every(60, heartbeat_job, "heartbeat")
+
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, scheduler.stop)
 
-@repeat(every().hour.at("00:20"))
-@repeat(every().hour.at("30:20"))
-def main_job() -> None:
     try:
-        runner.run_main_strategies()
-    except Exception as e:
-        print(f"Unexpected job error: {e}")
-        notifier.notify_error(f"Unexpected job error: {e}")
+        loop.run_until_complete(scheduler.run())
+    finally:
+        if sharded_runner is not None:
+            sharded_runner.retire()
+        for api in apis:
+            loop.run_until_complete(api.close())
+        if history_store is not None:
+            history_store.close()
+        loop.close()
+        notifier.close()
 
 
 def main() -> None:
-    while True:
-        time_to_sleep = idle_seconds()
-        if time_to_sleep is None:
-            break
-        elif time_to_sleep > 0:
-            print(f"Sleeping for {math.floor(time_to_sleep)} seconds...")
-            time.sleep(time_to_sleep)
-        run_pending()
+    processes = int(os.environ.get('WORKER_PROCESSES', 1))
+    worker_id = os.environ.get('WORKER_ID')
+    metrics_file = os.environ.get('METRICS_FILE')
+    metrics_port = os.environ.get('METRICS_PORT')
+    if processes <= 1:
+        run_worker(
+            worker_id,
+            metrics_file,
+            int(metrics_port) if metrics_port else None
+        )
+        return
+    if worker_id is None:
+        worker_id = os.environ.get('DYNO', socket.gethostname())
+    workers = [
+        Process(target=run_worker, args=(
+            f"{worker_id}-{index}",
+            "{0}.{2}{1}".format(*os.path.splitext(metrics_file), index) if metrics_file else None,
+            int(metrics_port) + index if metrics_port else None
+        ))
+        for index in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,32 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Tuple
+from aiohttp.test_utils import TestServer
+from api import AsyncGraphQLAPI
+from simulation import SimulationConfig
+from stand_in_server import StandInConfig, StandInServer
+from value_store import InMemoryValueStore
+import pytest
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+
+    @asynccontextmanager
+    async def serve(
+        config: Optional[StandInConfig] = None,
+        **api_args
+    ) -> AsyncIterator[Tuple[StandInServer, AsyncGraphQLAPI]]:
+        server = StandInServer(config or StandInConfig(SimulationConfig(player_count=100)))
+        test_server = TestServer(server.application())
+        await test_server.start_server()
+        monkeypatch.setenv('API_ENDPOINT', str(test_server.make_url("/graphql")))
+        value_store = InMemoryValueStore()
+        value_store.update_value('token', "test")
+        api = AsyncGraphQLAPI(value_store, **api_args)
+        try:
+            yield server, api
+        finally:
+            await api.close()
+            await test_server.close()
+
+    return serve
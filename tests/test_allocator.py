@@ -0,0 +1,57 @@
+from allocator import UnitWeights, allocate
+from itertools import product
+from models import Unit, UnitItem
+import random
+import pytest
+
+
+def unit(unit_id: int, cost: int, value: int) -> Unit:
+    return Unit(unit_id, f"Unit {unit_id}", 60, (UnitItem(unit_id, "Item", cost, 1),), attack_strength=value)
+
+
+def brute_force(units, citizens, gold, treasury_space, weights, gold_value):
+    values = weights.values(units)
+    best = gold_value * min(gold, treasury_space)
+    for quantities in product(range(citizens + 1), repeat=len(units)):
+        spent = sum(quantity * unit.total_item_price for quantity, unit in zip(quantities, units))
+        if sum(quantities) > citizens or spent > gold:
+            continue
+        best = max(best, sum(quantities * values) + gold_value * min(gold - spent, treasury_space))
+    return best
+
+
+def check(allocation, units, citizens, gold, treasury_space, weights):
+    assert sum(quantity for _, quantity in allocation.units) <= citizens
+    assert allocation.gold_spent == sum(unit.total_item_price * quantity for unit, quantity in allocation.units)
+    assert allocation.gold_spent <= gold
+    assert allocation.deposit == min(gold - allocation.gold_spent, treasury_space)
+
+
+def test_rounding_the_relaxation_is_not_enough():
+    units = [unit(0, 29, 10), unit(1, 46, 18)]
+    allocation = allocate(units, 5, 64, 1_000, UnitWeights(), gold_value=0.01)
+    assert [(unit.id, quantity) for unit, quantity in allocation.units] == [(0, 2)]
+    assert allocation.value == pytest.approx(20.06)
+
+
+def test_idle_citizens_deposit_gold():
+    allocation = allocate([unit(0, 100, 5)], 3, 50, 20, gold_value=1.0)
+    assert allocation.units == ()
+    assert allocation.deposit == 20
+    assert allocation.value == pytest.approx(20)
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_allocation_matches_brute_force(seed):
+    generator = random.Random(seed)
+    units = [unit(index, generator.randint(0, 60), generator.randint(0, 30)) for index in range(generator.randint(1, 4))]
+    citizens = generator.randint(0, 6)
+    gold = generator.randint(0, 250)
+    treasury_space = generator.randint(0, 150)
+    gold_value = generator.choice([0.0, 0.01, 0.2, 0.5, 1.0])
+    weights = UnitWeights()
+
+    allocation = allocate(units, citizens, gold, treasury_space, weights, gold_value)
+
+    check(allocation, units, citizens, gold, treasury_space, weights)
+    assert allocation.value == pytest.approx(brute_force(units, citizens, gold, treasury_space, weights, gold_value))
@@ -0,0 +1,76 @@
+from api import AsyncGraphQLAPI, map_players
+from load_test import fetch_stats
+from models import RankedPlayers
+from simulation import SimulatedAPI, SimulationConfig
+from value_store import InMemoryValueStore
+import asyncio
+import os
+
+
+def test_concurrent_reads_reuse_the_session(stand_in):
+
+    async def scenario():
+        async with stand_in() as (server, api):
+
+            async def tick():
+                return await asyncio.gather(
+                    api.get_entities(),
+                    api.get_profile_resources(),
+                    api.get_players_page(10, 1)
+                )
+
+            entities, resources, (players, has_more_pages) = await tick()
+            connections = (await fetch_stats(os.environ['API_ENDPOINT']))["connections"]
+            await tick()
+            stats = await fetch_stats(os.environ['API_ENDPOINT'])
+            return entities, resources, players, has_more_pages, connections, stats
+
+    entities, resources, players, has_more_pages, connections, stats = asyncio.run(scenario())
+    assert len(entities.units) == 16
+    assert resources.gold == 1_000_000
+    assert len(players) == 10 and has_more_pages
+    assert stats["requests"] == 6
+    assert stats["connections"] == connections
+
+
+def test_refresh_token_authorizes_later_requests(stand_in):
+
+    async def scenario():
+        async with stand_in() as (server, api):
+            token = await api.refresh_token()
+            resources = await api.get_profile_resources()
+            return token, resources, server
+
+    token, resources, server = asyncio.run(scenario())
+    assert token == "stand-in-1"
+    assert resources.gold == 1_250_000
+    assert server.requests == 2
+
+
+def test_ranked_players_are_streamed_from_pages():
+    api = SimulatedAPI(SimulationConfig(seed=5, player_count=95))
+    players = map_players(api.game.players_response(95))
+
+    ranked = asyncio.run(api.get_ranked_players(10, None, 7))
+    limited = asyncio.run(api.get_ranked_players(10, 25, 7))
+
+    assert list(ranked) == list(RankedPlayers.select(players, 7))
+    assert list(limited) == list(RankedPlayers.select(players[:25], 7))
+    assert len(asyncio.run(api.get_ranked_players(10, None, 0))) == 0
+
+
+def test_token_refreshed_by_another_worker_is_reloaded(stand_in):
+
+    async def scenario():
+        async with stand_in():
+            value_store = InMemoryValueStore()
+            value_store.update_value('token', "test")
+            async with AsyncGraphQLAPI(value_store) as previous_owner, AsyncGraphQLAPI(value_store) as new_owner:
+                await previous_owner.refresh_token()
+                reloaded = await new_owner.reload_token()
+                resources = await new_owner.get_profile_resources()
+                return reloaded, await new_owner.reload_token(), resources
+
+    reloaded, reloaded_again, resources = asyncio.run(scenario())
+    assert reloaded and not reloaded_again
+    assert resources.gold == 1_250_000
@@ -0,0 +1,49 @@
+from api import map_players
+from attack import AttackPlanner, AttackRunner, BattleHistory
+from models import BattleResult, Player, RankedPlayers
+from simulation import SimulatedAPI, SimulationConfig
+import asyncio
+
+
+class RecordingHistory(BattleHistory):
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.battles = []
+
+    def record(self, player_id: int, gold_before: int, result: BattleResult) -> None:
+        self.battles.append((player_id, gold_before, result.gold_stolen))
+        super().record(player_id, gold_before, result)
+
+
+def test_planner_ranks_by_expected_gold():
+    history = BattleHistory()
+    for _ in range(5):
+        history.record(1, 1_000, BattleResult("Defeat", 0))
+    players = [Player(1, "Rich but strong", 10_000), Player(2, "Poor", 5_000), Player(3, "Unknown", None)]
+    ranked = AttackPlanner(history).rank(players)
+    assert [player.id for player, _ in ranked] == [2, 1]
+    ranked = AttackPlanner(history).rank(players, gold={2: 0})
+    assert [player.id for player, _ in ranked] == [1]
+
+
+def test_attacks_leave_the_shared_players_untouched():
+    api = SimulatedAPI(SimulationConfig(seed=3, player_count=50))
+    players = RankedPlayers.select(map_players(api.game.players_response(50)), 5)
+    before = [(player.id, player.gold) for player in players]
+    history = RecordingHistory()
+    runner = AttackRunner(
+        AttackPlanner(history),
+        max_attacks=10,
+        max_attacks_per_target=2,
+        max_concurrency=1
+    )
+
+    results, logs = asyncio.run(runner.run(api, players))
+
+    assert len(results) == 10
+    assert [(player.id, player.gold) for player in players] == before
+    gold = dict(before)
+    for player_id, gold_before, gold_stolen in history.battles:
+        assert gold_before == gold[player_id]
+        gold[player_id] = gold_before - gold_stolen
@@ -0,0 +1,190 @@
+from action import BuyItemsAction, DepositGoldInTreasuryAction, TrainUnitAction
+from batch_planner import (
+    BatchBuyMaxItemStrategy,
+    BatchBuyMaxItemsForUnitStrategy,
+    BatchDepositMaxGoldInTreasuryStrategy,
+    BatchPlanner,
+    BatchSkipGoldRelativeToPlayersStrategy,
+    BatchSkipGoldStrategy,
+    BatchTrainMaxUnitStrategy,
+    ResourceArrays
+)
+from models import Entities, Item, Player, RankedPlayers, Resources, Unit, UnitItem
+from runner import plan_strategies
+from strategy import (
+    BuyMaxItemStrategy,
+    BuyMaxItemsForUnitStrategy,
+    DepositMaxGoldInTreasuryStrategy,
+    SkipGoldRelativeToPlayersStrategy,
+    SkipGoldStrategy,
+    TrainMaxUnitStrategy
+)
+import random
+import pytest
+
+SIZE = 40
+
+
+def random_entities(generator):
+    units = tuple(
+        Unit(
+            index,
+            f"Unit {index}",
+            60,
+            tuple(
+                UnitItem(10 * index + item, f"Item {item}", generator.randint(1, 500), generator.randint(1, 3))
+                for item in range(generator.choice([0, 1, 2]))
+            )
+        )
+        for index in range(generator.randint(1, 4))
+    )
+    items = tuple(Item(index, f"Item {index}", generator.randint(1, 500)) for index in range(generator.randint(1, 3)))
+    return Entities(units, items)
+
+
+def random_row(generator):
+    resources = Resources(
+        generator.choice([0, generator.randint(1, 50)]),
+        generator.randint(0, 20_000),
+        generator.randint(0, 5_000),
+        generator.choice([None, generator.randint(0, 10_000)])
+    )
+    players = RankedPlayers(tuple(
+        Player(index, f"player {index}", generator.choice([None, generator.randint(0, 50_000)]))
+        for index in range(generator.choice([0, 1, 3]))
+    ))
+    return resources, players
+
+
+def random_parameter(generator, choices):
+    if generator.random() < 0.5:
+        return generator.choice(choices)
+    return [generator.choice(choices) for _ in range(SIZE)]
+
+
+def row_parameter(parameter, row):
+    return parameter[row] if isinstance(parameter, list) else parameter
+
+
+def random_pipeline(generator, entities):
+    unit_names = [unit.name for unit in entities.units] + ["Unknown"]
+    units_with_items = [unit.name for unit in entities.units if unit.has_items()]
+    pipeline = []
+    for _ in range(generator.randint(1, 5)):
+        kind = generator.choice(["skip", "relative", "train", "deposit", "item", "unit items"])
+        if kind == "skip":
+            percentage = random_parameter(generator, list(range(0, 101, 5)))
+            pipeline.append((
+                BatchSkipGoldStrategy(percentage),
+                lambda row, percentage=percentage: SkipGoldStrategy(row_parameter(percentage, row))
+            ))
+        elif kind == "relative":
+            percentage = random_parameter(generator, list(range(0, 101, 5)))
+            pipeline.append((
+                BatchSkipGoldRelativeToPlayersStrategy(percentage),
+                lambda row, percentage=percentage: SkipGoldRelativeToPlayersStrategy(row_parameter(percentage, row))
+            ))
+        elif kind == "train":
+            unit_name = random_parameter(generator, unit_names)
+            with_items = random_parameter(generator, [True, False])
+            pipeline.append((
+                BatchTrainMaxUnitStrategy(unit_name, with_items),
+                lambda row, unit_name=unit_name, with_items=with_items: TrainMaxUnitStrategy(
+                    row_parameter(unit_name, row), row_parameter(with_items, row))
+            ))
+        elif kind == "deposit":
+            pipeline.append((BatchDepositMaxGoldInTreasuryStrategy(), lambda row: DepositMaxGoldInTreasuryStrategy()))
+        elif kind == "item":
+            item_name = generator.choice([item.name for item in entities.items] + ["Unknown"])
+            pipeline.append((
+                BatchBuyMaxItemStrategy(item_name),
+                lambda row, item_name=item_name: BuyMaxItemStrategy(item_name)
+            ))
+        elif units_with_items:
+            unit_name = generator.choice(units_with_items)
+            pipeline.append((
+                BatchBuyMaxItemsForUnitStrategy(unit_name),
+                lambda row, unit_name=unit_name: BuyMaxItemsForUnitStrategy(unit_name)
+            ))
+    return pipeline
+
+
+def scalar_quantities(strategy, entities, actions, gold_delta):
+    trained = sum(action.quantity for action in actions if isinstance(action, TrainUnitAction))
+    purchases = [action for action in actions if isinstance(action, BuyItemsAction)]
+    if isinstance(strategy, (SkipGoldStrategy, SkipGoldRelativeToPlayersStrategy)):
+        return {"skip_gold": -gold_delta}
+    if isinstance(strategy, TrainMaxUnitStrategy):
+        return {"train": trained, "buy_items_for_units": trained if purchases else 0}
+    if isinstance(strategy, DepositMaxGoldInTreasuryStrategy):
+        return {"deposit": sum(action.amount for action in actions if isinstance(action, DepositGoldInTreasuryAction))}
+    if isinstance(strategy, BuyMaxItemStrategy):
+        return {"buy_items": purchases[0].items[0]["quantity"] if purchases else 0}
+    unit = entities.unit_by_name(strategy._BuyMaxItemsForUnitStrategy__unit_name)
+    return {"buy_items_for_units": -gold_delta // unit.total_item_price}
+
+
+def plan_row(pipeline, entities, resources, players, row):
+    resources = Resources(resources.citizens, resources.gold, resources.treasury, resources.treasury_limit)
+    quantities = []
+    for _, scalar in pipeline:
+        strategy = scalar(row)
+        gold = resources.gold
+        actions, _ = plan_strategies([strategy], entities, resources, players)
+        quantities.append(scalar_quantities(strategy, entities, actions, resources.gold - gold))
+    return resources, quantities
+
+
+def check_parity(pipeline, entities, rows):
+    arrays = ResourceArrays.from_resources([resources for resources, _ in rows], [players for _, players in rows])
+    batch = BatchPlanner([strategy for strategy, _ in pipeline]).plan(entities, arrays)
+
+    for row, (resources, players) in enumerate(rows):
+        planned, quantities = plan_row(pipeline, entities, resources, players, row)
+        assert batch.resources.citizens[row] == planned.citizens
+        assert batch.resources.gold[row] == planned.gold
+        assert batch.resources.treasury[row] == planned.treasury
+        assert batch.citizens[row] == planned.citizens - resources.citizens
+        assert batch.gold[row] == planned.gold - resources.gold
+        assert batch.treasury[row] == planned.treasury - resources.treasury
+        for batch_quantities, expected in zip(batch.quantities, quantities):
+            assert {name: batch_quantities[name][row] for name in expected} == expected
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_batch_plans_match_plan_strategies(seed):
+    generator = random.Random(seed)
+    entities = random_entities(generator)
+    rows = [random_row(generator) for _ in range(SIZE)]
+
+    check_parity(random_pipeline(generator, entities), entities, rows)
+
+
+def test_treasury_over_its_limit_deposits_nothing():
+    rows = [
+        (Resources(0, 1_000, 900, 500), RankedPlayers(())),
+        (Resources(0, 1_000, 500, 500), RankedPlayers(())),
+        (Resources(0, 1_000, 100, 500), RankedPlayers(())),
+        (Resources(0, 1_000, 100, None), RankedPlayers(()))
+    ]
+    pipeline = [(BatchDepositMaxGoldInTreasuryStrategy(), lambda row: DepositMaxGoldInTreasuryStrategy())]
+    check_parity(pipeline, Entities((), ()), rows)
+
+    arrays = ResourceArrays.from_resources([resources for resources, _ in rows], [players for _, players in rows])
+    assert list(BatchPlanner([pipeline[0][0]]).plan(Entities((), ()), arrays).quantities[0]["deposit"]) == [0, 0, 400, 1_000]
+
+
+def test_no_highest_player_skips_nothing():
+    rows = [
+        (Resources(0, 1_000), RankedPlayers(())),
+        (Resources(0, 1_000), RankedPlayers((Player(1, "a", None),))),
+        (Resources(0, 1_000), RankedPlayers((Player(1, "a", 800),)))
+    ]
+    pipeline = [(
+        BatchSkipGoldRelativeToPlayersStrategy([50, 50, 200]),
+        lambda row: SkipGoldRelativeToPlayersStrategy([50, 50, 200][row])
+    )]
+    check_parity(pipeline, Entities((), ()), rows)
+
+    arrays = ResourceArrays.from_resources([resources for resources, _ in rows], [players for _, players in rows])
+    assert list(BatchPlanner([pipeline[0][0]]).plan(Entities((), ()), arrays).quantities[0]["skip_gold"]) == [0, 0, 1_000]
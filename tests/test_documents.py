@@ -0,0 +1,35 @@
+from action import BuyItemsAction, DepositGoldInTreasuryAction, TrainUnitAction
+from api import build_mutation_document
+from documents import DocumentRegistry, documents, load_schema
+import api
+import pytest
+
+
+@pytest.mark.parametrize("name", [name for name in dir(api) if name.endswith("_DOCUMENT")])
+def test_api_documents_match_the_schema(name):
+    compiled = documents.get(getattr(api, name))
+    assert compiled.operation in ("query", "mutation")
+
+
+def test_batched_mutation_document_matches_the_schema():
+    document, _ = build_mutation_document([
+        BuyItemsAction([{"id": 0, "quantity": 1}]).to_mutation(),
+        TrainUnitAction(0, 1).to_mutation(),
+        DepositGoldInTreasuryAction(1).to_mutation()
+    ])
+    compiled = documents.get(document)
+    assert compiled.fields == ("actionBuyItems", "actionTrainBuildingUnit", "actionTreasuryDeposit")
+
+
+def test_invalid_document_is_rejected_when_registered():
+    registry = DocumentRegistry(load_schema())
+    with pytest.raises(ValueError):
+        registry.get("query { viewerProfile { unknown } }")
+    assert len(registry) == 0
+
+
+def test_documents_are_compiled_once():
+    registry = DocumentRegistry(load_schema())
+    source = "query { recruitCitizenPrice }"
+    assert registry.get(source) is registry.get(source)
+    assert len(registry) == 1
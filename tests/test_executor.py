@@ -0,0 +1,63 @@
+from action import BuyItemsAction, DepositGoldInTreasuryAction, TrainUnitAction
+from api import NOT_EXECUTED, map_mutation_results
+from executor import BatchingActionExecutor
+from models import Mutation
+from simulation import SimulationConfig
+from stand_in_server import StandInConfig
+import asyncio
+import pytest
+
+EXPENSIVE_ITEMS = [{"id": 0, "quantity": 1_000_000}]
+
+
+def mutations(count):
+    return [Mutation("actionTreasuryDeposit", "ActionTreasuryTransferInput", {"amount": 1}, "id")] * count
+
+
+def test_map_mutation_results_with_nullable_field_errors():
+    results = map_mutation_results(
+        mutations(3),
+        {"m0": {"id": 1}, "m1": None, "m2": {"id": 3}},
+        [{"message": "Invalid deposit", "path": ["m1"]}]
+    )
+    assert results == [({"id": 1}, None), (None, "Invalid deposit"), ({"id": 3}, None)]
+
+
+def test_map_mutation_results_when_an_error_nulls_the_data():
+    results = map_mutation_results(
+        mutations(3),
+        None,
+        [{"message": "Invalid deposit", "path": ["m1"]}]
+    )
+    assert results == [(None, None), (None, "Invalid deposit"), (None, NOT_EXECUTED)]
+
+
+def test_map_mutation_results_with_a_request_error():
+    results = map_mutation_results(mutations(2), None, [{"message": "Unauthenticated"}])
+    assert results == [(None, "Unauthenticated"), (None, "Unauthenticated")]
+
+
+@pytest.mark.parametrize("error_status", [200, 400, 500])
+def test_failed_mutation_does_not_cancel_the_rest_of_its_batch(stand_in, error_status):
+    config = StandInConfig(SimulationConfig(player_count=100), error_status=error_status)
+
+    async def scenario():
+        async with stand_in(config) as (server, api):
+            results = await BatchingActionExecutor(api).execute([
+                DepositGoldInTreasuryAction(1_000),
+                BuyItemsAction(EXPENSIVE_ITEMS),
+                DepositGoldInTreasuryAction(2_000),
+                TrainUnitAction(0, 1)
+            ])
+            resources = await api.get_profile_resources()
+            return results, resources, server
+
+    results, resources, server = asyncio.run(scenario())
+    assert [result.error for result in results] == [
+        None,
+        "Not enough gold",
+        None,
+        "Skipped because a previous action failed"
+    ]
+    assert resources.treasury == 3_000
+    assert server.requests == 3
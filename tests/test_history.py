@@ -0,0 +1,145 @@
+from history import (
+    TABLES,
+    BattleRecord,
+    PlayerSnapshot,
+    PostgreSQLHistoryStore,
+    ResourceSnapshot,
+    SQLiteHistoryStore,
+    open_history_store
+)
+from notifier import Notifier
+import os
+import psycopg2
+import pytest
+import sqlite3
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+BATTLES = [
+    BattleRecord(1_000.0, "first", 7, 500, "WIN", 100),
+    BattleRecord(2_000.0, "first", 8, 300, "LOSS", 0),
+    BattleRecord(3_000.0, "second", 7, 400, None, 50)
+]
+
+PLAYERS = [
+    PlayerSnapshot(1_000.0, 7, "seven", 500),
+    PlayerSnapshot(2_000.0, 7, "seven", None),
+    PlayerSnapshot(2_000.0, 8, None, 300)
+]
+
+RESOURCES = [
+    ResourceSnapshot(1_000.0, "first", 10, 1_000, 0),
+    ResourceSnapshot(2_000.0, "first", 20, 2_000, 500),
+    ResourceSnapshot(2_000.0, "second", 5, 50, 5)
+]
+
+
+class RecordingNotifier(Notifier):
+
+    def __init__(self) -> None:
+        self.errors = []
+
+    def notify_info(self, text: str) -> None:
+        pass
+
+    def notify_error(self, text: str) -> None:
+        self.errors.append(text)
+
+
+def check_round_trip(store):
+    store.record_battles(BATTLES)
+    store.record_players(PLAYERS)
+    store.record_resources(RESOURCES)
+
+    assert store.battles() == BATTLES[::-1]
+    assert store.battles(account_id="first") == [BATTLES[1], BATTLES[0]]
+    assert store.battles(player_id=7) == [BATTLES[2], BATTLES[0]]
+    assert store.battles(account_id="first", player_id=7) == [BATTLES[0]]
+    assert store.battles(since=2_000.0) == [BATTLES[2], BATTLES[1]]
+    assert store.battles(limit=1) == [BATTLES[2]]
+    assert store.player_gold(7) == [PLAYERS[1], PLAYERS[0]]
+    assert store.player_gold(8) == [PLAYERS[2]]
+    assert store.player_gold(7, since=1_500.0) == [PLAYERS[1]]
+    assert store.resources("first") == [RESOURCES[1], RESOURCES[0]]
+    assert store.resources("second", since=3_000.0) == []
+
+
+def test_sqlite_history_round_trip(tmp_path):
+    store = SQLiteHistoryStore(str(tmp_path / "history.sqlite3"))
+    check_round_trip(store)
+    store.close()
+
+    reopened = SQLiteHistoryStore(str(tmp_path / "history.sqlite3"))
+    assert reopened.battles() == BATTLES[::-1]
+    reopened.close()
+
+
+def test_sqlite_tables_follow_the_shared_columns(tmp_path):
+    SQLiteHistoryStore(str(tmp_path / "history.sqlite3")).close()
+    connection = sqlite3.connect(str(tmp_path / "history.sqlite3"))
+    for table, columns in TABLES.items():
+        rows = connection.execute(f"PRAGMA table_info({table});").fetchall()
+        assert [(row[1], not row[3]) for row in rows] == [(column.name, column.nullable) for column in columns]
+    connection.close()
+
+
+def test_falls_back_to_sqlite_when_postgresql_fails(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"postgresql://postgres@/postgres?host={tmp_path}")
+    monkeypatch.setenv('HISTORY_FILE', str(tmp_path / "fallback.sqlite3"))
+    notifier = RecordingNotifier()
+
+    store = open_history_store(notifier)
+
+    assert isinstance(store, SQLiteHistoryStore)
+    assert len(notifier.errors) == 1
+    assert notifier.errors[0].startswith("Falling back to the SQLite history store")
+    store.record_battles(BATTLES[:1])
+    store.close()
+    assert (tmp_path / "fallback.sqlite3").exists()
+
+
+def test_uses_sqlite_without_database_url(tmp_path, monkeypatch):
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    monkeypatch.setenv('HISTORY_FILE', str(tmp_path / "history.sqlite3"))
+    notifier = RecordingNotifier()
+
+    store = open_history_store(notifier)
+
+    assert isinstance(store, SQLiteHistoryStore)
+    assert notifier.errors == []
+    store.close()
+
+
+@pytest.fixture
+def database_url(monkeypatch):
+    schema = "history_test"
+    connection = psycopg2.connect(TEST_DATABASE_URL)
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE; CREATE SCHEMA {schema};")
+    separator = "&" if "?" in TEST_DATABASE_URL else "?"
+    monkeypatch.setenv('DATABASE_URL', f"{TEST_DATABASE_URL}{separator}options=-csearch_path%3D{schema}")
+    yield connection, schema
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA {schema} CASCADE;")
+    connection.close()
+
+
+@pytest.mark.skipif(TEST_DATABASE_URL is None, reason="TEST_DATABASE_URL is not set")
+def test_postgresql_history_round_trip(database_url):
+    connection, schema = database_url
+    notifier = RecordingNotifier()
+    store = PostgreSQLHistoryStore(notifier)
+    check_round_trip(store)
+    store.close()
+    assert notifier.errors == []
+
+    with connection.cursor() as cursor:
+        for table, columns in TABLES.items():
+            cursor.execute("""
+                SELECT column_name, is_nullable = 'YES'
+                FROM information_schema.columns
+                WHERE table_schema = %s AND table_name = %s
+                ORDER BY ordinal_position;
+            """, (schema, table))
+            assert cursor.fetchall() == [(column.name, column.nullable) for column in columns]
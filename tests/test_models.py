@@ -0,0 +1,31 @@
+from models import Item, Player, PlayerTable, RankedPlayers, Unit, UnitItem
+import asyncio
+import copy
+import pickle
+
+
+def test_slotted_models_can_be_pickled_and_copied():
+    unit = Unit(1, "Knight", 600, (UnitItem(2, "Sword", 1_000, 2),), attack_strength=5)
+    for model in (Item(2, "Sword", 1_000), unit):
+        assert pickle.loads(pickle.dumps(model)) == model
+        assert copy.deepcopy(model) == model
+        assert copy.copy(model) == model
+    restored = pickle.loads(pickle.dumps(unit))
+    assert restored.total_item_price == 2_000
+    assert restored.item_buy_template == ((2, 2),)
+    assert not hasattr(restored, "__dict__")
+
+
+def test_player_table_keeps_null_ids_and_gold():
+    table = PlayerTable()
+    table.append(1, "first", 500)
+    table.append(None, "unknown", 900)
+    table.append(3, "poor", None)
+
+    assert list(table) == [Player(1, "first", 500), Player(None, "unknown", 900), Player(3, "poor", None)]
+
+    async def pages():
+        yield table
+
+    ranked = asyncio.run(RankedPlayers.select_pages(pages(), 2))
+    assert ranked.players == (Player(None, "unknown", 900), Player(1, "first", 500))
@@ -0,0 +1,94 @@
+from notifier import EmptyNotifier
+from pipeline import FilePipelineSource, StrategyPipeline, ValueStorePipelineSource, parse_pipeline
+from strategy import ENTITIES, PLAYERS, RESOURCES, DepositMaxGoldInTreasuryStrategy, OptimalAllocationStrategy, SkipGoldStrategy
+from value_store import InMemoryValueStore, ValueStoreError
+import json
+import pytest
+
+PIPELINE = json.dumps({"strategies": [
+    {"type": "SkipGold", "percentage": 10},
+    {"type": "OptimalAllocation", "weights": {"attack": 2.0}, "gold_value": 0.5}
+]})
+DEFAULT = StrategyPipeline.from_factory(lambda: [DepositMaxGoldInTreasuryStrategy()])
+
+
+class FlakyValueStore(InMemoryValueStore):
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.failing = False
+
+    def read_value(self, key):
+        if self.failing:
+            raise ValueStoreError("connection refused")
+        return super().read_value(key)
+
+
+def test_pipeline_is_parsed_from_json_and_yaml():
+    pipeline = parse_pipeline(PIPELINE)
+    strategies = pipeline.strategies()
+    assert [type(strategy) for strategy in strategies] == [SkipGoldStrategy, OptimalAllocationStrategy]
+    assert pipeline.requires == frozenset((ENTITIES, RESOURCES))
+    assert pipeline.strategies() is not strategies
+    assert parse_pipeline(PIPELINE).version == pipeline.version
+
+    pipeline = parse_pipeline("- type: AttackHighestGoldPlayer\n  first: 1\n", "yaml")
+    assert pipeline.requires == frozenset((PLAYERS,))
+
+    pipeline = parse_pipeline('[{"type": "OptimalAllocation", "weights": {"attack": 2}, "gold_value": 1}]')
+    assert [type(strategy) for strategy in pipeline.strategies()] == [OptimalAllocationStrategy]
+
+
+@pytest.mark.parametrize("text", [
+    "{}",
+    "[1]",
+    '[{"type": "Unknown"}]',
+    '[{"type": ["SkipGold"]}]',
+    '[{"percentage": 10}]',
+    '[{"type": "SkipGold"}]',
+    '[{"type": "OptimalAllocation", "weights": {"speed": 1}}]',
+    '[{"type": "SkipGoldRelativeToPlayers", "percentage": "50"}]',
+    '[{"type": "SkipGold", "percentage": true}]',
+    '[{"type": "TrainMaxUnit", "unit_name": "Slinger", "with_items": "false"}]',
+    '[{"type": "BuyMaxItem", "item_name": 3}]',
+    '[{"type": "OptimalAllocation", "gold_value": "0.5"}]',
+    '[{"type": "OptimalAllocation", "weights": {"attack": "2"}}]',
+    "not json"
+])
+def test_invalid_pipelines_are_rejected(text):
+    with pytest.raises(ValueError):
+        parse_pipeline(text)
+
+
+def test_value_store_pipeline_is_reloaded_when_it_changes():
+    value_store = FlakyValueStore()
+    source = ValueStorePipelineSource(value_store, DEFAULT, EmptyNotifier(), reload_interval=0)
+    assert source.current() is DEFAULT
+
+    value_store.update_value('strategies', PIPELINE)
+    loaded = source.current()
+    assert loaded.requires == frozenset((ENTITIES, RESOURCES))
+    assert source.current() is loaded
+
+    value_store.update_value('strategies', '[{"type": "Unknown"}]')
+    assert source.current() is loaded
+
+    value_store.update_value('strategies', '[{"type": "SkipGoldRelativeToPlayers", "percentage": "50"}]')
+    assert source.current() is loaded
+
+    value_store.failing = True
+    assert source.current() is loaded
+
+    value_store.failing = False
+    value_store.update_value('strategies', None)
+    assert source.current() is DEFAULT
+
+
+def test_file_pipeline_is_read_as_yaml(tmp_path):
+    path = tmp_path / "pipeline.yaml"
+    path.write_text("strategies:\n  - type: SkipGold\n    percentage: 10\n")
+    source = FilePipelineSource(str(path), DEFAULT, EmptyNotifier(), reload_interval=0)
+    assert [type(strategy) for strategy in source.current().strategies()] == [SkipGoldStrategy]
+
+    path.unlink()
+    assert [type(strategy) for strategy in source.current().strategies()] == [SkipGoldStrategy]
@@ -0,0 +1,111 @@
+from gql.transport.exceptions import TransportQueryError, TransportServerError
+from ratelimit import CircuitOpenError, RequestGovernor, TokenBucket
+from simulation import SimulationConfig
+from stand_in_server import StandInConfig
+import asyncio
+import pytest
+
+
+class Clock:
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FlakyRequest:
+
+    def __init__(self, *errors: Exception) -> None:
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def governor(clock: Clock, **args) -> RequestGovernor:
+    return RequestGovernor(clock=clock, base_delay=0.001, max_delay=0.001, seed=0, **args)
+
+
+def test_token_bucket_refills_at_its_rate():
+    clock = Clock()
+    bucket = TokenBucket(2, 2, clock)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert bucket.reserve() == pytest.approx(0.5)
+    clock.now = 1.0
+    assert bucket.try_acquire()
+
+
+def test_idempotent_request_is_retried_on_server_errors():
+    request = FlakyRequest(TransportServerError("Bad Gateway", 502), TransportServerError("Bad Gateway", 502))
+    assert asyncio.run(governor(Clock()).call(request, idempotent=True)) == "ok"
+    assert request.calls == 3
+
+
+def test_mutation_is_not_retried_on_server_errors():
+    request = FlakyRequest(TransportServerError("Bad Gateway", 502))
+    with pytest.raises(TransportServerError):
+        asyncio.run(governor(Clock()).call(request, idempotent=False))
+    assert request.calls == 1
+
+
+def test_mutation_is_retried_when_rate_limited_and_slows_down_its_operation():
+    request_governor = governor(Clock(), rate=8)
+    request = FlakyRequest(TransportServerError("Too Many Requests", 429))
+    assert asyncio.run(request_governor.call(request, idempotent=False, key="actionBattle")) == "ok"
+    assert request.calls == 2
+    assert request_governor.rate("actionBattle") < 8
+    assert request_governor.rate("viewerProfile") == 8
+
+
+def test_graphql_errors_are_not_retried():
+    request = FlakyRequest(TransportQueryError("Not enough gold"))
+    with pytest.raises(TransportQueryError):
+        asyncio.run(governor(Clock()).call(request, idempotent=True))
+    assert request.calls == 1
+
+
+def test_circuit_breaker_opens_and_closes_after_a_trial():
+    clock = Clock()
+    request_governor = governor(clock, failure_threshold=2, reset_timeout=30, max_attempts=1)
+
+    async def call(request):
+        return await request_governor.call(request, idempotent=True)
+
+    for _ in range(2):
+        with pytest.raises(TransportServerError):
+            asyncio.run(call(FlakyRequest(TransportServerError("Unavailable", 503))))
+    rejected = FlakyRequest()
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call(rejected))
+    assert rejected.calls == 0
+
+    clock.now = 30
+    failed_trial = FlakyRequest(TransportServerError("Unavailable", 503))
+    with pytest.raises(TransportServerError):
+        asyncio.run(call(failed_trial))
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call(FlakyRequest()))
+
+    clock.now = 60
+    assert asyncio.run(call(FlakyRequest())) == "ok"
+    assert asyncio.run(call(FlakyRequest())) == "ok"
+
+
+def test_rate_limited_requests_to_the_stand_in_are_retried(stand_in):
+    config = StandInConfig(SimulationConfig(player_count=10), rate_limit=50, burst=1)
+
+    async def scenario():
+        async with stand_in(config, governor=RequestGovernor(rate=50, burst=5, base_delay=0.01)) as (server, api):
+            resources = await asyncio.gather(*(api.get_profile_resources() for _ in range(5)))
+            return resources, server
+
+    resources, server = asyncio.run(scenario())
+    assert len(resources) == 5
+    assert server.rate_limited > 0
@@ -0,0 +1,42 @@
+from models import Entities, Player, RankedPlayers, Resources
+from runner import PlanCache
+from strategy import AttackHighestGoldPlayerStrategy, SkipGoldStrategy
+
+NO_ENTITIES = Entities((), ())
+
+
+def ranked(*players):
+    return RankedPlayers(tuple(players))
+
+
+def test_plans_are_cached_by_the_data_their_strategies_read():
+    cache = PlanCache()
+    strategies = lambda: [SkipGoldStrategy(10)]
+    requires = SkipGoldStrategy.requires
+
+    first = Resources(10, 1_000, 0, 5_000)
+    cache.plan(strategies, NO_ENTITIES, first, ranked(Player(1, "a", 50)), requires=requires)
+    second = Resources(10, 1_000, 0, 5_000)
+    cache.plan(strategies, NO_ENTITIES, second, ranked(Player(2, "b", 70)), requires=requires)
+    assert len(cache) == 1
+    assert first.gold == second.gold == 900
+
+    cache.plan(strategies, NO_ENTITIES, Resources(10, 2_000, 0, 5_000), ranked(), requires=requires)
+    assert len(cache) == 2
+
+
+def test_cached_plans_only_follow_the_highest_player():
+    cache = PlanCache()
+    strategies = lambda: [AttackHighestGoldPlayerStrategy(1)]
+    requires = AttackHighestGoldPlayerStrategy.requires
+    leader = Player(1, "a", 500)
+
+    cache.plan(strategies, NO_ENTITIES, Resources(1, 10), ranked(leader, Player(2, "b", 50)), requires=requires)
+    resources = Resources(2, 20)
+    cache.plan(strategies, NO_ENTITIES, resources, ranked(leader, Player(3, "c", 60)), requires=requires)
+    assert len(cache) == 1
+    assert resources == Resources(2, 20)
+
+    actions, _ = cache.plan(strategies, NO_ENTITIES, Resources(), ranked(Player(3, "c", 500)), requires=requires)
+    assert len(cache) == 2
+    assert actions[0].id == 3
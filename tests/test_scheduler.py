@@ -0,0 +1,162 @@
+from scheduler import AsyncScheduler, align_interval, window_start
+import asyncio
+import pytest
+
+
+class FakeTime:
+
+    def __init__(self, now: float) -> None:
+        self.now = now
+        self.waits = []
+
+    def clock(self) -> float:
+        return self.now
+
+    async def wait_for(self, awaitable, timeout):
+        waiter = asyncio.ensure_future(awaitable)
+        for _ in range(5):
+            await asyncio.sleep(0)
+        if waiter.done():
+            return waiter.result()
+        waiter.cancel()
+        self.waits.append(timeout)
+        self.now += timeout
+        raise asyncio.TimeoutError
+
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    fake_time = FakeTime(0)
+    monkeypatch.setattr(asyncio, "wait_for", fake_time.wait_for)
+    return fake_time
+
+
+def recording_job(fake_time, scheduler, runs, count):
+
+    async def job(window):
+        runs.append((window, fake_time.now))
+        if len(runs) == count:
+            scheduler.stop()
+
+    return job
+
+
+def test_align_interval():
+    assert align_interval(1800, 700) == 1400
+    assert align_interval(1800, 600) == 1800
+    assert align_interval(1800, 2400) == 2400
+    assert align_interval(1800, 0) == 1800
+
+
+def test_window_start():
+    assert window_start(1000, 100) == 1000
+    assert window_start(1019, 100, 20) == 920
+    assert window_start(1020, 100, 20) == 1020
+    assert window_start(3500, 1400, 20) == 2820
+
+
+def test_jobs_run_at_their_offset_in_every_window(fake_time):
+    fake_time.now = 1000
+    scheduler = AsyncScheduler(fake_time.clock)
+    runs = []
+    scheduler.every(100, recording_job(fake_time, scheduler, runs, 3), "job", offset=20)
+
+    asyncio.run(scheduler.run())
+
+    assert runs == [(1020, 1020), (1120, 1120), (1220, 1220)]
+
+
+def test_jitter_is_drawn_once_per_job(fake_time):
+    fake_time.now = 1000
+    scheduler = AsyncScheduler(fake_time.clock, seed=1)
+    runs = {"first": [], "second": []}
+    scheduler.every(100, recording_job(fake_time, scheduler, runs["first"], 4), "first", offset=20, jitter=30)
+    scheduler.every(100, recording_job(fake_time, scheduler, runs["second"], 5), "second", offset=20, jitter=30)
+    delays = [job.delay for job in scheduler.jobs]
+
+    asyncio.run(scheduler.run())
+
+    assert delays[0] != delays[1]
+    for job, delay in zip(("first", "second"), delays):
+        assert 0 <= delay <= 30
+        assert [window for window, _ in runs[job]] == [1020 + 100 * index for index in range(len(runs[job]))]
+        assert [started - window for window, started in runs[job]] == pytest.approx([delay] * len(runs[job]))
+
+
+def test_seeded_jitter_is_deterministic():
+
+    def delays(seed):
+        scheduler = AsyncScheduler(lambda: 0, seed=seed)
+        for index in range(5):
+            scheduler.every(100, None, str(index), jitter=30)
+        return [job.delay for job in scheduler.jobs]
+
+    assert delays(7) == delays(7)
+    assert delays(7) != delays(8)
+    assert all(0 <= delay <= 30 for delay in delays(7))
+
+
+def test_missed_window_is_caught_up_on(fake_time):
+    fake_time.now = 1000
+    scheduler = AsyncScheduler(fake_time.clock)
+    runs = []
+    scheduler.every(100, recording_job(fake_time, scheduler, runs, 2), "job", offset=20, catch_up_from=800)
+
+    asyncio.run(scheduler.run())
+
+    assert runs == [(920, 1000), (1020, 1020)]
+
+
+def test_last_window_is_not_run_again(fake_time):
+    fake_time.now = 1000
+    scheduler = AsyncScheduler(fake_time.clock)
+    job = scheduler.every(100, None, "job", offset=20, catch_up_from=920)
+    assert job.next_window == 1020
+
+
+def test_window_is_skipped_while_the_previous_run_is_still_going(fake_time):
+    fake_time.now = 50
+    scheduler = AsyncScheduler(fake_time.clock)
+    runs = []
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def job(window):
+            runs.append(window)
+            if len(runs) == 1:
+                await release.wait()
+            else:
+                scheduler.stop()
+
+        scheduler.every(100, job, "job")
+        run = asyncio.ensure_future(scheduler.run())
+        while fake_time.now < 200:
+            await asyncio.sleep(0)
+        release.set()
+        await run
+
+    asyncio.run(scenario())
+
+    assert runs == [100, 300]
+    assert fake_time.waits == [50, 100, 100]
+
+
+def test_windows_follow_a_changed_interval(fake_time):
+    fake_time.now = 20
+    scheduler = AsyncScheduler(fake_time.clock)
+    runs = []
+    interval = 1800
+
+    async def job(window):
+        nonlocal interval
+        runs.append(window)
+        interval = align_interval(1800, 700)
+        if len(runs) == 3:
+            scheduler.stop()
+
+    scheduler.every(lambda: interval, job, "job", offset=20)
+
+    asyncio.run(scheduler.run())
+
+    assert runs == [1820, 3220, 4620]
@@ -0,0 +1,104 @@
+from executor import BatchingActionExecutor
+from notifier import EmptyNotifier
+from runner import AsyncStrategyRunner, MultiAccountRunner
+from scheduler import window_start
+from sharding import HashRing, PostgreSQLLeaseStore, ShardedRunner, tick_key
+from simulation import SimulatedAPI, SimulatedGame, SimulationConfig
+from strategy import TrainMaxUnitStrategy
+from value_store import InMemoryValueStore
+import asyncio
+import os
+import pytest
+
+ACCOUNTS = [f"account-{index}" for index in range(1_000)]
+
+
+def test_hash_ring_spreads_accounts_over_workers():
+    ring = HashRing(["a", "b", "c"])
+    owners = [ring.owner(account) for account in ACCOUNTS]
+    for worker in ("a", "b", "c"):
+        assert 200 < owners.count(worker) < 500
+    assert owners == [HashRing(["c", "b", "a"]).owner(account) for account in ACCOUNTS]
+
+
+def test_hash_ring_only_moves_accounts_of_a_removed_worker():
+    before = HashRing(["a", "b", "c"])
+    after = HashRing(["a", "b"])
+    for account in ACCOUNTS:
+        if before.owner(account) != "c":
+            assert after.owner(account) == before.owner(account)
+    assert HashRing([]).owner("account") is None
+
+
+def test_tick_key_agrees_across_worker_offsets():
+    interval = 30 * 60
+    now = 1_700_000_000 + 1_000
+    first = window_start(now, interval, offset=20)
+    second = window_start(now, interval, offset=50)
+    assert first != second
+    assert tick_key(first, interval) == tick_key(second, interval)
+    assert tick_key(first + interval, interval) != tick_key(first, interval)
+
+
+@pytest.mark.skipif(os.environ.get('TEST_DATABASE_URL') is None, reason="TEST_DATABASE_URL is not set")
+def test_tick_lease_is_acquired_once(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', os.environ['TEST_DATABASE_URL'])
+    lease_store = PostgreSQLLeaseStore(EmptyNotifier())
+    tick = tick_key(window_start(1_700_000_000, 1_800), 1_800)
+    lease_store.purge_expired_ticks()
+    try:
+        assert lease_store.acquire_tick("test-account", tick, "a", ttl=0)
+        assert not lease_store.acquire_tick("test-account", tick, "b", ttl=0)
+    finally:
+        lease_store.purge_expired_ticks()
+        lease_store.close()
+
+
+class InMemoryLeaseStore:
+
+    def __init__(self) -> None:
+        self.ticks = {}
+
+    def live_workers(self):
+        return []
+
+    def acquire_tick(self, account_id: str, tick: str, worker_id: str, ttl: int) -> bool:
+        if (account_id, tick) in self.ticks:
+            return False
+        self.ticks[account_id, tick] = worker_id
+        return True
+
+
+def test_workers_with_different_training_times_share_the_tick_key():
+    game = SimulatedGame(SimulationConfig(player_count=10))
+    for building in game.buildings:
+        for unit in building["units"]:
+            unit["training_time"] = {"totalSeconds": 700}
+    unit_name = next(unit["name"] for building in game.buildings for unit in building["units"] if unit["unit_items"])
+    value_store = InMemoryValueStore()
+    lease_store = InMemoryLeaseStore()
+
+    def sharded_runner(worker_id):
+        api = SimulatedAPI(SimulationConfig(player_count=10), game)
+        runner = AsyncStrategyRunner(
+            api,
+            BatchingActionExecutor(api),
+            EmptyNotifier(),
+            strategies=lambda: [TrainMaxUnitStrategy(unit_name)],
+            value_store=value_store
+        )
+        return runner, ShardedRunner(MultiAccountRunner({"main": runner}, EmptyNotifier()), lease_store, worker_id)
+
+    first_runner, first = sharded_runner("a")
+    second_runner, second = sharded_runner("b")
+
+    async def scenario():
+        window = window_start(1_700_000_000, 1_800)
+        assert await first.run_account("main", window)
+        assert first_runner.job_interval() == 1_400
+        assert second_runner.job_interval() == 1_800
+        assert await second.run_account("main", window + 1_400)
+        assert not await first.run_account("main", window + 1_400)
+        assert len(lease_store.ticks) == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,135 @@
+from action import (
+    ActionResult,
+    AttackPlayerAction,
+    BuyItemsAction,
+    DepositGoldInTreasuryAction,
+    TrainUnitAction,
+    UntrainUnitAction
+)
+from models import BattleResult, Entities, Item, Resources
+from tracker import ResourceTracker
+import pytest
+
+ENTITIES = Entities((), (Item(1, "Sword", 30),))
+
+
+class FakeClock:
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def synced_tracker(clock, **kwargs):
+    tracker = ResourceTracker(clock=clock, **kwargs)
+    tracker.sync(Resources(10, 1_000, 0, 10_000))
+    clock.now = 100
+    tracker.sync(Resources(20, 2_000, 100, 10_000))
+    return tracker
+
+
+def test_needs_two_syncs_to_estimate_income(clock):
+    tracker = ResourceTracker(clock=clock)
+    assert tracker.needs_sync()
+    tracker.sync(Resources(10, 1_000, 0, 10_000))
+    assert tracker.needs_sync()
+    clock.now = 100
+    tracker.sync(Resources(20, 2_000, 100, 10_000))
+    assert not tracker.needs_sync()
+
+    clock.now = 150
+    assert tracker.resources() == Resources(25, 2_500, 150, 10_000)
+
+
+def test_applies_the_results_of_actions(clock):
+    tracker = synced_tracker(clock)
+    tracker.apply(ENTITIES, [
+        ActionResult(BuyItemsAction([{"id": 1, "quantity": 3}])),
+        ActionResult(TrainUnitAction(5, 4)),
+        ActionResult(UntrainUnitAction(5, 1)),
+        ActionResult(DepositGoldInTreasuryAction(500)),
+        ActionResult(AttackPlayerAction(7), BattleResult("WIN", 250)),
+        ActionResult(AttackPlayerAction(8), {"gold_stolen": 50})
+    ])
+
+    assert tracker.resources() == Resources(17, 1_710, 600, 10_000)
+    assert not tracker.needs_sync()
+
+
+def test_caps_the_treasury_at_its_limit(clock):
+    tracker = synced_tracker(clock)
+    clock.now = 100 + 20_000
+    assert tracker.resources().treasury == 10_000
+
+
+@pytest.mark.parametrize("result", [
+    ActionResult(TrainUnitAction(5, 4), error="Not enough citizens"),
+    ActionResult(BuyItemsAction([{"id": 2, "quantity": 1}])),
+    ActionResult(object())
+])
+def test_unknown_results_force_a_sync(clock, result):
+    tracker = synced_tracker(clock)
+    tracker.apply(ENTITIES, [result])
+    assert tracker.needs_sync()
+
+
+def test_syncs_after_sync_every_ticks(clock):
+    tracker = synced_tracker(clock, sync_every=2)
+    tracker.resources()
+    assert not tracker.needs_sync()
+    tracker.resources()
+    assert tracker.needs_sync()
+
+
+def test_syncs_after_max_age(clock):
+    tracker = synced_tracker(clock, max_age=60)
+    clock.now = 159
+    assert not tracker.needs_sync()
+    clock.now = 160
+    assert tracker.needs_sync()
+
+
+def test_smooths_the_income_estimate(clock):
+    tracker = synced_tracker(clock, smoothing=0.5)
+    clock.now = 200
+    tracker.sync(Resources(30, 3_005, 200, 10_000))
+
+    clock.now = 300
+    assert tracker.resources() == Resources(40, 4_007, 300, 10_000)
+
+
+def test_re_estimates_income_when_it_drifts(clock, capsys):
+    tracker = synced_tracker(clock, tolerance=0.01)
+    clock.now = 200
+    tracker.sync(Resources(30, 5_000, 200, 10_000))
+    assert "drifted" in capsys.readouterr().out
+
+    clock.now = 300
+    assert tracker.resources() == Resources(40, 8_000, 300, 10_000)
+
+
+def test_keeps_losses_in_the_income_estimate(clock):
+    tracker = synced_tracker(clock)
+    clock.now = 200
+    tracker.sync(Resources(30, 1_000, 200, 10_000))
+
+    clock.now = 210
+    assert tracker.resources().gold == 900
+    clock.now = 300
+    assert tracker.resources().gold == 0
+
+
+def test_reset_forgets_resources_and_income(clock):
+    tracker = synced_tracker(clock)
+    tracker.reset()
+    assert tracker.needs_sync()
+    tracker.apply(ENTITIES, [ActionResult(TrainUnitAction(5, 4))])
+    tracker.sync(Resources(1, 1, 1, 10_000))
+    assert tracker.needs_sync()
@@ -0,0 +1,86 @@
+from notifier import EmptyNotifier
+from concurrent.futures import ThreadPoolExecutor
+from value_store import BlockingConnectionPool, PostgreSQLValueStore, ValueStoreError
+import os
+import psycopg2
+import pytest
+import threading
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+pytestmark = pytest.mark.skipif(
+    TEST_DATABASE_URL is None, reason="TEST_DATABASE_URL is not set")
+
+
+@pytest.fixture
+def database_url(monkeypatch):
+    schema = "value_store_test"
+    connection = psycopg2.connect(TEST_DATABASE_URL)
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE; CREATE SCHEMA {schema};")
+    separator = "&" if "?" in TEST_DATABASE_URL else "?"
+    monkeypatch.setenv('DATABASE_URL', f"{TEST_DATABASE_URL}{separator}options=-csearch_path%3D{schema}")
+    yield connection, schema
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA {schema} CASCADE;")
+    connection.close()
+
+
+def test_values_are_cached_and_updated(database_url):
+    value_store = PostgreSQLValueStore(EmptyNotifier(), max_connections=1)
+    assert value_store.get_value('token') is None
+    value_store.update_value('token', "abc")
+    assert value_store.get_value('token') == "abc"
+    value_store.invalidate('token')
+    assert value_store.get_value('token') == "abc"
+    value_store.close()
+
+
+def test_connection_is_prepared_again_after_a_failed_prepare(database_url):
+    connection, schema = database_url
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {schema}.config (key VARCHAR PRIMARY KEY, value INTEGER);")
+    value_store = PostgreSQLValueStore(EmptyNotifier(), max_connections=1)
+    assert value_store.get_value('token') is None
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {schema}.config ALTER COLUMN value TYPE VARCHAR;")
+    value_store.update_value('token', "abc")
+    value_store.invalidate()
+    assert value_store.get_value('token') == "abc"
+    value_store.close()
+
+
+def test_read_value_raises_when_the_database_fails(database_url):
+    connection, schema = database_url
+    value_store = PostgreSQLValueStore(EmptyNotifier(), max_connections=1)
+    value_store.update_value('strategies', "[]")
+    assert value_store.read_value('strategies') == "[]"
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE {schema}.config;")
+    with pytest.raises(ValueStoreError):
+        value_store.read_value('strategies')
+    assert value_store.get_value('strategies') == "[]"
+    value_store.close()
+
+
+def test_pool_waits_for_a_free_connection(database_url):
+    pool = BlockingConnectionPool(1, 1, os.environ['DATABASE_URL'])
+    connection = pool.getconn()
+    waiting = threading.Thread(target=lambda: pool.putconn(pool.getconn()))
+    waiting.start()
+    waiting.join(0.2)
+    assert waiting.is_alive()
+    pool.putconn(connection)
+    waiting.join(5)
+    assert not waiting.is_alive()
+    pool.closeall()
+
+
+def test_more_threads_than_connections_share_the_pool(database_url):
+    value_store = PostgreSQLValueStore(EmptyNotifier(), max_connections=2)
+    value_store.update_value('token', "abc")
+    with ThreadPoolExecutor(16) as executor:
+        values = list(executor.map(lambda _: value_store.read_value('token'), range(200)))
+    assert values == ["abc"] * 200
+    value_store.close()
@@ -0,0 +1,9 @@
+from worker import build_governor
+
+
+def test_mutations_are_not_retried_by_default(monkeypatch):
+    monkeypatch.delenv('API_RETRY_MUTATIONS', raising=False)
+    assert build_governor().safe_mutations == frozenset()
+    monkeypatch.setenv('API_RETRY_MUTATIONS', "actionTreasuryDeposit, ")
+    assert build_governor().safe_mutations == frozenset(("actionTreasuryDeposit",))
+